@@ -0,0 +1,337 @@
+"""
+Synthetic dataset generator and end-to-end benchmark for olivegt_sale_payment_plans.
+
+The generator creates partners, sale orders, posted payment plans with M
+lines each and K bank journal entries with allocations, in create() batches
+committed one chunk at a time. The harness then times the hot operations of
+the module at growing scales and writes a JSON results file that can be
+diffed between runs.
+
+Several measured operations commit, so ALWAYS run this against a throwaway
+database that already has the module installed:
+
+    python benchmarks/payment_plan_benchmark.py -c /etc/odoo/odoo.conf -d bench_db \
+        --scales 1000,10000,100000 --lines-per-plan 12 --output results.json
+
+Scales are cumulative: the dataset is grown to each scale in turn and the
+operations are measured on the whole dataset at that point.
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date, datetime
+
+from dateutil.relativedelta import relativedelta
+
+import odoo
+from odoo import Command
+
+_logger = logging.getLogger('payment_plan_benchmark')
+
+BENCH_PREFIX = 'BENCH'
+PLAN_LIST_FIELDS = [
+    'name', 'sale_id', 'partner_id', 'date', 'total_amount', 'amount_paid',
+    'amount_residual', 'total_interest', 'total_with_interest', 'state', 'currency_id',
+]
+
+
+def _chunks(size, chunk_size):
+    for start in range(0, size, chunk_size):
+        yield start, min(start + chunk_size, size)
+
+
+class DatasetGenerator:
+    """Grow a synthetic payment plan portfolio in committed batches."""
+
+    def __init__(self, env, lines_per_plan=12, plans_per_partner=2, payments_per_plan=1.0,
+                 batch_size=500, start_date=None):
+        self.env = env
+        self.lines_per_plan = lines_per_plan
+        self.plans_per_partner = plans_per_partner
+        self.payments_per_plan = payments_per_plan
+        self.batch_size = batch_size
+        # Start far enough in the past that about half of the lines are due
+        self.start_date = start_date or date.today() - relativedelta(months=lines_per_plan // 2)
+        self.company = env.company
+        self.bank_journal = env['account.journal'].search([
+            ('type', '=', 'bank'),
+            ('company_id', '=', self.company.id),
+        ], limit=1)
+
+    def existing_plan_count(self):
+        return self.env['payment.plan'].search_count([('notes', '=like', f'{BENCH_PREFIX}%')])
+
+    def grow_to(self, plan_count):
+        """Create plans (and their partners, orders and payments) until ``plan_count`` exist."""
+        existing = self.existing_plan_count()
+        missing = plan_count - existing
+        if missing <= 0:
+            return 0
+        _logger.info("Generating %s payment plans (%s already present)", missing, existing)
+        for start, stop in _chunks(missing, self.batch_size):
+            self._create_batch(existing + start, existing + stop)
+            self.env.cr.commit()
+            self.env.invalidate_all()
+        return missing
+
+    def _create_batch(self, first, last):
+        env = self.env
+        partner_count = max(1, (last - first) // self.plans_per_partner)
+        partners = env['res.partner'].create([{
+            'name': f'{BENCH_PREFIX} Partner {first + i}',
+            'email': f'bench.partner.{first + i}@example.com',
+        } for i in range(partner_count)])
+        orders = env['sale.order'].create([{
+            'partner_id': partners[i % partner_count].id,
+            'company_id': self.company.id,
+        } for i in range(last - first)])
+
+        plans = env['payment.plan'].create([{
+            'sale_id': order.id,
+            'company_id': self.company.id,
+            'date': self.start_date,
+            'state': 'posted',
+            'notes': f'{BENCH_PREFIX} {first + i}',
+            'line_ids': [Command.create({
+                'date': self.start_date + relativedelta(months=k),
+                'amount': 1000.0 + (first + i) % 7 * 125.0,
+                'name': f'Cuota {k + 1}',
+            }) for k in range(self.lines_per_plan)],
+        } for i, order in enumerate(orders)])
+
+        if self.bank_journal:
+            self._create_payments(plans)
+
+    def _create_payments(self, plans):
+        payment_count = int(len(plans) * self.payments_per_plan)
+        if not payment_count:
+            return
+        targets = []
+        for i in range(payment_count):
+            plan = plans[i % len(plans)]
+            line = plan.line_ids.sorted('date')[:1]
+            if line:
+                targets.append(line)
+        move_lines = self.create_bank_entries([(line, line.amount) for line in targets])
+
+        # Allocate every other payment so the dataset mixes open and allocated lines
+        self.env['payment.plan.reconciliation'].create([{
+            'payment_plan_line_id': line.id,
+            'move_line_id': move_line.id,
+            'amount': line.amount,
+            'state': 'confirmed',
+        } for index, (line, move_line) in enumerate(zip(targets, move_lines)) if not index % 2])
+
+    def close_history(self, months=60):
+        """Close the last ``months`` month ends, so the roll rates have five years of snapshots to read."""
+        first_month = date.today().replace(day=1) - relativedelta(months=months)
+        count = self.env['payment.plan.snapshot']._close_periods(first_month)
+        self.env.cr.commit()
+        return count
+
+    def create_bank_entries(self, line_amounts):
+        """Post one bank entry per (plan line, amount) pair and return their bank debit lines."""
+        if not self.bank_journal:
+            raise RuntimeError("The benchmark needs a bank journal in the current company")
+        bank_account = self.bank_journal.default_account_id
+        moves = self.env['account.move'].create([{
+            'move_type': 'entry',
+            'journal_id': self.bank_journal.id,
+            'date': line.date,
+            'ref': f'{BENCH_PREFIX}-PAY-{line.id}',
+            'line_ids': [
+                Command.create({
+                    'account_id': bank_account.id,
+                    'partner_id': line.payment_plan_id.partner_id.id,
+                    'debit': amount,
+                }),
+                Command.create({
+                    'account_id': line.payment_plan_id.partner_id.property_account_receivable_id.id,
+                    'partner_id': line.payment_plan_id.partner_id.id,
+                    'credit': amount,
+                }),
+            ],
+        } for line, amount in line_amounts])
+        moves.action_post()
+        return [move.line_ids.filtered(lambda ml: ml.debit > 0)[:1] for move in moves]
+
+
+class BenchmarkHarness:
+    """Time the module's hot operations and collect machine-readable results."""
+
+    def __init__(self, env, repeat=1):
+        self.env = env
+        self.repeat = repeat
+        self.results = []
+
+    def operations(self):
+        return [
+            ('overdue_cron', self.run_overdue_cron),
+            ('plan_list_load', self.run_plan_list_load),
+            ('reconciliation_wizard', self.run_reconciliation_wizard),
+            ('xlsx_export', self.run_xlsx_export),
+            ('statement_pdf', self.run_statement_pdf),
+            ('roll_rates_5y', self.run_roll_rates),
+            ('vintage_curves_5y', self.run_vintage_curves),
+        ]
+
+    def measure(self, scale):
+        for name, operation in self.operations():
+            timings = []
+            queries = []
+            error = None
+            for _iteration in range(self.repeat):
+                self.env.invalidate_all()
+                start_queries = self.env.cr.sql_log_count
+                start = time.perf_counter()
+                try:
+                    operation()
+                except Exception as exc:  # keep measuring the other operations
+                    self.env.cr.rollback()
+                    error = f'{type(exc).__name__}: {exc}'
+                    _logger.warning("Operation %s failed at scale %s: %s", name, scale, error)
+                    break
+                timings.append(time.perf_counter() - start)
+                queries.append(self.env.cr.sql_log_count - start_queries)
+            result = {
+                'scale': scale,
+                'operation': name,
+                'runs': len(timings),
+                'seconds_min': min(timings) if timings else None,
+                'seconds_median': statistics.median(timings) if timings else None,
+                'queries': max(queries) if queries else None,
+                'error': error,
+            }
+            _logger.info("%(operation)s @ %(scale)s plans: %(seconds_median)s s, %(queries)s queries", result)
+            self.results.append(result)
+
+    def run_overdue_cron(self):
+        # One chunk per call: repeat as the cron runner does until the run is done
+        line_model = self.env['payment.plan.line']
+        shard_model = self.env['payment.plan.overdue.shard']
+        line_model._update_overdue_lines()
+        if shard_model._get_worker_count() > 1:
+            # The run was only dispatched: work the shards off as the worker crons do, until all are done
+            while shard_model.search_count([('state', '!=', 'done')]):
+                shard_model._run_overdue_shards()
+                if shard_model.search_count([('state', '=', 'running')]):
+                    # Shards claimed by worker crons of the server: wait for them
+                    time.sleep(0.1)
+        else:
+            while shard_model.search_count([('shard_count', '=', 1), ('state', '!=', 'done')]):
+                line_model._update_overdue_lines()
+
+    def run_plan_list_load(self):
+        specification = {fname: {} for fname in PLAN_LIST_FIELDS}
+        for many2one in ('sale_id', 'partner_id', 'currency_id'):
+            specification[many2one] = {'fields': {'display_name': {}}}
+        self.env['payment.plan'].web_search_read(
+            [('state', '=', 'posted')], specification, limit=80, count_limit=10001,
+        )
+
+    def run_reconciliation_wizard(self):
+        line = self.env['payment.plan.line'].search([
+            ('payment_plan_id.notes', '=like', f'{BENCH_PREFIX}%'),
+            ('allocation_state', '=', 'none'),
+            ('paid', '=', False),
+        ], limit=1)
+        if not line:
+            return
+        wizard = self.env['payment.plan.reconciliation.wizard'].with_context(
+            default_payment_plan_line_id=line.id,
+        ).create({
+            'payment_plan_id': line.payment_plan_id.id,
+            'payment_plan_line_id': line.id,
+        })
+        wizard.read(['wizard_line_ids', 'remaining_amount', 'total_allocation'])
+
+    def run_xlsx_export(self):
+        report = self.env.ref('olivegt_sale_payment_plans.registro_unico_reporte_cuotas')
+        report.action_descargar_reporte()
+
+    def run_statement_pdf(self):
+        plans = self.env['payment.plan'].search([('notes', '=like', f'{BENCH_PREFIX}%')], limit=20)
+        self.env['ir.actions.report']._render_qweb_pdf(
+            'olivegt_sale_payment_plans.action_report_payment_plan', res_ids=plans.ids,
+        )
+
+    def run_roll_rates(self):
+        # Five years by default, read from the snapshots closed by close_history
+        self.env['payment.plan.analytics'].get_roll_rates()
+
+    def run_vintage_curves(self):
+        self.env['payment.plan.analytics'].get_vintage_curves()
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-c', '--config', help='Odoo configuration file')
+    parser.add_argument('-d', '--database', required=True, help='Throwaway database with the module installed')
+    parser.add_argument('--scales', default='1000,10000,100000', help='Comma separated plan counts')
+    parser.add_argument('--lines-per-plan', type=int, default=12)
+    parser.add_argument('--plans-per-partner', type=int, default=2)
+    parser.add_argument('--payments-per-plan', type=float, default=1.0)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=f"payment_plan_benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    args = parser.parse_args()
+
+    odoo_args = ['-d', args.database]
+    if args.config:
+        odoo_args += ['-c', args.config]
+    odoo.tools.config.parse_config(odoo_args)
+    logging.basicConfig(level=logging.INFO)
+
+    scales = sorted(int(scale) for scale in args.scales.split(','))
+    registry = odoo.modules.registry.Registry(args.database)
+    with registry.cursor() as cr:
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        generator = DatasetGenerator(
+            env,
+            lines_per_plan=args.lines_per_plan,
+            plans_per_partner=args.plans_per_partner,
+            payments_per_plan=args.payments_per_plan,
+            batch_size=args.batch_size,
+        )
+        harness = BenchmarkHarness(env, repeat=args.repeat)
+        for scale in scales:
+            started = time.perf_counter()
+            generator.grow_to(scale)
+            generator.close_history()
+            _logger.info("Dataset at %s plans ready in %.1f s", scale, time.perf_counter() - started)
+            harness.measure(scale)
+            cr.commit()
+
+    payload = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'database': args.database,
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'odoo': odoo.release.version,
+        'parameters': {
+            'scales': scales,
+            'lines_per_plan': args.lines_per_plan,
+            'plans_per_partner': args.plans_per_partner,
+            'payments_per_plan': args.payments_per_plan,
+            'repeat': args.repeat,
+        },
+        'results': harness.results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as handle:
+        json.dump(payload, handle, indent=2)
+    _logger.info("Results written to %s", args.output)
+
+
+if __name__ == '__main__':
+    main()
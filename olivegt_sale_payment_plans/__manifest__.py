@@ -1,6 +1,6 @@
 {
     'name': 'Sale Payment Plans',
-    'version': '18.0.1.0.1',
+    'version': '18.0.1.0.3',
     'summary': 'Payment Plans for Sale Orders',
     'description': """
         This module allows you to create payment plans from sale orders.
@@ -30,14 +30,23 @@
         'data/reports_data.xml',
         'reports/payment_plan_report.xml',
         'data/payment_plan_reconciliation_email_template.xml',
+        'data/payment_plan_reminder_email_template.xml',
         'views/menu_payment_plan.xml',
         'views/payment_plan_line_views.xml',
         'views/payment_plan_reconciliation_views.xml',
         'views/payment_plan_view.xml',
         'views/installments_reports.xml',
         'views/sale_order_views.xml',
+        'views/payment_plan_summary_views.xml',
+        'views/payment_plan_collection_queue_views.xml',
+        'views/payment_plan_partner_balance_views.xml',
+        'views/payment_plan_reminder_views.xml',
+        'views/payment_plan_event_views.xml',
+        'views/payment_plan_snapshot_views.xml',
+        'views/payment_plan_perf_run_views.xml',
         'wizards/payment_plan_calculator_views.xml',
         'wizards/payment_plan_reconciliation_views.xml',
+        'wizards/payment_plan_payoff_views.xml',
     ],
     'demo': [],
     'installable': True,
@@ -0,0 +1,39 @@
+from odoo import http, fields
+from odoo.http import request
+
+
+class PaymentPlanController(http.Controller):
+
+    @http.route('/payment_plan/payoff_projection', type='json', auth='user')
+    def payoff_projection(self, plan_ids=None, line_ids=None, reference_date=None):
+        """
+        Read-only payoff projection as of ``reference_date`` (ISO date, defaults to today).
+
+        Returns {'plans': {id: ...}} and/or {'lines': {id: ...}} in the format of
+        get_payoff_projection on payment.plan and payment.plan.line.
+        """
+        reference_date = fields.Date.to_date(reference_date) if reference_date else None
+        result = {}
+        if plan_ids:
+            plans = request.env['payment.plan'].browse(plan_ids).exists()
+            plans.check_access('read')
+            result['plans'] = plans.get_payoff_projection(reference_date)
+        if line_ids:
+            lines = request.env['payment.plan.line'].browse(line_ids).exists()
+            lines.check_access('read')
+            result['lines'] = lines.get_payoff_projection(reference_date)
+        return result
+
+    @http.route('/payment_plan/delinquency_analytics', type='json', auth='user')
+    def delinquency_analytics(self, date_from=None, date_to=None, company_id=None):
+        """
+        Roll rates and vintage curves between ``date_from`` and ``date_to`` (ISO dates).
+
+        Returns {'roll_rates': ..., 'vintages': ...} in the format of
+        get_roll_rates and get_vintage_curves on payment.plan.analytics.
+        """
+        analytics = request.env['payment.plan.analytics']
+        return {
+            'roll_rates': analytics.get_roll_rates(date_from, date_to, company_id),
+            'vintages': analytics.get_vintage_curves(date_from, date_to, company_id),
+        }
@@ -0,0 +1,15 @@
+from odoo.addons.olivegt_sale_payment_plans.models.payment_plan_line import LINE_INDEXES
+from odoo.addons.olivegt_sale_payment_plans.models.payment_plan_reconciliation import RECONCILIATION_INDEXES
+from odoo.addons.olivegt_sale_payment_plans.utils.db import create_indexes_concurrently
+
+
+def migrate(cr, version):
+    """Build the hot-path indexes without locking large tables against writes.
+
+    The models' init() only creates indexes that are still missing, so the
+    ones built here are reused as-is once the registry loads.
+    """
+    if not version:
+        return
+    create_indexes_concurrently(cr, 'payment_plan_line', LINE_INDEXES)
+    create_indexes_concurrently(cr, 'payment_plan_reconciliation', RECONCILIATION_INDEXES)
@@ -0,0 +1,9 @@
+from odoo.addons.olivegt_sale_payment_plans.models.payment_plan_reconciliation import RECONCILIATION_INDEXES
+from odoo.addons.olivegt_sale_payment_plans.utils.db import create_indexes_concurrently
+
+
+def migrate(cr, version):
+    """Build the allocation index by journal entry without locking the table against writes."""
+    if not version:
+        return
+    create_indexes_concurrently(cr, 'payment_plan_reconciliation', RECONCILIATION_INDEXES)
@@ -2,6 +2,18 @@ from . import payment_plan
 from . import payment_plan_line
 from . import payment_plan_reconciliation
 from . import sale_order
+from . import account_move
 from . import account_move_line
 from . import company
-from . import reports
\ No newline at end of file
+from . import reports
+from . import payment_plan_perf_run
+from . import payment_plan_overdue_shard
+from . import payment_plan_summary
+from . import payment_plan_collection_queue
+from . import payment_plan_partner_balance
+from . import res_partner
+from . import payment_plan_reminder
+from . import payment_plan_event
+from . import payment_plan_snapshot
+from . import payment_plan_analytics
+from . import ir_actions_report
@@ -0,0 +1,43 @@
+from odoo import models, _
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def button_draft(self):
+        res = super().button_draft()
+        self._cancel_payment_plan_allocations(_("reset to draft"))
+        return res
+
+    def button_cancel(self):
+        res = super().button_cancel()
+        self._cancel_payment_plan_allocations(_("cancelled"))
+        return res
+
+    def _reverse_moves(self, default_values_list=None, cancel=False):
+        reverse_moves = super()._reverse_moves(default_values_list=default_values_list, cancel=cancel)
+        self._cancel_payment_plan_allocations(_("reversed"))
+        return reverse_moves
+
+    def _cancel_payment_plan_allocations(self, reason):
+        """Cancel the payment plan allocations of these entries once they no longer stand
+        
+        Allocations are found through the index on their journal entry and
+        cancelled in bulk, so only the plan lines they covered are recomputed.
+        """
+        allocations = self.env['payment.plan.reconciliation'].sudo().search([
+            ('move_id', 'in', self.ids),
+            ('state', '!=', 'cancelled'),
+        ])
+        if not allocations:
+            return False
+        allocations.action_cancel()
+        for plan in allocations.payment_plan_id:
+            plan_allocations = allocations.filtered(lambda a: a.payment_plan_id == plan)
+            plan.message_post(body=_(
+                "%(count)s allocation(s) cancelled because journal entries %(moves)s were %(reason)s.",
+                count=len(plan_allocations),
+                moves=', '.join(plan_allocations.move_id.mapped('name')),
+                reason=reason,
+            ))
+        return True
@@ -23,11 +23,22 @@ class AccountMoveLine(models.Model):
         help='True when this line has been fully consumed by payment plan reconciliations'
     )
     
-    @api.depends('balance', 'account_id.reconcile', 'reconciliation_ids.state')
+    @api.depends('balance', 'account_id.reconcile', 'reconciliation_ids.state', 'reconciliation_ids.amount')
     def _compute_payment_plan_available_amount(self):
         """
         Calculate the amount available for allocation to payment plans
         """
+        # Confirmed allocations of the whole batch in one grouped query
+        allocated_by_line = {}
+        if self._origin:
+            allocated_by_line = {
+                move_line.id: amount
+                for move_line, amount in self.env['payment.plan.reconciliation']._read_group(
+                    [('move_line_id', 'in', self._origin.ids), ('state', '=', 'confirmed')],
+                    ['move_line_id'],
+                    ['amount:sum'],
+                )
+            }
         for move_line in self:
             # Skip if this line isn't reconcilable
             if not move_line.account_id.reconcile:
@@ -38,14 +49,8 @@ class AccountMoveLine(models.Model):
             # Original amount is the absolute value of balance
             original_amount = abs(move_line.balance)
             
-            # Find existing reconciliations for this move line
-            reconciliations = self.env['payment.plan.reconciliation'].search([
-                ('move_line_id', '=', move_line.id),
-                ('state', '=', 'confirmed')
-            ])
-            
             # Calculate allocated amount
-            allocated_amount = sum(reconciliations.mapped('amount'))
+            allocated_amount = allocated_by_line.get(move_line._origin.id, 0.0)
             
             # Available amount is original minus allocated
             available = original_amount - allocated_amount
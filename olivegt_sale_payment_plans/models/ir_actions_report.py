@@ -0,0 +1,16 @@
+from odoo import models
+
+from ..utils.perf import perf_phase
+
+MODULE_PREFIX = 'olivegt_sale_payment_plans.'
+
+
+class IrActionsReport(models.Model):
+    _inherit = 'ir.actions.report'
+
+    def _render_qweb_pdf(self, report_ref, res_ids=None, data=None):
+        report = self._get_report(report_ref)
+        if not (report.report_name or '').startswith(MODULE_PREFIX):
+            return super()._render_qweb_pdf(report_ref, res_ids=res_ids, data=data)
+        with perf_phase(self.env, report.report_name[len(MODULE_PREFIX):], rows=len(res_ids or [])):
+            return super()._render_qweb_pdf(report_ref, res_ids=res_ids, data=data)
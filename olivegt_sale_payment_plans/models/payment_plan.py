@@ -1,7 +1,15 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
+from collections import defaultdict
 from datetime import datetime
 
+from ..utils.payment_helpers import compute_overdue_interest
+from .payment_plan_event import PlanEvent
+from ..utils.perf import perf_phase
+
+# Plan fields that drive late-payment interest on the lines
+INTEREST_POLICY_FIELDS = ('interest_calculation_method', 'interest_rate', 'fixed_interest_amount')
+
 
 class PaymentPlan(models.Model):
     _name = 'payment.plan'
@@ -37,6 +45,12 @@ class PaymentPlan(models.Model):
                                          help="Fixed amount to charge per month for overdue payments")
     notes = fields.Text('Notes')
 
+    # Collection figures kept on the plan so the list can sort and filter on them
+    next_due_date = fields.Date('Next Due Date', compute='_compute_due_figures', store=True, index=True)
+    next_due_amount = fields.Monetary('Next Due Amount', compute='_compute_due_figures', store=True)
+    oldest_overdue_date = fields.Date('Oldest Overdue Date', compute='_compute_due_figures', store=True, index=True)
+    overdue_amount = fields.Monetary('Overdue Amount', compute='_compute_due_figures', store=True, index=True)
+
     # Allocation statistics
     line_count = fields.Integer(string='Total Lines', compute='_compute_allocation_statistics')
     fully_allocated_lines_count = fields.Integer(string='Fully Allocated Lines', compute='_compute_allocation_statistics')
@@ -59,28 +73,180 @@ class PaymentPlan(models.Model):
         return self.env.company
 
     @api.model
-    def _next_payment_plan_sequence(self, company):
-        sequence_model = self.env['ir.sequence'].sudo()
-        sequence = sequence_model.search([
+    def _get_payment_plan_sequence(self, company):
+        return self.env['ir.sequence'].sudo().search([
             ('code', '=', 'payment.plan'),
-            ('company_id', '=', company.id),
-        ], limit=1)
+            ('company_id', 'in', [company.id, False]),
+        ], order='company_id', limit=1)
+
+    @api.model
+    def _reserve_payment_plan_sequences(self, company, count):
+        """Reserve ``count`` consecutive plan references for ``company`` in one call.
 
-        if sequence:
-            return sequence.with_company(company).next_by_id()
+        The sequence row is locked for the rest of the transaction and its
+        counter is advanced by the whole block at once, so concurrent batches
+        get disjoint, gapless ranges.
+        """
+        if count <= 0:
+            return []
+        sequence = self._get_payment_plan_sequence(company)
+        if not sequence:
+            return [False] * count
+        sequence = sequence.with_company(company)
+        if sequence.use_date_range:
+            # Date range sequences keep their own counters per range
+            return [sequence.next_by_id() for _ in range(count)]
 
-        return self.env['ir.sequence'].with_company(company).next_by_code('payment.plan')
+        increment = sequence.number_increment
+        if sequence.implementation == 'standard':
+            self.env.cr.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                ('ir_sequence_%03d' % sequence.id, count),
+            )
+            numbers = [row[0] for row in self.env.cr.fetchall()]
+        else:
+            self.env.cr.execute(
+                "SELECT number_next FROM ir_sequence WHERE id = %s FOR UPDATE",
+                (sequence.id,),
+            )
+            number_next = self.env.cr.fetchone()[0]
+            self.env.cr.execute(
+                "UPDATE ir_sequence SET number_next = number_next + %s WHERE id = %s",
+                (increment * count, sequence.id),
+            )
+            sequence.invalidate_recordset(['number_next'])
+            numbers = [number_next + increment * i for i in range(count)]
+        return [sequence.get_next_char(number) for number in numbers]
+
+    @api.model
+    def _next_payment_plan_sequence(self, company):
+        return self._reserve_payment_plan_sequences(company, 1)[0]
 
     @api.model_create_multi
     def create(self, vals_list):
+        # Warm the cache so company lookups below don't query one order at a time
+        sale_ids = [vals['sale_id'] for vals in vals_list if vals.get('sale_id') and not vals.get('company_id')]
+        self.env['sale.order'].browse(sale_ids).mapped('company_id')
+
+        to_name = defaultdict(list)
         for vals in vals_list:
             company = self._get_create_company(vals)
             if company:
                 vals['company_id'] = company.id
             if vals.get('name', _('New')) == _('New'):
-                vals['name'] = self._next_payment_plan_sequence(company) or _('New')
-        return super().create(vals_list)
+                to_name[company].append(vals)
+
+        for company, company_vals_list in to_name.items():
+            names = self._reserve_payment_plan_sequences(company, len(company_vals_list))
+            for vals, name in zip(company_vals_list, names):
+                vals['name'] = name or _('New')
+        plans = super().create(vals_list)
+        plans._log_interest_policy()
+        return plans
     
+    def write(self, vals):
+        policy_changed = any(fname in vals for fname in INTEREST_POLICY_FIELDS)
+        old_policies = {plan.id: plan._get_interest_policy() for plan in self} if policy_changed else {}
+        res = super().write(vals)
+        if policy_changed:
+            changed = self.filtered(lambda plan: plan._get_interest_policy() != old_policies[plan.id])
+            changed._log_interest_policy()
+            changed._recompute_line_interest()
+        return res
+
+    def _get_interest_policy(self):
+        self.ensure_one()
+        return (self.interest_calculation_method, self.interest_rate, self.fixed_interest_amount)
+
+    def _log_interest_policy(self):
+        """Log the interest settings in force from today, which the event replay accrues interest with"""
+        today = fields.Date.context_today(self)
+        self._log_events([
+            PlanEvent(plan.id, 'interest_policy_changed', today, amount=plan.fixed_interest_amount,
+                      interest_method=plan.interest_calculation_method, interest_rate=plan.interest_rate)
+            for plan in self
+        ])
+
+    def _recompute_line_interest(self, today=None):
+        """Recompute overdue days and interest of the open lines of these plans in batch
+        
+        Unpaid lines past due are recomputed with the current interest
+        settings of their plan: up to their payment date when one is set,
+        otherwise up to today. Paid lines keep the interest they were settled
+        with. Interest edited by hand is replaced as well, since the settings
+        it was edited under changed. Inputs are loaded with one query and the
+        results stored with one multi-row UPDATE; totals and states follow
+        through the ORM. Accrued interest is not logged as plan events,
+        replaying the log derives it from the interest policy events.
+        """
+        if not self:
+            return 0
+        today = today or fields.Date.context_today(self)
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT l.id, l.amount, l.date, COALESCE(l.payment_date, %s),
+                   p.interest_calculation_method, p.interest_rate, p.fixed_interest_amount,
+                   COALESCE(cur.decimal_places, 2)
+              FROM payment_plan_line l
+              JOIN payment_plan p ON p.id = l.payment_plan_id
+         LEFT JOIN res_currency cur ON cur.id = l.currency_id
+             WHERE l.payment_plan_id = ANY(%s)
+               AND (l.paid IS NULL OR l.paid = FALSE)
+               AND l.date < COALESCE(l.payment_date, %s)
+        """, (today, self.ids, today))
+        line_ids, days_list, interests = [], [], []
+        for line_id, amount, due_date, reference_date, method, rate, fixed_amount, digits in self.env.cr.fetchall():
+            days = (reference_date - due_date).days
+            interest = round(compute_overdue_interest(
+                float(amount), days, method, interest_rate=rate, fixed_interest_amount=float(fixed_amount or 0.0),
+            ), digits)
+            line_ids.append(line_id)
+            days_list.append(days)
+            interests.append(interest)
+        if not line_ids:
+            return 0
+        self.env.cr.execute("""
+            UPDATE payment_plan_line l
+               SET overdue_days = v.days,
+                   interest_amount = v.interest,
+                   interest_edited = FALSE
+              FROM unnest(%s::int[], %s::int[], %s::numeric[]) AS v(id, days, interest)
+             WHERE l.id = v.id
+        """, (line_ids, days_list, interests))
+        lines = self.env['payment.plan.line'].browse(line_ids)
+        lines.invalidate_recordset(['overdue_days', 'interest_amount', 'interest_edited'])
+        # Totals, allocation state, state and plan amounts depend on the interest
+        lines.modified(['interest_amount'])
+        return len(line_ids)
+
+    @api.model
+    def _apply_interest_policy(self, vals, domain=None, batch_size=1000):
+        """
+        Portfolio mode: change the interest settings of many plans at once
+        
+        Plans are updated by batches of ``batch_size``: each batch gets one
+        UPDATE for the plan fields and one batched line recompute, and the
+        cache is cleared between batches to keep memory bounded.
+        
+        Args:
+            vals: Values for the interest policy fields
+            domain: Plans to update, defaults to every plan that is not canceled
+            batch_size: Number of plans per batch
+            
+        Returns:
+            int: Number of plans updated
+        """
+        invalid = set(vals) - set(INTEREST_POLICY_FIELDS)
+        if invalid:
+            raise ValidationError(_("Only interest settings can be changed in bulk, not: %s") % ', '.join(sorted(invalid)))
+        plan_ids = self.search(domain if domain is not None else [('state', '!=', 'canceled')], order='id').ids
+        with perf_phase(self.env, 'interest_policy_update', rows=len(plan_ids)):
+            for start in range(0, len(plan_ids), batch_size):
+                self.browse(plan_ids[start:start + batch_size]).write(vals)
+                self.env.flush_all()
+                self.env.invalidate_all()
+        return len(plan_ids)
+
     @api.depends('line_ids.amount', 'line_ids.paid', 'line_ids.interest_amount')
     def _compute_amounts(self):
         for plan in self:
@@ -90,6 +256,73 @@ class PaymentPlan(models.Model):
             plan.total_interest = sum(plan.line_ids.mapped('interest_amount'))
             plan.total_with_interest = plan.total_amount + plan.total_interest
 
+    @api.depends('line_ids.date', 'line_ids.paid', 'line_ids.total_with_interest', 'line_ids.allocated_amount')
+    def _compute_due_figures(self):
+        """Next installment to collect and what is already overdue, as of today
+        
+        Days passing do not trigger this compute; the daily past-due refresh
+        brings the stored values up to date with _refresh_due_figures.
+        """
+        today = fields.Date.context_today(self)
+        for plan in self:
+            next_due_date = oldest_overdue_date = False
+            next_due_amount = overdue_amount = 0.0
+            for line in plan.line_ids.filtered(lambda l: not l.paid and l.date).sorted(lambda l: (l.date, l.id)):
+                open_amount = max(line.total_with_interest - line.allocated_amount, 0.0)
+                if line.date < today:
+                    oldest_overdue_date = oldest_overdue_date or line.date
+                    overdue_amount += open_amount
+                elif not next_due_date or line.date == next_due_date:
+                    next_due_date = line.date
+                    next_due_amount += open_amount
+            plan.next_due_date = next_due_date
+            plan.next_due_amount = next_due_amount
+            plan.oldest_overdue_date = oldest_overdue_date
+            plan.overdue_amount = overdue_amount
+
+    def _refresh_due_figures(self, today=None):
+        """Recompute the stored due figures of these plans with one statement"""
+        if not self:
+            return
+        today = today or fields.Date.context_today(self)
+        self.env.cr.execute("""
+            WITH open_lines AS (
+                SELECT payment_plan_id, date,
+                       GREATEST(COALESCE(total_with_interest, 0) - COALESCE(allocated_amount, 0), 0) AS open_amount
+                  FROM payment_plan_line
+                 WHERE payment_plan_id = ANY(%(plan_ids)s)
+                   AND (paid IS NULL OR paid = FALSE)
+            ), next_due AS (
+                SELECT payment_plan_id, MIN(date) AS date
+                  FROM open_lines
+                 WHERE date >= %(today)s
+              GROUP BY payment_plan_id
+            ), figures AS (
+                SELECT p.id,
+                       n.date AS next_due_date,
+                       COALESCE(SUM(o.open_amount) FILTER (WHERE o.date = n.date), 0) AS next_due_amount,
+                       MIN(o.date) FILTER (WHERE o.date < %(today)s) AS oldest_overdue_date,
+                       COALESCE(SUM(o.open_amount) FILTER (WHERE o.date < %(today)s), 0) AS overdue_amount
+                  FROM payment_plan p
+             LEFT JOIN next_due n ON n.payment_plan_id = p.id
+             LEFT JOIN open_lines o ON o.payment_plan_id = p.id
+                 WHERE p.id = ANY(%(plan_ids)s)
+              GROUP BY p.id, n.date
+            )
+            UPDATE payment_plan p
+               SET next_due_date = f.next_due_date,
+                   next_due_amount = f.next_due_amount,
+                   oldest_overdue_date = f.oldest_overdue_date,
+                   overdue_amount = f.overdue_amount
+              FROM figures f
+             WHERE p.id = f.id
+               AND (p.next_due_date IS DISTINCT FROM f.next_due_date
+                    OR p.next_due_amount IS DISTINCT FROM f.next_due_amount
+                    OR p.oldest_overdue_date IS DISTINCT FROM f.oldest_overdue_date
+                    OR p.overdue_amount IS DISTINCT FROM f.overdue_amount)
+        """, {'plan_ids': self.ids, 'today': today})
+        self.invalidate_recordset(['next_due_date', 'next_due_amount', 'oldest_overdue_date', 'overdue_amount'])
+
     @api.depends('line_ids.allocated_amount', 'line_ids.allocation_state')
     def _compute_allocation_statistics(self):
         """Compute statistics for allocation dashboard"""
@@ -177,6 +410,104 @@ class PaymentPlan(models.Model):
             }
         }
     
+    def get_payoff_projection(self, reference_date=None):
+        """Project the payoff of these plans on a given date without writing anything
+        
+        Args:
+            reference_date: Date of the hypothetical payment, defaults to today
+            
+        Returns:
+            dict: plan id -> {'reference_date', 'currency', 'principal_due',
+                  'interest_due', 'amount_due', 'lines'} where 'lines' holds the
+                  open lines as returned by payment.plan.line.get_payoff_projection
+        """
+        reference_date = fields.Date.to_date(reference_date) or fields.Date.context_today(self)
+        line_projection = self.line_ids.get_payoff_projection(reference_date)
+        result = {}
+        for plan in self:
+            currency = plan.currency_id
+            lines = []
+            principal_due = interest_due = amount_due = 0.0
+            for line in plan.line_ids.sorted(lambda l: (l.date, l.id)):
+                values = line_projection[line.id]
+                if line.paid or not values['amount_due']:
+                    continue
+                lines.append(dict(values, id=line.id, name=line.name, date=line.date, amount=line.amount))
+                # Allocations pay interest first, then principal
+                interest_open = max(values['interest_amount'] - line.allocated_amount, 0.0)
+                interest_due += interest_open
+                principal_due += values['amount_due'] - interest_open
+                amount_due += values['amount_due']
+            result[plan.id] = {
+                'reference_date': reference_date,
+                'currency': currency.name,
+                'principal_due': currency.round(principal_due),
+                'interest_due': currency.round(interest_due),
+                'amount_due': currency.round(amount_due),
+                'lines': lines,
+            }
+        return result
+
+    def get_balances_as_of(self, as_of):
+        """Reconstruct the balances of these plans on a past date from their event log
+        
+        Only the plans' own events are read (see payment.plan.event), so the
+        cost does not depend on the size of the portfolio. Interest accrued on
+        unpaid lines is derived from the plans' current interest policy.
+        
+        Args:
+            as_of: Date to reconstruct
+            
+        Returns:
+            dict: plan id -> totals as of the date, and the installments they come from
+        """
+        as_of = fields.Date.to_date(as_of)
+        replayed = self.env['payment.plan.event']._replay(self.ids, as_of)
+        balances = {}
+        for plan in self:
+            currency = plan.currency_id or plan.company_id.currency_id
+            lines = [dict(values, line_id=line_id) for line_id, values in replayed[plan.id].items()]
+            lines.sort(key=lambda l: (l['due_date'] or as_of, l['line_id']))
+            open_amounts = [
+                (line, max(line['amount'] + line['interest'] - line['allocated'], 0.0))
+                for line in lines if not line['paid']
+            ]
+            balances[plan.id] = {
+                'as_of': as_of,
+                'currency': currency.name,
+                'total_amount': currency.round(sum(line['amount'] for line in lines)),
+                'amount_paid': currency.round(sum(line['amount'] for line in lines if line['paid'])),
+                'total_interest': currency.round(sum(line['interest'] for line in lines)),
+                'allocated_amount': currency.round(sum(line['allocated'] for line in lines)),
+                'amount_due': currency.round(sum(amount for _line, amount in open_amounts)),
+                'overdue_amount': currency.round(sum(
+                    amount for line, amount in open_amounts if line['due_date'] and line['due_date'] < as_of)),
+                'lines': lines,
+            }
+        return balances
+
+    def action_view_events(self):
+        self.ensure_one()
+        action = self.env['ir.actions.act_window']._for_xml_id('olivegt_sale_payment_plans.action_payment_plan_event')
+        action['domain'] = [('plan_id', '=', self.id)]
+        return action
+
+    def _log_events(self, events):
+        """Append events to the plans' log, see payment.plan.event"""
+        self.env['payment.plan.event'].sudo()._append(events)
+
+    def action_quote_payoff(self):
+        """Open the payoff quote for this plan"""
+        self.ensure_one()
+        return {
+            'name': _('Quote Payoff'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'payment.plan.payoff.wizard',
+            'view_mode': 'form',
+            'target': 'new',
+            'context': {'default_payment_plan_id': self.id},
+        }
+
     def update_overdue_status(self):
         """Update overdue days and interest for all lines in this payment plan"""
         self.ensure_one()
@@ -0,0 +1,217 @@
+from collections import defaultdict
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import models, fields, api, _
+from odoo.exceptions import AccessError
+
+from ..utils.perf import perf_phase
+from .payment_plan_snapshot import DELINQUENCY_BUCKETS
+
+# Month grid and per-installment payoff date of the vintage curves. An
+# installment is paid off on the date its confirmed allocations, summed in
+# date order with a window function, first cover its amount; lines marked
+# paid without allocations fall back to their payment date.
+LINE_PAYOFF_CTES = """
+    months AS (
+        SELECT m::date AS month_start,
+               LEAST((m + interval '1 month' - interval '1 day')::date, %(date_to)s::date) AS month_end
+          FROM generate_series(date_trunc('month', %(date_from)s::date),
+                               date_trunc('month', %(date_to)s::date), interval '1 month') m
+    ), allocations AS (
+        SELECT r.payment_plan_line_id AS line_id, r.date,
+               SUM(r.amount) OVER (PARTITION BY r.payment_plan_line_id ORDER BY r.date, r.id) AS running
+          FROM payment_plan_reconciliation r
+         WHERE r.state = 'confirmed'
+           AND r.company_id = %(company_id)s
+    ), lines AS (
+        SELECT l.id, l.payment_plan_id AS plan_id, p.date AS plan_date, l.date AS due_date, l.amount,
+               COALESCE(MIN(a.date) FILTER (WHERE ROUND(a.running - l.amount, 2) >= 0),
+                        CASE WHEN l.paid THEN COALESCE(l.payment_date, l.date) END) AS paid_off
+          FROM payment_plan_line l
+          JOIN payment_plan p ON p.id = l.payment_plan_id
+     LEFT JOIN allocations a ON a.line_id = l.id
+         WHERE p.state = 'posted'
+           AND p.company_id = %(company_id)s
+           AND p.date <= %(date_to)s
+      GROUP BY l.id, p.date
+    )
+"""
+
+
+class PaymentPlanAnalytics(models.AbstractModel):
+    """Delinquency roll rates and vintage curves for pricing the financing.
+
+    Roll rates are aggregated from the month-end snapshots, so they use the
+    delinquency buckets of payment.plan.snapshot and match its roll-rate
+    pivot. Vintage curves are computed from the installments and their
+    allocation dates, with window functions over a monthly grid. In both
+    cases only the aggregated rows come back to Python.
+    """
+    _name = 'payment.plan.analytics'
+    _description = 'Payment Plan Delinquency Analytics'
+
+    @api.model
+    def _get_analytics_params(self, date_from=None, date_to=None, company_id=None):
+        # The queries read the tables directly, so the record rules are enforced here
+        self.env['payment.plan'].check_access('read')
+        if company_id and company_id not in self.env.companies.ids:
+            raise AccessError(_("You cannot analyse the payment plans of a company you are not working in."))
+        date_to = fields.Date.to_date(date_to) or fields.Date.context_today(self)
+        date_from = fields.Date.to_date(date_from) or date_to - relativedelta(years=5)
+        return {
+            'date_from': date_from,
+            'date_to': date_to,
+            'company_id': company_id or self.env.company.id,
+        }
+
+    @api.model
+    def get_roll_rates(self, date_from=None, date_to=None, company_id=None):
+        """
+        Month-over-month movement of plans between delinquency buckets
+
+        Read from the month-end snapshots: each snapshot holds the plan's
+        bucket at the close and the one it had at the previous close. Months
+        that were never closed are missing; _close_periods on
+        payment.plan.snapshot builds them.
+
+        Args:
+            date_from: First month of the analysis, defaults to five years before date_to
+            date_to: Last day of the analysis, defaults to today
+            company_id: Company to analyse, one of the selected companies, defaults to the current company
+
+        Returns:
+            dict: 'matrix' with the transitions over the whole range and
+            'monthly' with the transitions of each month, each row holding
+            from/to buckets, plan count, overdue amount and the share of the
+            'from' bucket that moved to 'to'
+        """
+        params = self._get_analytics_params(date_from, date_to, company_id)
+        with perf_phase(self.env, 'roll_rate_analytics') as phase:
+            self.env.cr.execute("""
+                SELECT period, previous_bucket, delinquency_bucket, COUNT(*),
+                       SUM(bucket_1_30 + bucket_31_60 + bucket_61_90 + bucket_90_plus),
+                       COUNT(*)::float / SUM(COUNT(*)) OVER (PARTITION BY period, previous_bucket)
+                  FROM payment_plan_snapshot
+                 WHERE company_id = %(company_id)s
+                   AND period >= %(date_from)s
+                   AND period <= %(date_to)s
+                   AND previous_bucket IS NOT NULL
+              GROUP BY period, previous_bucket, delinquency_bucket
+              ORDER BY period, previous_bucket, delinquency_bucket
+            """, params)
+            rows = self.env.cr.fetchall()
+            phase.add_rows(len(rows))
+
+        monthly = []
+        totals = defaultdict(lambda: [0, 0.0])
+        from_counts = defaultdict(int)
+        for month_end, from_bucket, to_bucket, count, amount, rate in rows:
+            monthly.append({
+                'month': fields.Date.to_string(month_end),
+                'from': from_bucket,
+                'to': to_bucket,
+                'count': count,
+                'amount': float(amount or 0.0),
+                'rate': rate,
+            })
+            totals[from_bucket, to_bucket][0] += count
+            totals[from_bucket, to_bucket][1] += float(amount or 0.0)
+            from_counts[from_bucket] += count
+        matrix = [{
+            'from': from_bucket,
+            'to': to_bucket,
+            'count': count,
+            'amount': amount,
+            'rate': count / from_counts[from_bucket],
+        } for (from_bucket, to_bucket), (count, amount) in sorted(totals.items())]
+        return {
+            'date_from': fields.Date.to_string(params['date_from']),
+            'date_to': fields.Date.to_string(params['date_to']),
+            'buckets': [bucket for bucket, _label in DELINQUENCY_BUCKETS],
+            'matrix': matrix,
+            'monthly': monthly,
+        }
+
+    @api.model
+    def get_vintage_curves(self, date_from=None, date_to=None, company_id=None):
+        """
+        Delinquency and repayment curves of plans grouped by start month
+
+        For every vintage (month of the plan date) and month on book, gives
+        the share of the vintage's scheduled amount that is more than 30 days
+        overdue at the month end, and the cumulative share paid off, summed
+        with a window function over the payoff months.
+
+        Args:
+            date_from: First vintage, defaults to five years before date_to
+            date_to: Last day of the analysis, defaults to today
+            company_id: Company to analyse, one of the selected companies, defaults to the current company
+
+        Returns:
+            dict: 'vintages', one entry per start month with its plan count,
+            scheduled amount and 'points' per month on book
+        """
+        params = self._get_analytics_params(date_from, date_to, company_id)
+        with perf_phase(self.env, 'vintage_analytics') as phase:
+            self.env.cr.execute(f"""
+                WITH {LINE_PAYOFF_CTES},
+                vintage_lines AS (
+                    SELECT *, date_trunc('month', plan_date)::date AS vintage
+                      FROM lines
+                     WHERE plan_date >= date_trunc('month', %(date_from)s::date)
+                ), vintages AS (
+                    SELECT vintage, COUNT(DISTINCT plan_id) AS plans, SUM(amount) AS scheduled
+                      FROM vintage_lines
+                  GROUP BY vintage
+                ), paid AS (
+                    SELECT vintage, GREATEST(date_trunc('month', paid_off)::date, vintage) AS month_start,
+                           SUM(amount) AS amount
+                      FROM vintage_lines
+                     WHERE paid_off IS NOT NULL
+                  GROUP BY 1, 2
+                ), delinquent AS (
+                    SELECT l.vintage, m.month_start, SUM(l.amount) AS amount
+                      FROM vintage_lines l
+                      JOIN months m ON l.due_date < m.month_end - 30
+                                   AND (l.paid_off IS NULL OR l.paid_off > m.month_end)
+                  GROUP BY 1, 2
+                ), grid AS (
+                    SELECT v.vintage, v.plans, v.scheduled, m.month_start, m.month_end,
+                           ((EXTRACT(YEAR FROM m.month_start) - EXTRACT(YEAR FROM v.vintage)) * 12
+                            + EXTRACT(MONTH FROM m.month_start) - EXTRACT(MONTH FROM v.vintage))::int AS month_on_book
+                      FROM vintages v
+                      JOIN months m ON m.month_start >= v.vintage
+                )
+                SELECT g.vintage, g.plans, g.scheduled, g.month_on_book, g.month_end,
+                       COALESCE(d.amount, 0),
+                       SUM(COALESCE(pd.amount, 0)) OVER (PARTITION BY g.vintage ORDER BY g.month_start)
+                  FROM grid g
+             LEFT JOIN delinquent d ON d.vintage = g.vintage AND d.month_start = g.month_start
+             LEFT JOIN paid pd ON pd.vintage = g.vintage AND pd.month_start = g.month_start
+              ORDER BY g.vintage, g.month_start
+            """, params)
+            rows = self.env.cr.fetchall()
+            phase.add_rows(len(rows))
+
+        vintages = {}
+        for vintage, plans, scheduled, month_on_book, month_end, delinquent, paid in rows:
+            scheduled = float(scheduled or 0.0)
+            entry = vintages.setdefault(vintage, {
+                'vintage': vintage.strftime('%Y-%m'),
+                'plans': plans,
+                'scheduled': scheduled,
+                'points': [],
+            })
+            entry['points'].append({
+                'month_on_book': month_on_book,
+                'month': fields.Date.to_string(month_end),
+                'delinquent_30_amount': float(delinquent),
+                'delinquent_30_rate': float(delinquent) / scheduled if scheduled else 0.0,
+                'paid_rate': float(paid) / scheduled if scheduled else 0.0,
+            })
+        return {
+            'date_from': fields.Date.to_string(params['date_from']),
+            'date_to': fields.Date.to_string(params['date_to']),
+            'vintages': list(vintages.values()),
+        }
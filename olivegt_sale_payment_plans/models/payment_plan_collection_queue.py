@@ -0,0 +1,220 @@
+import logging
+
+from odoo import models, fields, api, _
+
+from ..utils.db import create_indexes
+from ..utils.perf import perf_phase
+
+_logger = logging.getLogger(__name__)
+
+COLLECTION_PARAM_PREFIX = 'olivegt_sale_payment_plans.collection_'
+# Score weights and settings, overridable with ir.config_parameter COLLECTION_PARAM_PREFIX + key
+COLLECTION_DEFAULTS = {
+    'weight_amount': 10.0,
+    'weight_days': 1.0,
+    'weight_missed': 5.0,
+    'weight_recent': 0.5,
+    'recent_days': 30,
+}
+
+COLLECTION_INDEXES = [
+    ('payment_plan_collection_queue_rank_idx', ['score DESC', 'id DESC'], ''),
+    ('payment_plan_collection_queue_agent_rank_idx', ['agent_id', 'score DESC', 'id DESC'], ''),
+]
+
+
+class PaymentPlanCollectionQueue(models.Model):
+    """Partners with overdue installments, ranked for the collections team.
+
+    One row per partner and company, rebuilt periodically by a single SQL
+    query over plan lines and allocations. The score is
+
+        weight_amount * ln(1 + overdue amount)
+        + weight_days * maximum days overdue
+        + weight_missed * overdue installments
+        - weight_recent * 100 * share of the overdue amount paid in the last recent_days
+
+    so large, old and repeated arrears come first and partners who are
+    already paying drop down. Agents page through the list by keyset and
+    take batches of partners with SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+    _name = 'payment.plan.collection.queue'
+    _description = 'Payment Plan Collection Queue'
+    _order = 'score desc, id desc'
+    _rec_name = 'partner_id'
+
+    partner_id = fields.Many2one('res.partner', string='Customer', required=True, readonly=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string='Company', required=True, readonly=True, ondelete='cascade')
+    currency_id = fields.Many2one('res.currency', related='company_id.currency_id')
+    overdue_amount = fields.Monetary('Overdue Amount', readonly=True)
+    max_overdue_days = fields.Integer('Max Days Overdue', readonly=True)
+    missed_count = fields.Integer('Overdue Installments', readonly=True)
+    last_payment_date = fields.Date('Last Payment', readonly=True)
+    recent_paid_amount = fields.Monetary('Recently Paid', readonly=True)
+    score = fields.Float('Score', digits=(16, 2), readonly=True)
+    agent_id = fields.Many2one('res.users', string='Agent', index=True)
+    assigned_at = fields.Datetime('Assigned At')
+    refreshed_at = fields.Datetime('Refreshed At', readonly=True)
+
+    _sql_constraints = [
+        ('partner_company_uniq', 'unique(partner_id, company_id)', 'A customer can only be queued once per company.'),
+    ]
+
+    def init(self):
+        super().init()
+        create_indexes(self.env.cr, self._table, COLLECTION_INDEXES)
+
+    @api.model
+    def _get_score_settings(self):
+        config = self.env['ir.config_parameter'].sudo()
+        return {
+            key: type(default)(config.get_param(COLLECTION_PARAM_PREFIX + key, default))
+            for key, default in COLLECTION_DEFAULTS.items()
+        }
+
+    @api.model
+    def _refresh_queue(self, today=None):
+        """Scheduled action: rebuild the scores of every partner with overdue installments
+
+        Existing rows keep their agent assignment; partners that are no longer
+        overdue leave the queue.
+        """
+        today = today or fields.Date.context_today(self)
+        params = dict(self._get_score_settings(), today=today, uid=self.env.uid)
+        with perf_phase(self.env, 'collection_queue_refresh') as phase:
+            self.env.cr.execute("""
+                WITH overdue AS (
+                    SELECT p.partner_id, p.company_id,
+                           SUM(GREATEST(COALESCE(l.total_with_interest, l.amount) - COALESCE(l.allocated_amount, 0), 0))
+                               AS overdue_amount,
+                           MAX(%(today)s::date - l.date) AS max_overdue_days,
+                           COUNT(*) AS missed_count
+                      FROM payment_plan_line l
+                      JOIN payment_plan p ON p.id = l.payment_plan_id
+                     WHERE (l.paid IS NULL OR l.paid = FALSE)
+                       AND l.date < %(today)s
+                       AND p.state = 'posted'
+                       AND p.partner_id IS NOT NULL
+                  GROUP BY p.partner_id, p.company_id
+                ), payments AS (
+                    SELECT r.partner_id, r.company_id,
+                           MAX(r.date) AS last_payment_date,
+                           SUM(r.amount) FILTER (WHERE r.date >= %(today)s::date - %(recent_days)s) AS recent_paid
+                      FROM payment_plan_reconciliation r
+                      JOIN overdue o ON o.partner_id = r.partner_id AND o.company_id = r.company_id
+                     WHERE r.state = 'confirmed'
+                  GROUP BY r.partner_id, r.company_id
+                )
+                INSERT INTO payment_plan_collection_queue (
+                    partner_id, company_id, overdue_amount, max_overdue_days, missed_count,
+                    last_payment_date, recent_paid_amount, score, refreshed_at,
+                    create_uid, create_date, write_uid, write_date)
+                SELECT o.partner_id, o.company_id, o.overdue_amount, o.max_overdue_days, o.missed_count,
+                       pay.last_payment_date, COALESCE(pay.recent_paid, 0),
+                       %(weight_amount)s * ln(1 + o.overdue_amount)
+                       + %(weight_days)s * o.max_overdue_days
+                       + %(weight_missed)s * o.missed_count
+                       - %(weight_recent)s * 100 * LEAST(COALESCE(pay.recent_paid, 0) / NULLIF(o.overdue_amount, 0), 1),
+                       now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                  FROM overdue o
+             LEFT JOIN payments pay ON pay.partner_id = o.partner_id AND pay.company_id = o.company_id
+                    ON CONFLICT (partner_id, company_id) DO UPDATE
+                   SET overdue_amount = EXCLUDED.overdue_amount,
+                       max_overdue_days = EXCLUDED.max_overdue_days,
+                       missed_count = EXCLUDED.missed_count,
+                       last_payment_date = EXCLUDED.last_payment_date,
+                       recent_paid_amount = EXCLUDED.recent_paid_amount,
+                       score = EXCLUDED.score,
+                       refreshed_at = EXCLUDED.refreshed_at,
+                       write_uid = EXCLUDED.write_uid,
+                       write_date = EXCLUDED.write_date
+            """, params)
+            phase.add_rows(self.env.cr.rowcount)
+            # Rows not touched by this refresh belong to partners who are no longer overdue
+            self.env.cr.execute("""
+                DELETE FROM payment_plan_collection_queue
+                 WHERE refreshed_at < now() at time zone 'UTC'
+            """)
+            self.invalidate_model()
+        return True
+
+    @api.model
+    def get_worklist_page(self, after=None, limit=50, agent_id=None, company_id=None):
+        """
+        Return one page of the ranked worklist using keyset pagination
+
+        Args:
+            after: (score, id) of the last row of the previous page, or None for the first page
+            limit: Page size
+            agent_id: Only rows assigned to this user; False for unassigned rows
+            company_id: Company to list, defaults to the current company
+
+        Returns:
+            dict: {'rows': [...], 'next': (score, id) to pass as ``after``, or None}
+        """
+        domain = [('company_id', '=', company_id or self.env.company.id)]
+        if agent_id is not None:
+            domain.append(('agent_id', '=', agent_id))
+        if after:
+            score, last_id = after
+            domain += ['|', ('score', '<', score), '&', ('score', '=', score), ('id', '<', last_id)]
+        rows = self.search_read(domain, [
+            'partner_id', 'overdue_amount', 'max_overdue_days', 'missed_count',
+            'last_payment_date', 'recent_paid_amount', 'score', 'agent_id',
+        ], limit=limit, order='score desc, id desc')
+        next_key = (rows[-1]['score'], rows[-1]['id']) if len(rows) == limit else None
+        return {'rows': rows, 'next': next_key}
+
+    @api.model
+    def assign_next_batch(self, size=20, agent=None):
+        """
+        Assign the highest-ranked unassigned partners to an agent
+
+        Rows locked by a concurrent assignment are skipped instead of waited
+        for, so several agents can take batches at the same time.
+
+        Returns:
+            payment.plan.collection.queue: the rows assigned
+        """
+        agent = agent or self.env.user
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE payment_plan_collection_queue
+               SET agent_id = %(agent)s,
+                   assigned_at = now() at time zone 'UTC'
+             WHERE id IN (
+                   SELECT id
+                     FROM payment_plan_collection_queue
+                    WHERE agent_id IS NULL
+                      AND company_id = %(company)s
+                    ORDER BY score DESC, id DESC
+                    LIMIT %(size)s
+                      FOR UPDATE SKIP LOCKED)
+         RETURNING id
+        """, {'agent': agent.id, 'company': self.env.company.id, 'size': size})
+        assigned = self.browse([row[0] for row in self.env.cr.fetchall()])
+        assigned.invalidate_recordset(['agent_id', 'assigned_at'])
+        return assigned
+
+    def action_take_next_batch(self):
+        """Button: take the next batch of partners for the current user and show the user's worklist"""
+        self.assign_next_batch()
+        action = self.env['ir.actions.act_window']._for_xml_id(
+            'olivegt_sale_payment_plans.action_payment_plan_collection_queue')
+        action['context'] = {'search_default_my_worklist': 1}
+        return action
+
+    def action_release(self):
+        """Give the selected partners back to the shared queue"""
+        self.write({'agent_id': False, 'assigned_at': False})
+        return True
+
+    def action_view_plans(self):
+        self.ensure_one()
+        return {
+            'name': _('Payment Plans'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'payment.plan',
+            'view_mode': 'list,form',
+            'domain': [('partner_id', '=', self.partner_id.id), ('company_id', '=', self.company_id.id)],
+        }
@@ -0,0 +1,222 @@
+from collections import namedtuple
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+from ..utils.db import create_indexes
+from ..utils.payment_helpers import compute_overdue_interest
+
+EVENT_INDEXES = [
+    ('payment_plan_event_plan_idx', ['plan_id', 'id'], ''),
+]
+
+# Columns written by payment.plan.event._append, in order
+PlanEvent = namedtuple('PlanEvent', [
+    'plan_id', 'event_type', 'event_date', 'line_id', 'reconciliation_id', 'due_date', 'amount',
+    'interest_method', 'interest_rate',
+], defaults=(None, None, None, None, None, None))
+
+
+class PaymentPlanEvent(models.Model):
+    """Append-only log of what happened to a plan's installments.
+
+    Events are written in bulk by the batch paths (allocation confirm and
+    cancel, mark as paid or unpaid, schedule changes) with one INSERT per
+    call, and are never updated or deleted afterwards. Lines and
+    allocations are referenced by plain integer ids so their events outlive
+    them when a schedule is regenerated.
+
+    Interest is only logged when it is settled (a line is paid) or edited
+    by hand. The interest accruing every day on unpaid lines is not logged,
+    which would add one row per past-due line and day; the replay derives
+    it from the plan's interest settings in force on the date replayed,
+    logged when a plan is created and whenever they change.
+
+    The amount depends on the event type:
+
+    - line_scheduled: the installment amount, with its due date
+    - allocation_confirmed / allocation_cancelled: the amount allocated
+    - line_paid: the total settled, interest included
+    - interest_changed: the new interest of the line, not a difference
+    - interest_policy_changed: the fixed monthly interest, with the method and rate
+    """
+    _name = 'payment.plan.event'
+    _description = 'Payment Plan Event'
+    _order = 'id'
+    _log_access = False
+
+    plan_id = fields.Many2one('payment.plan', string='Payment Plan', required=True, readonly=True, ondelete='cascade')
+    event_type = fields.Selection([
+        ('schedule_regenerated', 'Schedule Regenerated'),
+        ('line_scheduled', 'Installment Scheduled'),
+        ('line_removed', 'Installment Removed'),
+        ('allocation_confirmed', 'Allocation Confirmed'),
+        ('allocation_cancelled', 'Allocation Cancelled'),
+        ('line_paid', 'Installment Paid'),
+        ('line_unpaid', 'Installment Unpaid'),
+        ('interest_changed', 'Interest Changed'),
+        ('interest_policy_changed', 'Interest Settings Changed'),
+    ], string='Event', required=True, readonly=True)
+    event_date = fields.Date('Effective Date', required=True, readonly=True)
+    line_id = fields.Integer('Installment', readonly=True)
+    reconciliation_id = fields.Integer('Allocation', readonly=True)
+    due_date = fields.Date('Due Date', readonly=True)
+    amount = fields.Monetary('Amount', readonly=True)
+    interest_method = fields.Selection([
+        ('percentage', 'Monthly Percentage'),
+        ('fixed', 'Fixed Monthly Amount'),
+    ], string='Interest Calculation Method', readonly=True)
+    interest_rate = fields.Float('Monthly Interest Rate (%)', readonly=True)
+    currency_id = fields.Many2one('res.currency', related='plan_id.currency_id')
+    logged_at = fields.Datetime('Logged At', readonly=True)
+    user_id = fields.Many2one('res.users', string='User', readonly=True)
+
+    def init(self):
+        super().init()
+        create_indexes(self.env.cr, self._table, EVENT_INDEXES)
+        self.env.cr.execute("SELECT 1 FROM payment_plan_event LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._backfill()
+
+    def _backfill(self):
+        """First install: log the current state of every plan as its starting events"""
+        cr = self.env.cr
+        cr.execute("""
+            INSERT INTO payment_plan_event (
+                plan_id, event_type, event_date, amount, interest_method, interest_rate, logged_at)
+            SELECT id, 'interest_policy_changed', COALESCE(create_date::date, date), fixed_interest_amount,
+                   interest_calculation_method, interest_rate, now() at time zone 'UTC'
+              FROM payment_plan
+          ORDER BY id
+        """)
+        cr.execute("""
+            INSERT INTO payment_plan_event (plan_id, event_type, event_date, line_id, due_date, amount, logged_at)
+            SELECT payment_plan_id, 'line_scheduled', COALESCE(create_date::date, date), id, date, amount,
+                   now() at time zone 'UTC'
+              FROM payment_plan_line
+          ORDER BY id
+        """)
+        cr.execute("""
+            INSERT INTO payment_plan_event (plan_id, event_type, event_date, line_id, reconciliation_id, amount, logged_at)
+            SELECT payment_plan_id, 'allocation_confirmed', date, payment_plan_line_id, id, amount,
+                   now() at time zone 'UTC'
+              FROM payment_plan_reconciliation
+             WHERE state = 'confirmed'
+               AND payment_plan_id IS NOT NULL
+          ORDER BY id
+        """)
+        cr.execute("""
+            INSERT INTO payment_plan_event (plan_id, event_type, event_date, line_id, amount, logged_at)
+            SELECT payment_plan_id, 'line_paid', COALESCE(payment_date, CURRENT_DATE), id, total_with_interest,
+                   now() at time zone 'UTC'
+              FROM payment_plan_line
+             WHERE paid
+          ORDER BY id
+        """)
+
+    @api.model
+    def _append(self, events):
+        """
+        Append events with a single INSERT
+
+        Args:
+            events (list[PlanEvent]): Events to log, in the order they happened
+        """
+        if not events:
+            return
+        columns = list(zip(*events))
+        self.env.cr.execute("""
+            INSERT INTO payment_plan_event (
+                plan_id, event_type, event_date, line_id, reconciliation_id, due_date, amount,
+                interest_method, interest_rate, logged_at, user_id)
+            SELECT v.plan_id, v.event_type, v.event_date, v.line_id, v.reconciliation_id, v.due_date, v.amount,
+                   v.interest_method, v.interest_rate, now() at time zone 'UTC', %s
+              FROM unnest(%s::int[], %s::varchar[], %s::date[], %s::int[], %s::int[], %s::date[], %s::numeric[],
+                          %s::varchar[], %s::float8[])
+                   WITH ORDINALITY AS v(plan_id, event_type, event_date, line_id, reconciliation_id, due_date, amount,
+                                        interest_method, interest_rate, n)
+          ORDER BY v.n
+        """, [self.env.uid] + [list(column) for column in columns])
+
+    def write(self, vals):
+        raise UserError(_("Payment plan events cannot be modified."))
+
+    def unlink(self):
+        raise UserError(_("Payment plan events cannot be deleted."))
+
+    @api.model
+    def _replay(self, plan_ids, as_of):
+        """
+        Rebuild the installments of plans as of a date from their events
+
+        Paid lines carry the interest they were settled with. Unpaid lines
+        accrue interest up to ``as_of`` with the interest settings of their
+        plan in force on that date, as the daily past-due refresh does. An
+        interest edited by hand holds until the line is rescheduled, paid or
+        unpaid, or the plan's interest settings change, which is when the
+        refresh computes it again. Plans without logged settings fall back
+        to their current ones.
+
+        Args:
+            plan_ids (list[int]): Plans to replay
+            as_of (date): Events with a later effective date are ignored
+
+        Returns:
+            dict: plan id -> {line id -> {'due_date', 'amount', 'interest', 'allocated', 'paid'}}
+        """
+        self.env.cr.execute("""
+            SELECT plan_id, event_type, line_id, due_date, amount, interest_method, interest_rate
+              FROM payment_plan_event
+             WHERE plan_id = ANY(%s)
+               AND event_date <= %s
+          ORDER BY plan_id, id
+        """, (list(plan_ids), as_of))
+        plans = {plan_id: {} for plan_id in plan_ids}
+        policies = {}
+        # Unpaid lines whose interest was edited by hand since it was last computed
+        edited = set()
+        for plan_id, event_type, line_id, due_date, amount, interest_method, interest_rate in self.env.cr.fetchall():
+            lines = plans[plan_id]
+            amount = float(amount or 0.0)
+            if event_type == 'interest_policy_changed':
+                policies[plan_id] = (interest_method, interest_rate, amount)
+                edited.difference_update(lines)
+                continue
+            if event_type == 'schedule_regenerated':
+                lines.clear()
+                continue
+            if event_type == 'line_removed':
+                lines.pop(line_id, None)
+                continue
+            line = lines.setdefault(line_id, {
+                'due_date': due_date, 'amount': 0.0, 'interest': 0.0, 'allocated': 0.0, 'paid': False,
+            })
+            if event_type == 'line_scheduled':
+                line['due_date'] = due_date
+                line['amount'] = amount
+                edited.discard(line_id)
+            elif event_type == 'allocation_confirmed':
+                line['allocated'] += amount
+            elif event_type == 'allocation_cancelled':
+                line['allocated'] -= amount
+            elif event_type == 'line_paid':
+                line['paid'] = True
+                line['interest'] = amount - line['amount']
+            elif event_type == 'line_unpaid':
+                line['paid'] = False
+                edited.discard(line_id)
+            elif event_type == 'interest_changed':
+                line['interest'] = amount
+                edited.add(line_id)
+
+        for plan in self.env['payment.plan'].browse(plan_ids):
+            currency = plan.currency_id or plan.company_id.currency_id
+            method, rate, fixed_amount = policies.get(plan.id) or plan._get_interest_policy()
+            for line_id, line in plans[plan.id].items():
+                if line['paid'] or line_id in edited:
+                    continue
+                days = (as_of - line['due_date']).days if line['due_date'] else 0
+                line['interest'] = currency.round(compute_overdue_interest(
+                    line['amount'], days, method, interest_rate=rate, fixed_interest_amount=fixed_amount,
+                ))
+        return plans
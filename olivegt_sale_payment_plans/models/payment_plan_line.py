@@ -3,7 +3,27 @@ from odoo.exceptions import ValidationError
 from odoo.tools import float_compare, float_is_zero
 from datetime import datetime, date
 import logging
-import math
+
+from ..utils.db import create_indexes
+from ..utils.payment_helpers import compute_overdue_interest, overdue_interest_sql
+from ..utils.perf import perf_phase
+from .payment_plan_event import PlanEvent
+
+# Indexes backing the hot lookups on payment plan lines. The unpaid index
+# predicate is spelled exactly as the ORM compiles ('paid', '=', False), so
+# PostgreSQL can match it both for domains and for the raw queries, which
+# use the same expression.
+LINE_INDEXES = [
+    ('payment_plan_line_plan_date_idx', ['payment_plan_id', 'date'], ''),
+    ('payment_plan_line_payment_date_idx', ['payment_date'], 'payment_date IS NOT NULL'),
+    ('payment_plan_line_unpaid_date_idx', ['date'], 'paid IS NULL OR paid = FALSE'),
+]
+
+OVERDUE_CHUNK_SIZE_PARAM = 'olivegt_sale_payment_plans.overdue_cron_chunk_size'
+
+# Interest of an unpaid line overdue d.days days under the settings of its plan p
+LINE_INTEREST_SQL = overdue_interest_sql(
+    'l.amount', 'd.days', 'p.interest_calculation_method', 'p.interest_rate', 'p.fixed_interest_amount')
 
 
 class PaymentPlanLine(models.Model):
@@ -15,6 +35,9 @@ class PaymentPlanLine(models.Model):
     currency_id = fields.Many2one('res.currency', related='payment_plan_id.currency_id', store=True)
     date = fields.Date('Due Date', required=True)
     amount = fields.Monetary('Amount', required=True)
+    financing_interest = fields.Monetary('Financing Interest', default=0.0,
+                                         help="Scheduled interest included in the amount of financed installments")
+    principal_amount = fields.Monetary('Principal', compute='_compute_principal_amount', store=True)
     name = fields.Char('Description')
     paid = fields.Boolean('Paid', default=False)
     payment_date = fields.Date('Payment Date')
@@ -22,7 +45,12 @@ class PaymentPlanLine(models.Model):
     running_balance = fields.Monetary('Running Balance', compute='_compute_running_balance', store=True)
     overdue_days = fields.Integer('Overdue Days', compute='_compute_overdue_days', store=True, readonly=False)
     interest_amount = fields.Monetary('Interest', compute='_compute_interest_amount', store=True, readonly=False)
+    interest_edited = fields.Boolean('Interest Edited', compute='_compute_interest_edited', store=True,
+                                     readonly=False, copy=False,
+                                     help="Interest set by hand, kept by the daily refresh until its inputs change")
     total_with_interest = fields.Monetary('Total with Interest', compute='_compute_total_with_interest', store=True)
+    dunning_level = fields.Integer('Reminder Level', default=0, readonly=True, copy=False,
+                                   help="Highest overdue reminder level already sent for this installment")
     
     # New fields for reconciliation
     reconciliation_ids = fields.One2many('payment.plan.reconciliation', 'payment_plan_line_id', string='Reconciliations')
@@ -51,6 +79,54 @@ class PaymentPlanLine(models.Model):
         store=True
     )
 
+    def init(self):
+        super().init()
+        create_indexes(self.env.cr, self._table, LINE_INDEXES)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        today = fields.Date.context_today(self)
+        lines.payment_plan_id._log_events([
+            PlanEvent(line.payment_plan_id.id, 'line_scheduled', today,
+                      line_id=line.id, due_date=line.date, amount=line.amount)
+            for line in lines
+        ])
+        return lines
+
+    def write(self, vals):
+        # Interest written by the recompute paths is derived, only edits by hand are logged
+        log_interest = 'interest_amount' in vals and not self.env.context.get('payment_plan_interest_refresh')
+        old_interest = {line.id: line.interest_amount for line in self} if log_interest else {}
+        res = super().write(vals)
+        today = fields.Date.context_today(self)
+        events = []
+        if 'amount' in vals or 'date' in vals:
+            events += [
+                PlanEvent(line.payment_plan_id.id, 'line_scheduled', today,
+                          line_id=line.id, due_date=line.date, amount=line.amount)
+                for line in self
+            ]
+        if log_interest:
+            edited = self.filtered(
+                lambda line: line.currency_id.compare_amounts(line.interest_amount, old_interest[line.id]))
+            super(PaymentPlanLine, edited).write({'interest_edited': True})
+            events += [
+                PlanEvent(line.payment_plan_id.id, 'interest_changed', today,
+                          line_id=line.id, amount=line.interest_amount)
+                for line in edited
+            ]
+        self.payment_plan_id._log_events(events)
+        return res
+
+    def unlink(self):
+        today = fields.Date.context_today(self)
+        self.payment_plan_id._log_events([
+            PlanEvent(line.payment_plan_id.id, 'line_removed', today, line_id=line.id)
+            for line in self
+        ])
+        return super().unlink()
+
     @api.depends('total_with_interest', 'allocated_amount')
     def _compute_show_reconcile_button(self):
         for record in self:
@@ -141,37 +217,42 @@ class PaymentPlanLine(models.Model):
                 # For unpaid lines with payment_date set
                 delta = line.payment_date - line.date
                 line.overdue_days = delta.days if delta.days > 0 else 0
+            elif line.date < fields.Date.context_today(line):
+                # Unpaid and past due: overdue as of today (kept current by the daily refresh)
+                line.overdue_days = (fields.Date.context_today(line) - line.date).days
             else:
-                # No payment date, no overdue days calculation
+                # Not due yet
                 line.overdue_days = 0
 
-    @api.depends('overdue_days', 'amount', 'payment_plan_id.interest_rate', 'date', 'paid', 'payment_date')
+    @api.depends('overdue_days', 'amount', 'date', 'paid', 'payment_date')
     def _compute_interest_amount(self):
+        # Only runs when a dependency changes, so an interest edited by hand is kept until then
         for line in self:
             if not line.payment_date:
-                # No payment date set, cannot calculate interest
-                line.interest_amount = 0
+                # Unpaid past-due lines accrue interest up to today; otherwise there is nothing to charge
+                if not line.paid and line.overdue_days > 0:
+                    line.interest_amount = line._calculate_interest_for_days(line.overdue_days)
+                else:
+                    line.interest_amount = 0
                 continue
-            
-            reference_date = line.payment_date
-            
-            # Handle different cases for paid and unpaid lines
-            if not line.date or line.date >= reference_date or line.overdue_days <= 0:
-                # No interest for future due dates or no overdue days
+
+            if not line.date or line.date >= line.payment_date:
+                # Paid on or before the due date
                 line.interest_amount = 0
-            elif line.payment_date and line.date < line.payment_date:
-                # For paid lines with payment date, use the payment date for interest calculation
-                # Only if the stored interest_amount is zero, calculate it
-                if not line.interest_amount:
-                    delta_days = (line.payment_date - line.date).days
-                    if delta_days > 0:
-                        # Use calculate_interest_for_days helper method
-                        line.interest_amount = line._calculate_interest_for_days(delta_days)
-                # If interest amount is already set, keep it (from mark_as_paid)
             else:
-                # For unpaid lines or special cases, calculate interest normally
-                line.interest_amount = line._calculate_interest_for_days(line.overdue_days)
+                # Interest is due up to the payment date, replacing what had accrued up to today
+                line.interest_amount = line._calculate_interest_for_days((line.payment_date - line.date).days)
     
+    @api.depends('overdue_days', 'amount', 'date', 'paid', 'payment_date')
+    def _compute_interest_edited(self):
+        # Same inputs as the interest: when one changes, the interest is computed again
+        self.interest_edited = False
+
+    @api.depends('amount', 'financing_interest')
+    def _compute_principal_amount(self):
+        for line in self:
+            line.principal_amount = line.amount - line.financing_interest
+
     @api.depends('amount', 'interest_amount')
     def _compute_total_with_interest(self):
         """Compute total with interest separately to allow manually editing interest"""
@@ -187,105 +268,118 @@ class PaymentPlanLine(models.Model):
     
     def mark_as_paid(self, respect_manual_edits=True):
         """
-        Mark a payment line as paid
+        Mark payment lines as paid
+        
+        Lines without a payment date are skipped. The final overdue days,
+        interest and totals are computed for the whole recordset and written
+        with a single statement inside the caller's transaction.
         
         Args:
             respect_manual_edits: If True, will preserve manually edited overdue days and interest
         """
-        for line in self:
-            if not line.payment_date:
-                continue
-            # Store original interest data
-            original_interest = line.interest_amount
-            original_total = line.total_with_interest
-            original_overdue_days = line.overdue_days
-            
-            # Calculate interest using payment date before marking as paid
+        lines = self.filtered('payment_date')
+        if not lines:
+            return True
+        line_ids, days_list, interests, totals, events = [], [], [], [], []
+        for line in lines:
+            if line.paid or respect_manual_edits:
+                # Keep the interest the line already carries
+                overdue_days = line.overdue_days
+                interest_amount = line.interest_amount
+            else:
+                # Settle the interest as of the payment date
+                overdue_days = max((line.payment_date - line.date).days, 0) if line.date else 0
+                interest_amount = line.currency_id.round(line._calculate_interest_for_days(overdue_days))
+            line_ids.append(line.id)
+            days_list.append(overdue_days)
+            interests.append(interest_amount)
+            totals.append(line.amount + interest_amount)
+            if line.currency_id.compare_amounts(interest_amount, line.interest_amount):
+                events.append(PlanEvent(line.payment_plan_id.id, 'interest_changed', line.payment_date,
+                                        line_id=line.id, amount=interest_amount))
             if not line.paid:
-                # Use the payment date for calculation
-                line.calculate_and_store_interest(line.payment_date, respect_manual_edits)
-                
-                # If previous calculation resulted in zero interest but there was overdue,
-                # restore the original values which may have been computed before
-                if respect_manual_edits and line.interest_amount == 0 and original_overdue_days > 0 and original_interest > 0:
-                    line.interest_amount = original_interest
-                    line.total_with_interest = original_total
-                    line.overdue_days = original_overdue_days
-            
-            # Now mark as paid, preserving the interest calculation
-            line.paid = True
-            
-            # Force direct database update to ensure interest values are preserved
-            self.env.cr.execute("""
-                UPDATE payment_plan_line 
-                SET paid = TRUE,
-                    payment_date = %s,
-                    interest_amount = %s,
-                    total_with_interest = %s,
-                    overdue_days = %s
-                WHERE id = %s
-            """, (line.payment_date, line.interest_amount, line.total_with_interest, line.overdue_days, line.id))
-            
-            # Flush to ensure changes are committed
-            self.env.cr.commit()
+                events.append(PlanEvent(line.payment_plan_id.id, 'line_paid', line.payment_date,
+                                        line_id=line.id, amount=line.amount + interest_amount))
+        
+        lines.payment_plan_id._log_events(events)
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE payment_plan_line l
+               SET paid = TRUE,
+                   overdue_days = v.days,
+                   interest_amount = v.interest,
+                   total_with_interest = v.total
+              FROM unnest(%s::int[], %s::int[], %s::numeric[], %s::numeric[]) AS v(id, days, interest, total)
+             WHERE l.id = v.id
+        """, (line_ids, days_list, interests, totals))
+        lines._settle_written_fields(['paid'])
+        return True
 
     def mark_as_unpaid(self, respect_manual_edits=True):
         """
-        Mark a payment line as unpaid
+        Mark payment lines as unpaid
+        
+        The payment date and reference are cleared. Lines that had a payment
+        date keep the interest computed up to that date; the others carry
+        the days and interest overdue as of today, zero when not due yet.
+        Lines that were paid start over from reminder level 0. All lines are
+        written with a single statement inside the caller's transaction.
         
         Args:
             respect_manual_edits: If True, will preserve manually edited overdue days and interest
         """
+        if not self:
+            return True
+        today = fields.Date.context_today(self)
+        line_ids, days_list, interests, totals, events = [], [], [], [], []
         for line in self:
-            # Store original values before changing status
-            original_interest = line.interest_amount
-            original_total = line.total_with_interest
-            original_overdue_days = line.overdue_days
-            original_payment_date = line.payment_date
-            
-            # Update payment status
-            line.paid = False
-            line.payment_reference = False
-            
-            # Keep payment_date temporarily for interest calculations
-            if original_payment_date:
-                # Calculate interest based on the stored payment date
-                line.calculate_and_store_interest(original_payment_date, respect_manual_edits)
-                
-                # Now clear payment date after calculation
-                line.payment_date = False
-                
-                # Force database update to preserve the calculated values
-                self.env.cr.execute("""
-                    UPDATE payment_plan_line 
-                    SET paid = FALSE,
-                        payment_date = NULL,
-                        payment_reference = NULL,
-                        interest_amount = %s,
-                        total_with_interest = %s,
-                        overdue_days = %s
-                    WHERE id = %s
-                """, (line.interest_amount, line.total_with_interest, line.overdue_days, line.id))
-                
-                # Flush to ensure changes are committed
-                self.env.cr.commit()
+            if not line.payment_date:
+                # No payment date was recorded: days and interest as of today, as the daily past-due refresh does
+                overdue_days = max((today - line.date).days, 0) if line.date else 0
+                interest_amount = line.currency_id.round(line._calculate_interest_for_days(overdue_days))
+            elif respect_manual_edits:
+                overdue_days = line.overdue_days
+                interest_amount = line.interest_amount
             else:
-                # If no payment date was recorded, reset values
-                # Force database update
-                self.env.cr.execute("""
-                    UPDATE payment_plan_line 
-                    SET paid = FALSE,
-                        payment_date = NULL,
-                        payment_reference = NULL,
-                        interest_amount = 0,
-                        total_with_interest = %s,
-                        overdue_days = 0
-                    WHERE id = %s
-                """, (line.amount, line.id))
-                
-                # Flush to ensure changes are committed
-                self.env.cr.commit()
-            
+                overdue_days = max((line.payment_date - line.date).days, 0) if line.date else 0
+                interest_amount = line.currency_id.round(line._calculate_interest_for_days(overdue_days))
+            line_ids.append(line.id)
+            days_list.append(overdue_days)
+            interests.append(interest_amount)
+            totals.append(line.amount + interest_amount)
+            if line.paid:
+                events.append(PlanEvent(line.payment_plan_id.id, 'line_unpaid', today, line_id=line.id))
+        
+        self.payment_plan_id._log_events(events)
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE payment_plan_line l
+               SET paid = FALSE,
+                   payment_date = NULL,
+                   payment_reference = NULL,
+                   dunning_level = CASE WHEN l.paid THEN 0 ELSE l.dunning_level END,
+                   overdue_days = v.days,
+                   interest_amount = v.interest,
+                   total_with_interest = v.total
+              FROM unnest(%s::int[], %s::int[], %s::numeric[], %s::numeric[]) AS v(id, days, interest, total)
+             WHERE l.id = v.id
+        """, (line_ids, days_list, interests, totals))
+        self._settle_written_fields(['paid', 'payment_date', 'payment_reference', 'dunning_level'])
+        return True
+
+    def _settle_written_fields(self, fnames):
+        """Sync the cache after a raw UPDATE of ``fnames`` and the interest fields
+        
+        The interest fields written alongside are final, so their computes
+        are dropped; everything else that depends on them (states, running
+        balances, plan totals) is recomputed by the ORM.
+        """
+        interest_fnames = ['overdue_days', 'interest_amount', 'total_with_interest']
+        self.invalidate_recordset(fnames + interest_fnames)
+        self.modified(fnames + interest_fnames)
+        for fname in interest_fnames:
+            self.env.remove_to_compute(self._fields[fname], self)
+
     def calculate_and_store_interest(self, reference_date=None, respect_manual_edits=True):
         """Calculate and store interest for a payment line
         
@@ -330,10 +424,13 @@ class PaymentPlanLine(models.Model):
         # Calculate total with interest
         final_total_with_interest = self.amount + final_interest_amount
         
-        # Store the final values
-        self.overdue_days = final_overdue_days
-        self.interest_amount = final_interest_amount
-        self.total_with_interest = final_total_with_interest
+        # Store the final values, flagged as a recompute so no manual edit is logged
+        self.with_context(payment_plan_interest_refresh=True).write({
+            'overdue_days': final_overdue_days,
+            'interest_amount': final_interest_amount,
+            'total_with_interest': final_total_with_interest,
+            'interest_edited': self.interest_edited if respect_manual_edits else False,
+        })
         
         # Return the calculated values
         return {
@@ -381,60 +478,235 @@ class PaymentPlanLine(models.Model):
                 line.calculate_and_store_interest(line.payment_date, respect_manual_edits=False)
             else:
                 # Reset values for lines without payment_date
-                line.overdue_days = 0
-                line.interest_amount = 0
-                line.total_with_interest = line.amount
+                line.with_context(payment_plan_interest_refresh=True).write({
+                    'overdue_days': 0,
+                    'interest_amount': 0,
+                    'total_with_interest': line.amount,
+                })
             
         # Ensure UI gets refreshed
         self.flush_recordset(['overdue_days', 'interest_amount', 'total_with_interest'])
         
         return {"type": "ir.actions.client", "tag": "reload"}
 
+    @api.model
+    def _update_overdue_chunk(self, lines, respect_manual_edits=True):
+        """Recalculate overdue days and interest for one chunk of lines with a payment date"""
+        lines = lines.with_context(payment_plan_interest_refresh=True)
+        for line in lines:
+            # Calculate using payment date
+            result = line.calculate_and_store_interest(line.payment_date, respect_manual_edits)
+            
+            # Only update the database if we're not respecting manual edits or if values changed
+            if not respect_manual_edits:
+                # Store calculated values directly in database for better performance
+                self.env.cr.execute("""
+                    UPDATE payment_plan_line 
+                    SET overdue_days = %s, interest_amount = %s, total_with_interest = %s 
+                    WHERE id = %s
+                """, (result['overdue_days'], result['interest_amount'], 
+                    result['total_with_interest'], line.id))
+        
+        # Force recomputation of the total_with_interest field that depends on these values
+        self.env.add_to_compute(self._fields['total_with_interest'], lines)
+
     @api.model
     def _update_overdue_lines(self, respect_manual_edits=True):
         """
         This method is meant to be called from a scheduled action (cron job)
         to update overdue days and interest on all payment plan lines
         
+        Each call processes one chunk of lines by ascending id and moves the
+        checkpoint of the run (a payment.plan.overdue.shard covering every
+        line) past it, in the same transaction. The lines left are reported
+        through the cron progress API, so the cron runner calls the method
+        again, commits between calls and reschedules the job while lines
+        remain; a run that is killed resumes after its last committed chunk.
+        
+        When more than one overdue worker is configured, the lines are split
+        into shards that several cron workers process in parallel instead
+        (see payment.plan.overdue.shard).
+        
         Args:
             respect_manual_edits: If True, will not overwrite manually edited values
         """
-        # Get all lines with payment_date set
-        lines_to_update = self.search([
-            ('payment_date', '!=', False),
-        ])
-        
         _logger = logging.getLogger(__name__)
-        _logger.info(f"Updating {len(lines_to_update)} payment plan lines, respect_manual_edits={respect_manual_edits}")
+        shard_model = self.env['payment.plan.overdue.shard']
+        if shard_model._get_worker_count() > 1:
+            return shard_model._dispatch(respect_manual_edits=respect_manual_edits)
         
-        # Process lines in batches for better performance
-        if lines_to_update:
-            _logger.info("Processing payment plan lines for interest calculation")
-            
-            # Update each line with appropriate reference date
-            for line in lines_to_update:
-                # Calculate using payment date
-                result = line.calculate_and_store_interest(line.payment_date, respect_manual_edits)
-                
-                # Only update the database if we're not respecting manual edits or if values changed
-                if not respect_manual_edits:
-                    # Store calculated values directly in database for better performance
-                    self.env.cr.execute("""
-                        UPDATE payment_plan_line 
-                        SET overdue_days = %s, interest_amount = %s, total_with_interest = %s 
-                        WHERE id = %s
-                    """, (result['overdue_days'], result['interest_amount'], 
-                        result['total_with_interest'], line.id))
-            
-            # Flush all pending operations to database
-            self.env.cr.commit()
-            
-            # Force recomputation of the total_with_interest field that depends on these values
-            self.env.add_to_compute(self._fields['total_with_interest'], lines_to_update)
+        chunk_size = int(self.env['ir.config_parameter'].sudo().get_param(OVERDUE_CHUNK_SIZE_PARAM, 1000))
+        run = shard_model._get_sequential_run(respect_manual_edits)
+        domain = [('payment_date', '!=', False)]
+        
+        with perf_phase(self.env, 'overdue_cron') as phase:
+            lines = self.search(domain + [('id', '>', run.last_line_id)], order='id', limit=chunk_size)
+            if lines:
+                self._update_overdue_chunk(lines, run.respect_manual_edits)
+                run.write({
+                    'last_line_id': lines[-1].id,
+                    'processed_count': run.processed_count + len(lines),
+                })
+                phase.add_rows(len(lines))
+            remaining = self.search_count(domain + [('id', '>', run.last_line_id)]) if len(lines) == chunk_size else 0
+        
+        if remaining:
+            _logger.info(f"Overdue update at line id {run.last_line_id} after {run.processed_count} lines, {remaining} left")
+        else:
+            # Start from the beginning on the next scheduled run
+            run.write({'state': 'done'})
+            _logger.info(f"Payment plan overdue line update completed after {run.processed_count} lines")
+        self.env['ir.cron']._notify_progress(done=len(lines), remaining=remaining)
+        # Keep memory bounded on large portfolios
+        self.env.invalidate_all()
+        return True
+
+    @api.model
+    def _refresh_past_due_lines(self, today=None):
+        """
+        Scheduled action: move unpaid lines whose due date has passed to overdue
         
-        _logger.info("Payment plan overdue line update completed")
+        Works on lines without a payment date, which the overdue cron does not
+        touch. Days overdue, accrued interest, totals, allocation state and
+        state are recomputed as of ``today`` in a single UPDATE driven by the
+        partial index on unpaid due dates, and only rows whose values change
+        are written; interest edited by hand is kept. Plan interest totals
+        are then refreshed set-based as well, and so are the due figures
+        (next due and oldest overdue installment) of those plans and of the
+        plans whose next due date has passed. The daily accrual is not logged
+        as plan events: replaying the log derives it from the plan's interest
+        policy.
+        
+        Args:
+            today: Reference date, defaults to today in the user's timezone
+        """
+        _logger = logging.getLogger(__name__)
+        today = today or fields.Date.context_today(self)
+        self.env.flush_all()
+        with perf_phase(self.env, 'past_due_refresh') as phase:
+            self.env.cr.execute(f"""
+                WITH computed AS (
+                    SELECT l.id,
+                           l.payment_plan_id,
+                           l.allocation_state AS old_allocation_state,
+                           d.days,
+                           i.interest,
+                           l.amount + i.interest AS total_with_interest,
+                           a.allocation_state,
+                           CASE a.allocation_state
+                                WHEN 'full' THEN 'allocated'
+                                WHEN 'partial' THEN 'partial'
+                                ELSE 'overdue'
+                           END AS state,
+                           ROUND(l.amount + i.interest - COALESCE(l.allocated_amount, 0), d.dp) <> 0
+                               AS show_reconcile_button
+                      FROM payment_plan_line l
+                      JOIN payment_plan p ON p.id = l.payment_plan_id
+                 LEFT JOIN res_currency cur ON cur.id = l.currency_id
+                CROSS JOIN LATERAL (
+                           SELECT %(today)s::date - l.date AS days,
+                                  COALESCE(cur.decimal_places, 2) AS dp
+                           ) d
+                CROSS JOIN LATERAL (
+                           SELECT CASE WHEN l.interest_edited THEN COALESCE(l.interest_amount, 0)
+                                  ELSE ROUND({LINE_INTEREST_SQL}, d.dp) END AS interest
+                           ) i
+                CROSS JOIN LATERAL (
+                           SELECT CASE
+                                WHEN ROUND(COALESCE(l.allocated_amount, 0), d.dp) = 0 THEN 'none'
+                                WHEN i.interest > 0 AND ROUND(l.allocated_amount - l.amount - i.interest, d.dp) >= 0 THEN 'full'
+                                WHEN i.interest > 0 THEN 'partial'
+                                WHEN ROUND(l.allocated_amount - l.amount, d.dp) >= 0 THEN 'full'
+                                ELSE 'partial'
+                           END AS allocation_state
+                           ) a
+                     WHERE (l.paid IS NULL OR l.paid = FALSE)
+                       AND l.payment_date IS NULL
+                       AND l.date < %(today)s
+                )
+                UPDATE payment_plan_line l
+                   SET overdue_days = c.days,
+                       interest_amount = c.interest,
+                       total_with_interest = c.total_with_interest,
+                       allocation_state = c.allocation_state,
+                       state = c.state,
+                       show_reconcile_button = c.show_reconcile_button
+                  FROM computed c
+                 WHERE l.id = c.id
+                   AND (l.overdue_days IS DISTINCT FROM c.days
+                        OR l.interest_amount IS DISTINCT FROM c.interest
+                        OR l.state IS DISTINCT FROM c.state
+                        OR l.allocation_state IS DISTINCT FROM c.allocation_state)
+             RETURNING l.id, l.payment_plan_id, c.old_allocation_state IS DISTINCT FROM c.allocation_state
+            """, {'today': today})
+            rows = self.env.cr.fetchall()
+            phase.add_rows(len(rows))
+            plan_ids = list({row[1] for row in rows})
+            if plan_ids:
+                self.env.cr.execute("""
+                    UPDATE payment_plan p
+                       SET total_interest = s.total_interest,
+                           total_with_interest = COALESCE(p.total_amount, 0) + s.total_interest
+                      FROM (SELECT payment_plan_id, SUM(COALESCE(interest_amount, 0)) AS total_interest
+                              FROM payment_plan_line
+                             WHERE payment_plan_id = ANY(%s)
+                          GROUP BY payment_plan_id) s
+                     WHERE p.id = s.payment_plan_id
+                """, (plan_ids,))
+            # Plans whose next installment fell due move on even when no line was rewritten
+            self.env.cr.execute("SELECT id FROM payment_plan WHERE next_due_date < %s", (today,))
+            due_plan_ids = set(plan_ids).union(row[0] for row in self.env.cr.fetchall())
+            self.env['payment.plan'].browse(sorted(due_plan_ids))._refresh_due_figures(today)
+            self.env.invalidate_all()
+            
+            # Allocation statistics on the plans follow the (rare) allocation state changes
+            changed_allocation = self.browse([row[0] for row in rows if row[2]])
+            if changed_allocation:
+                changed_allocation.modified(['allocation_state'])
+                self.env.flush_all()
+        _logger.info(f"Refreshed {len(rows)} past-due payment plan lines on {len(plan_ids)} plans as of {today}")
         return True
 
+    def get_payoff_projection(self, reference_date=None):
+        """Project what is owed on these lines if they are paid on a given date
+        
+        Read-only: nothing is written, so it can answer "how much if they pay
+        on Friday?" without touching the stored interest.
+        
+        Args:
+            reference_date: Date of the hypothetical payment, defaults to today
+            
+        Returns:
+            dict: line id -> {'overdue_days', 'interest_amount', 'total_with_interest',
+                  'allocated_amount', 'amount_due'}
+        """
+        reference_date = fields.Date.to_date(reference_date) or fields.Date.context_today(self)
+        # Read the plan settings of all lines in one go
+        self.payment_plan_id.mapped('interest_calculation_method')
+        projection = {}
+        for line in self:
+            currency = line.currency_id
+            if line.paid:
+                # Settled lines keep their stored figures and owe nothing
+                overdue_days = line.overdue_days
+                interest_amount = line.interest_amount
+            elif line.date and line.date < reference_date:
+                overdue_days = (reference_date - line.date).days
+                interest_amount = currency.round(line._calculate_interest_for_days(overdue_days))
+            else:
+                overdue_days = 0
+                interest_amount = 0.0
+            total_with_interest = currency.round(line.amount + interest_amount)
+            amount_due = 0.0 if line.paid else max(currency.round(total_with_interest - line.allocated_amount), 0.0)
+            projection[line.id] = {
+                'overdue_days': overdue_days,
+                'interest_amount': interest_amount,
+                'total_with_interest': total_with_interest,
+                'allocated_amount': line.allocated_amount,
+                'amount_due': amount_due,
+            }
+        return projection
+
     def _calculate_interest_for_days(self, days):
         """Helper method to calculate interest consistently
         
@@ -444,35 +716,14 @@ class PaymentPlanLine(models.Model):
         Returns:
             interest_amount: Calculated interest amount
         """
-        interest_amount = 0
-        
         if days <= 0 or not self.payment_plan_id:
             return 0
-            
-        # Different calculation methods based on payment plan configuration
-        if self.payment_plan_id.interest_calculation_method == 'percentage':
-            # Monthly percentage method - calculated daily
-            if self.payment_plan_id.interest_rate:
-                monthly_rate = self.payment_plan_id.interest_rate / 100.0  # Convert percentage to decimal
-                daily_rate = monthly_rate / 30.0  # Approximate days in a month
-                interest_amount = self.amount * days * daily_rate
-            else:
-                # Default 1% monthly if not set
-                daily_rate = (1.0 / 100.0) / 30.0
-                interest_amount = self.amount * days * daily_rate
-        
-        elif self.payment_plan_id.interest_calculation_method == 'fixed':            # Fixed monthly amount method
-            if self.payment_plan_id.fixed_interest_amount:
-                # Calculate how many months have passed (including partial months)
-                months_passed = days / 30.0  # Approximate months
-                if months_passed < 1:
-                    # Less than a month - prorate the fixed amount
-                    interest_amount = self.payment_plan_id.fixed_interest_amount
-                else:
-                    # Round up for complete months
-                    complete_months = math.ceil(months_passed)
-                    interest_amount = self.payment_plan_id.fixed_interest_amount * complete_months
-        return interest_amount
+        plan = self.payment_plan_id
+        return compute_overdue_interest(
+            self.amount, days, plan.interest_calculation_method,
+            interest_rate=plan.interest_rate,
+            fixed_interest_amount=plan.fixed_interest_amount,
+        )
 
     def action_view_reconciliations(self):
         """View reconciliations for this line"""
@@ -0,0 +1,192 @@
+import logging
+import time
+
+from odoo import models, fields, api
+
+from ..utils.perf import perf_phase
+
+_logger = logging.getLogger(__name__)
+
+OVERDUE_WORKERS_PARAM = 'olivegt_sale_payment_plans.overdue_cron_workers'
+OVERDUE_SHARD_COUNT_PARAM = 'olivegt_sale_payment_plans.overdue_cron_shard_count'
+OVERDUE_SHARD_LEASE_PARAM = 'olivegt_sale_payment_plans.overdue_cron_shard_lease'
+WORKER_CRON_CODE = 'model._run_overdue_shards()'
+
+
+class PaymentPlanOverdueShard(models.Model):
+    """One slice of the overdue refresh, claimed by a single cron worker at a time.
+
+    With a single worker, one shard covering every line only holds the
+    checkpoint of the sequential refresh. Otherwise lines are split by
+    ``payment_plan_id % shard_count`` so every line of a plan lands in the
+    same shard. Workers claim pending shards with
+    SELECT ... FOR UPDATE SKIP LOCKED and hold them through a lease, which
+    lets another worker take over a shard whose worker died.
+    """
+    _name = 'payment.plan.overdue.shard'
+    _description = 'Payment Plan Overdue Shard'
+    _order = 'id'
+
+    shard_index = fields.Integer('Shard', required=True)
+    shard_count = fields.Integer('Shard Count', required=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ], string='Status', default='pending', required=True, index=True)
+    last_line_id = fields.Integer('Last Processed Line', default=0,
+                                  help="Checkpoint: id of the last line committed by this shard")
+    processed_count = fields.Integer('Processed Lines', default=0)
+    lease_until = fields.Datetime('Lease Until')
+    worker = fields.Char('Worker')
+    respect_manual_edits = fields.Boolean('Respect Manual Edits', default=True)
+
+    @api.model
+    def _get_worker_count(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(OVERDUE_WORKERS_PARAM, 1))
+
+    @api.model
+    def _ensure_worker_crons(self, worker_count):
+        """Make sure ``worker_count`` worker crons exist so shards can run in parallel processes"""
+        cron_model = self.env['ir.cron'].sudo().with_context(active_test=False)
+        crons = cron_model.search([
+            ('model_id.model', '=', self._name),
+            ('code', '=', WORKER_CRON_CODE),
+        ])
+        model = self.env['ir.model']._get(self._name)
+        missing = worker_count - len(crons)
+        if missing > 0:
+            crons |= cron_model.create([{
+                'name': f'Payment Plan: Overdue Shard Worker {len(crons) + i + 1}',
+                'model_id': model.id,
+                'state': 'code',
+                'code': WORKER_CRON_CODE,
+                'user_id': self.env.ref('base.user_root').id,
+                'interval_number': 1,
+                'interval_type': 'days',
+                'active': True,
+            } for i in range(missing)])
+        crons.filtered(lambda cron: not cron.active).write({'active': True})
+        return crons
+
+    @api.model
+    def _get_sequential_run(self, respect_manual_edits=True):
+        """Single shard covering every line, the checkpoint of a refresh run by one worker
+
+        A finished run is started over from the first line.
+        """
+        run = self.search([('shard_count', '=', 1)], limit=1)
+        if not run:
+            return self.create({
+                'shard_index': 0,
+                'shard_count': 1,
+                'respect_manual_edits': respect_manual_edits,
+            })
+        if run.state == 'done':
+            run.write({
+                'state': 'pending',
+                'last_line_id': 0,
+                'processed_count': 0,
+                'respect_manual_edits': respect_manual_edits,
+            })
+        return run
+
+    @api.model
+    def _dispatch(self, respect_manual_edits=True):
+        """Split the overdue refresh into shards and wake up the worker crons.
+
+        Shards left unfinished by a previous run are resumed instead of
+        starting a new run.
+        """
+        worker_count = self._get_worker_count()
+        shard_count = int(self.env['ir.config_parameter'].sudo().get_param(
+            OVERDUE_SHARD_COUNT_PARAM, worker_count * 4))
+        if not self.search_count([('state', '!=', 'done')]):
+            self.search([]).unlink()
+            self.create([{
+                'shard_index': index,
+                'shard_count': shard_count,
+                'respect_manual_edits': respect_manual_edits,
+            } for index in range(shard_count)])
+            _logger.info("Dispatched overdue refresh over %s shards for %s workers", shard_count, worker_count)
+        self.env.cr.commit()
+        self._ensure_worker_crons(worker_count)._trigger()
+        return True
+
+    def _claim_next(self, worker):
+        """Atomically claim one pending (or abandoned) shard, or return an empty recordset"""
+        lease = int(self.env['ir.config_parameter'].sudo().get_param(OVERDUE_SHARD_LEASE_PARAM, 600))
+        self.env.cr.execute("""
+            UPDATE payment_plan_overdue_shard
+               SET state = 'running',
+                   worker = %(worker)s,
+                   lease_until = (now() at time zone 'UTC') + make_interval(secs => %(lease)s)
+             WHERE id = (
+                   SELECT id
+                     FROM payment_plan_overdue_shard
+                    WHERE state = 'pending'
+                       OR (state = 'running' AND lease_until < (now() at time zone 'UTC'))
+                    ORDER BY id
+                    LIMIT 1
+                      FOR UPDATE SKIP LOCKED)
+         RETURNING id
+        """, {'worker': worker, 'lease': lease})
+        row = self.env.cr.fetchone()
+        self.env.cr.commit()
+        self.invalidate_model()
+        return self.browse(row[0]) if row else self.browse()
+
+    def _process(self, deadline, chunk_size):
+        """Process this shard by keyset chunks until it is finished or the deadline passes"""
+        self.ensure_one()
+        line_model = self.env['payment.plan.line']
+        while time.monotonic() < deadline:
+            self.env.cr.execute("""
+                SELECT id
+                  FROM payment_plan_line
+                 WHERE payment_date IS NOT NULL
+                   AND id > %s
+                   AND payment_plan_id %% %s = %s
+              ORDER BY id
+                 LIMIT %s
+            """, (self.last_line_id, self.shard_count, self.shard_index, chunk_size))
+            line_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not line_ids:
+                self.write({'state': 'done', 'lease_until': False})
+                self.env.cr.commit()
+                return True
+            line_model._update_overdue_chunk(line_model.browse(line_ids), self.respect_manual_edits)
+            self.write({
+                'last_line_id': line_ids[-1],
+                'processed_count': self.processed_count + len(line_ids),
+            })
+            self.env.cr.commit()
+            self.env.invalidate_all()
+        # Out of time: hand the shard back with its checkpoint for the next run
+        self.write({'state': 'pending', 'worker': False, 'lease_until': False})
+        self.env.cr.commit()
+        return False
+
+    @api.model
+    def _run_overdue_shards(self):
+        """Worker cron: claim and process shards until none is left or the time budget is spent"""
+        config = self.env['ir.config_parameter'].sudo()
+        chunk_size = int(config.get_param('olivegt_sale_payment_plans.overdue_cron_chunk_size', 1000))
+        time_budget = int(config.get_param('olivegt_sale_payment_plans.overdue_cron_time_budget', 90))
+        deadline = time.monotonic() + time_budget
+        worker = f'{self.env.cr.dbname}:{id(self.env.cr)}'
+        with perf_phase(self.env, 'overdue_shard_worker') as phase:
+            while time.monotonic() < deadline:
+                shard = self._claim_next(worker)
+                if not shard:
+                    break
+                processed_before = shard.processed_count
+                finished = shard._process(deadline, chunk_size)
+                phase.add_rows(shard.processed_count - processed_before)
+                if not finished:
+                    # Wake the workers up again to finish the shards that were handed back
+                    self._ensure_worker_crons(self._get_worker_count())._trigger()
+                    break
+            remaining = self.search_count([('state', '!=', 'done')])
+            self.env['ir.cron']._notify_progress(done=phase.rows, remaining=remaining)
+        return True
@@ -0,0 +1,164 @@
+import logging
+from collections import defaultdict
+
+from odoo import models, fields, api
+from odoo.tools import float_compare
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentPlanPartnerBalance(models.Model):
+    """Open installment balance per partner, company and currency.
+
+    Rows are recomputed set-based for the partners whose plans changed: the
+    summary refresh passes them along from the trigger-fed plan queue, and
+    the sale order credit check refreshes the partner it looks at first. The
+    slow path over the partner's plans is kept as a scheduled integrity check.
+    """
+    _name = 'payment.plan.partner.balance'
+    _description = 'Payment Plan Partner Balance'
+    _order = 'partner_id, company_id, currency_id'
+    _rec_name = 'partner_id'
+
+    partner_id = fields.Many2one('res.partner', string='Customer', required=True, readonly=True,
+                                 ondelete='cascade', index=True)
+    company_id = fields.Many2one('res.company', string='Company', required=True, readonly=True, ondelete='cascade')
+    currency_id = fields.Many2one('res.currency', string='Currency', required=True, readonly=True)
+    open_amount = fields.Monetary('Open Balance', readonly=True)
+    overdue_amount = fields.Monetary('Overdue Balance', readonly=True)
+    open_line_count = fields.Integer('Open Installments', readonly=True)
+    refreshed_at = fields.Datetime('Refreshed At', readonly=True)
+
+    _sql_constraints = [
+        ('partner_company_currency_uniq', 'unique(partner_id, company_id, currency_id)',
+         'There can only be one balance per customer, company and currency.'),
+    ]
+
+    def init(self):
+        super().init()
+        # First install: build the ledger for every partner with a posted plan
+        self.env.cr.execute("SELECT 1 FROM payment_plan_partner_balance LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._refresh_partners(self._get_ledger_partner_ids())
+
+    @api.model
+    def _get_ledger_partner_ids(self):
+        self.env.cr.execute("SELECT DISTINCT partner_id FROM payment_plan WHERE state = 'posted' AND partner_id IS NOT NULL")
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _refresh_partners(self, partner_ids, today=None):
+        """Recompute the balances of ``partner_ids`` from their posted plans with one statement"""
+        partner_ids = [partner_id for partner_id in set(partner_ids) if partner_id]
+        if not partner_ids:
+            return 0
+        today = today or fields.Date.context_today(self)
+        self.env.flush_all()
+        # Upsert the current balances and drop the partners' rows that have nothing open any more.
+        # The DELETE runs on the snapshot taken before the upsert, so rows it just wrote are excluded by id.
+        self.env.cr.execute("""
+            WITH balances AS (
+                SELECT p.partner_id, p.company_id, p.currency_id,
+                       SUM(GREATEST(COALESCE(l.total_with_interest, l.amount) - COALESCE(l.allocated_amount, 0), 0))
+                           AS open_amount,
+                       COALESCE(SUM(GREATEST(COALESCE(l.total_with_interest, l.amount) - COALESCE(l.allocated_amount, 0), 0))
+                                FILTER (WHERE l.date < %(today)s), 0) AS overdue_amount,
+                       COUNT(*) AS open_line_count
+                  FROM payment_plan_line l
+                  JOIN payment_plan p ON p.id = l.payment_plan_id
+                 WHERE p.partner_id = ANY(%(partner_ids)s)
+                   AND p.state = 'posted'
+                   AND p.currency_id IS NOT NULL
+                   AND (l.paid IS NULL OR l.paid = FALSE)
+              GROUP BY p.partner_id, p.company_id, p.currency_id
+            ), upserted AS (
+                INSERT INTO payment_plan_partner_balance (
+                    partner_id, company_id, currency_id, open_amount, overdue_amount, open_line_count,
+                    refreshed_at, create_uid, create_date, write_uid, write_date)
+                SELECT partner_id, company_id, currency_id, open_amount, overdue_amount, open_line_count,
+                       now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                  FROM balances
+                    ON CONFLICT (partner_id, company_id, currency_id) DO UPDATE
+                   SET open_amount = EXCLUDED.open_amount,
+                       overdue_amount = EXCLUDED.overdue_amount,
+                       open_line_count = EXCLUDED.open_line_count,
+                       refreshed_at = EXCLUDED.refreshed_at,
+                       write_uid = EXCLUDED.write_uid,
+                       write_date = EXCLUDED.write_date
+             RETURNING id
+            )
+            DELETE FROM payment_plan_partner_balance
+             WHERE partner_id = ANY(%(partner_ids)s)
+               AND id NOT IN (SELECT id FROM upserted)
+        """, {'partner_ids': partner_ids, 'today': today, 'uid': self.env.uid})
+        self.invalidate_model()
+        return len(partner_ids)
+
+    @api.model
+    def _get_open_balance(self, partner, company, currency):
+        """Open balance of a partner in one company and currency, straight from the ledger"""
+        balance = self.search([
+            ('partner_id', '=', partner.id),
+            ('company_id', '=', company.id),
+            ('currency_id', '=', currency.id),
+        ], limit=1)
+        return balance.open_amount
+
+    @api.model
+    def _compute_slow_balances(self, partner_ids):
+        """Reference balances walked through the ORM, as the ledger replaces"""
+        balances = defaultdict(float)
+        plans = self.env['payment.plan'].search([('partner_id', 'in', partner_ids), ('state', '=', 'posted')])
+        for plan in plans:
+            for line in plan.line_ids.filtered(lambda l: not l.paid):
+                key = (plan.partner_id.id, plan.company_id.id, plan.currency_id.id)
+                balances[key] += max(line.total_with_interest - line.allocated_amount, 0.0)
+        return balances
+
+    @api.model
+    def _cron_check_integrity(self):
+        """Scheduled action: repair ledger rows that drifted from the plans"""
+        mismatches = self._check_integrity()
+        self.env['ir.cron']._notify_progress(done=len(mismatches), remaining=0)
+        return True
+
+    @api.model
+    def _check_integrity(self, partner_ids=None, repair=True, batch_size=500):
+        """
+        Compare the ledger with the slow path and optionally repair it
+
+        Args:
+            partner_ids: Partners to check, defaults to every partner with a posted plan
+            repair: Recompute the ledger rows of partners found out of sync
+            batch_size: Partners checked per batch, to keep memory bounded
+
+        Returns:
+            list[dict]: One entry per mismatching (partner, company, currency)
+        """
+        if partner_ids is None:
+            partner_ids = self._get_ledger_partner_ids()
+        mismatches = []
+        for start in range(0, len(partner_ids), batch_size):
+            batch_ids = partner_ids[start:start + batch_size]
+            expected = self._compute_slow_balances(batch_ids)
+            stored = {
+                (row.partner_id.id, row.company_id.id, row.currency_id.id): row.open_amount
+                for row in self.search([('partner_id', 'in', batch_ids)])
+            }
+            for key in set(expected) | set(stored):
+                currency = self.env['res.currency'].browse(key[2])
+                if float_compare(expected.get(key, 0.0), stored.get(key, 0.0),
+                                 precision_rounding=currency.rounding or 0.01):
+                    mismatches.append({
+                        'partner_id': key[0],
+                        'company_id': key[1],
+                        'currency_id': key[2],
+                        'expected': expected.get(key, 0.0),
+                        'stored': stored.get(key, 0.0),
+                    })
+            self.env.invalidate_all()
+        if mismatches:
+            _logger.warning("Payment plan partner ledger out of sync for %s balances", len(mismatches))
+            if repair:
+                self._refresh_partners([mismatch['partner_id'] for mismatch in mismatches])
+        return mismatches
@@ -0,0 +1,49 @@
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+PERF_ENABLED_PARAM = 'olivegt_sale_payment_plans.perf_enabled'
+PERF_RETENTION_PARAM = 'olivegt_sale_payment_plans.perf_retention_days'
+
+
+class PaymentPlanPerfRun(models.Model):
+    _name = 'payment.plan.perf.run'
+    _description = 'Payment Plan Performance Run'
+    _order = 'date desc, id desc'
+
+    name = fields.Char('Phase', required=True, index=True)
+    date = fields.Datetime('Date', required=True, default=fields.Datetime.now, index=True)
+    user_id = fields.Many2one('res.users', string='User', default=lambda self: self.env.uid)
+    company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
+    duration_ms = fields.Float('Duration (ms)', digits=(16, 1), aggregator='avg')
+    query_count = fields.Integer('Queries', aggregator='avg')
+    query_time_ms = fields.Float('Query Time (ms)', digits=(16, 1), aggregator='avg')
+    rows = fields.Integer('Rows Touched', aggregator='sum')
+    worker_peak_memory_kb = fields.Integer(
+        'Worker Peak Memory (KB)', aggregator='max',
+        help="High-water mark of the worker process when the phase ended, not the peak of the phase itself")
+    worker_peak_growth_kb = fields.Integer(
+        'Worker Peak Growth (KB)', aggregator='max',
+        help="How much the phase raised the worker's high-water mark; 0 when it stayed below an earlier peak")
+
+    @api.model
+    def _record_phase(self, vals):
+        """Store one measured phase unless instrumentation is switched off."""
+        enabled = self.env['ir.config_parameter'].sudo().get_param(PERF_ENABLED_PARAM, 'True')
+        if enabled.lower() in ('0', 'false', 'no'):
+            return self.browse()
+        return self.create(vals)
+
+    @api.model
+    def _gc_perf_runs(self):
+        """Scheduled action: drop measurements older than the retention period."""
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(PERF_RETENTION_PARAM, 30))
+        self.env.cr.execute("""
+            DELETE FROM payment_plan_perf_run
+             WHERE date < (now() at time zone 'UTC') - make_interval(days => %s)
+        """, (retention_days,))
+        _logger.info("Removed %s payment plan performance runs older than %s days",
+                     self.env.cr.rowcount, retention_days)
+        return True
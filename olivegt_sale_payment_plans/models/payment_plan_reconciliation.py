@@ -1,10 +1,22 @@
 import base64
 import re
+from collections import defaultdict
 
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 from odoo.tools import float_is_zero, float_compare
 
+from ..utils.db import create_indexes
+from ..utils.perf import perf_tracked
+from .payment_plan_event import PlanEvent
+
+# Indexes backing the allocation lookups by journal item, journal entry and plan line
+RECONCILIATION_INDEXES = [
+    ('payment_plan_reconciliation_move_line_state_idx', ['move_line_id', 'state'], ''),
+    ('payment_plan_reconciliation_line_state_idx', ['payment_plan_line_id', 'state'], ''),
+    ('payment_plan_reconciliation_move_state_idx', ['move_id', 'state'], ''),
+]
+
 
 class PaymentPlanReconciliation(models.Model):
     _name = 'payment.plan.reconciliation'
@@ -102,6 +114,10 @@ class PaymentPlanReconciliation(models.Model):
         readonly=True
     )
     
+    def init(self):
+        super().init()
+        create_indexes(self.env.cr, self._table, RECONCILIATION_INDEXES)
+
     @api.constrains('amount')
     def _check_amount(self):
         """Ensure allocated amount is positive and not zero"""
@@ -111,19 +127,34 @@ class PaymentPlanReconciliation(models.Model):
             if float_compare(rec.amount, 0.0, precision_rounding=rec.currency_id.rounding) <= 0:
                 raise ValidationError(_("Allocated amount must be positive."))
     
+    def _get_other_allocated_amounts(self, field_name):
+        """Sum the non-cancelled allocations sharing ``field_name`` with each record.
+
+        Returns a dict keyed by record id with the amount allocated by the
+        other records, computed with one grouped query for the whole batch.
+        """
+        targets = self.mapped(field_name)
+        totals = {
+            target.id: amount
+            for target, amount in self._read_group(
+                [(field_name, 'in', targets.ids), ('state', '!=', 'cancelled')],
+                [field_name],
+                ['amount:sum'],
+            )
+        }
+        result = {}
+        for rec in self:
+            own_amount = rec.amount if rec.state != 'cancelled' else 0.0
+            result[rec.id] = totals.get(rec[field_name].id, 0.0) - own_amount
+        return result
+
     @api.constrains('move_line_id', 'amount')
     def _check_available_amount(self):
         """Ensure allocated amount doesn't exceed available amount in move line"""
+        other_allocated = self._get_other_allocated_amounts('move_line_id')
         for rec in self:
-            # Get all allocations for this move line
-            allocations = self.search([
-                ('move_line_id', '=', rec.move_line_id.id),
-                ('state', '!=', 'cancelled'),
-                ('id', '!=', rec.id)  # Exclude current record
-            ])
-            
             # Calculate already allocated amount
-            allocated_amount = sum(allocations.mapped('amount'))
+            allocated_amount = other_allocated[rec.id]
             
             # Calculate available amount from move line (debit or credit)
             available_amount = abs(rec.move_line_id.balance)
@@ -145,16 +176,10 @@ class PaymentPlanReconciliation(models.Model):
     @api.constrains('payment_plan_line_id', 'amount')
     def _check_payment_plan_line_amount(self):
         """Ensure allocations don't exceed the payment plan line amount"""
+        other_allocated = self._get_other_allocated_amounts('payment_plan_line_id')
         for rec in self:
-            # Get all allocations for this payment plan line
-            allocations = self.search([
-                ('payment_plan_line_id', '=', rec.payment_plan_line_id.id),
-                ('state', '!=', 'cancelled'),
-                ('id', '!=', rec.id)  # Exclude current record
-            ])
-            
             # Calculate already allocated amount
-            allocated_amount = sum(allocations.mapped('amount'))
+            allocated_amount = other_allocated[rec.id]
             
             # Check if allocation exceeds line amount
             plan_line_amount = rec.payment_plan_line_id.total_with_interest if rec.payment_plan_line_id.overdue_days > 0 else rec.payment_plan_line_id.amount
@@ -178,88 +203,135 @@ class PaymentPlanReconciliation(models.Model):
             if rec.date != rec.move_date:
                 raise ValidationError(_("The reconciliation date must match the journal entry date."))
                 
+    @perf_tracked('reconciliation_confirm')
     def action_confirm(self):
-        """Confirm the reconciliation"""
-        for rec in self:
-            # Update state
-            rec.state = 'confirmed'
-            
-            # Update payment plan line
-            line = rec.payment_plan_line_id
-            
-            # Check if line is fully reconciled
-            all_confirmed_allocations = self.search([
-                ('payment_plan_line_id', '=', line.id),
-                ('state', '=', 'confirmed')
-            ])
-            
-            total_allocated = sum(all_confirmed_allocations.mapped('amount'))
-            
-            # Get payment date from the most recent allocation
-            latest_allocation = all_confirmed_allocations.sorted(
-                key=lambda r: r.date, reverse=True)[0]
-            
-            # Set payment reference from allocations
-            references = list(filter(None, all_confirmed_allocations.mapped('move_payment_reference')))
-            payment_reference = ', '.join(references[:3])
-            if len(references) > 3:
-                payment_reference += f' (+{len(references) - 3})'
-              # Utiliza la fecha del asiento contable más reciente para el payment_date
-            # Esto asegura que se use la fecha correcta para los cálculos de overdue
-            payment_date = latest_allocation.move_date  # Usar move_date en lugar de date
-            
-            # Actualiza en la base de datos
-            self.env.cr.execute("""
-                UPDATE payment_plan_line 
-                SET payment_date = %s, payment_reference = %s
-                WHERE id = %s
-            """, (payment_date, payment_reference, line.id))
-            self.env.cr.commit()
-            
-            # Recarga el registro para obtener los nuevos valores de la base de datos
-            self.env.invalidate_all()
-            line = self.env['payment.plan.line'].browse(line.id)
-            
-            # SOLUCIÓN: Asegúrate de que payment_date se preserve con la fecha del asiento
-            if line.payment_date != payment_date:
-                # Si se perdió, fuerza la actualización nuevamente usando write
-                line.write({'payment_date': payment_date})
-                self.env.cr.commit()
-            
-            # Ahora fuerza los recálculos después de asegurar que payment_date está correcto
-            line._compute_overdue_days()
-            line._compute_interest_amount()
-            line._compute_total_with_interest()
-            line._compute_state()
-            
-            # Check if there's overdue interest to consider
-            required_amount = line.total_with_interest if line.overdue_days > 0 else line.amount
-              # If allocations cover the full amount (including interest if applicable), mark as paid
-            precision = self.env['decimal.precision'].precision_get('Payment')
-            if float_compare(total_allocated, required_amount, precision_digits=precision) >= 0 and not line.paid:
-                line.mark_as_paid()
+        """Confirm the reconciliations
+        
+        The whole recordset is confirmed together: the payment date and
+        reference of the affected plan lines are stored in batch (see
+        _update_line_payment_data), and the lines the allocations now cover
+        are marked as paid in one call.
+        """
+        if not self:
+            return True
+        newly_confirmed = self.filtered(lambda r: r.state != 'confirmed')
+        self.write({'state': 'confirmed'})
+        self.payment_plan_id._log_events([
+            PlanEvent(rec.payment_plan_id.id, 'allocation_confirmed', rec.date,
+                      line_id=rec.payment_plan_line_id.id, reconciliation_id=rec.id, amount=rec.amount)
+            for rec in newly_confirmed
+        ])
+        lines = self.payment_plan_line_id
+        total_allocated = self._update_line_payment_data(lines)
+        
+        # If allocations cover the full amount (including interest if applicable), mark as paid
+        precision = self.env['decimal.precision'].precision_get('Payment')
+        to_pay = lines.filtered(lambda line: not line.paid and float_compare(
+            total_allocated[line.id],
+            line.total_with_interest if line.overdue_days > 0 else line.amount,
+            precision_digits=precision,
+        ) >= 0)
+        to_pay.mark_as_paid()
+        return True
 
+    @perf_tracked('reconciliation_cancel')
     def action_cancel(self):
-        """Cancel the reconciliation"""
-        for rec in self:
-            # Update state
-            rec.state = 'cancelled'
-            
-            # Check if line is marked as paid and needs to be reversed
-            line = rec.payment_plan_line_id
-            if line.paid:
-                # Check if there are any remaining confirmed allocations
-                remaining_allocations = self.search([
-                    ('payment_plan_line_id', '=', line.id),
-                    ('state', '=', 'confirmed'),
-                    ('id', '!=', rec.id)
-                ])
-                total_allocated = sum(remaining_allocations.mapped('amount'))
-                # If remaining allocations don't cover full amount, mark as unpaid
-                precision = self.env['decimal.precision'].precision_get('Payment')
-                if float_compare(total_allocated, line.amount, 
-                              precision_digits=precision) < 0:
-                    line.mark_as_unpaid()
+        """Cancel the reconciliations
+        
+        Works on the whole recordset in the caller's transaction: the state
+        is written once, the remaining confirmed allocations are summed per
+        plan line with one grouped query, and the lines they no longer cover
+        are marked unpaid together. The payment date and reference of every
+        affected line are then rebuilt from the allocations left, or cleared.
+        Allocated and available amounts of the affected plan lines and
+        journal items are recomputed once by the ORM.
+        """
+        to_cancel = self.filtered(lambda r: r.state != 'cancelled')
+        if not to_cancel:
+            return True
+        lines = to_cancel.payment_plan_line_id
+        today = fields.Date.context_today(self)
+        events = [
+            PlanEvent(rec.payment_plan_id.id, 'allocation_cancelled', today,
+                      line_id=rec.payment_plan_line_id.id, reconciliation_id=rec.id, amount=rec.amount)
+            for rec in to_cancel if rec.state == 'confirmed'
+        ]
+        to_cancel.write({'state': 'cancelled'})
+        to_cancel.payment_plan_id._log_events(events)
+        
+        # Check which paid lines are no longer covered by their remaining allocations
+        remaining = {
+            line.id: amount
+            for line, amount in self._read_group(
+                [('payment_plan_line_id', 'in', lines.ids), ('state', '=', 'confirmed')],
+                ['payment_plan_line_id'],
+                ['amount:sum'],
+            )
+        }
+        precision = self.env['decimal.precision'].precision_get('Payment')
+        to_unpay = lines.filtered(
+            lambda line: line.paid and float_compare(
+                remaining.get(line.id, 0.0), line.amount, precision_digits=precision) < 0
+        )
+        to_unpay.mark_as_unpaid()
+        # Interest must not stop at a cancelled payment: dates and references follow the allocations left
+        self._update_line_payment_data(lines)
+        return True
+
+    @api.model
+    def _update_line_payment_data(self, lines):
+        """
+        Store the payment date and reference of plan lines from their confirmed allocations
+
+        The confirmed allocations are loaded with one search. The payment
+        date is the date of the most recent journal entry, used by the
+        overdue calculation; lines left without a confirmed allocation get
+        both values cleared. Lines whose values change are written with one
+        UPDATE, and their interest, totals and states follow through the ORM.
+
+        Args:
+            lines: payment.plan.line records to update
+
+        Returns:
+            dict: line id -> total of its confirmed allocations
+        """
+        allocations_by_line = defaultdict(list)
+        for allocation in self.search([
+            ('payment_plan_line_id', 'in', lines.ids),
+            ('state', '=', 'confirmed'),
+        ]):
+            allocations_by_line[allocation.payment_plan_line_id.id].append(allocation)
+        
+        line_ids, payment_dates, references, total_allocated = [], [], [], {}
+        for line in lines:
+            allocations = allocations_by_line[line.id]
+            total_allocated[line.id] = sum(allocation.amount for allocation in allocations)
+            payment_date = max((allocation.move_date for allocation in allocations), default=False)
+            refs = [allocation.move_payment_reference for allocation in allocations if allocation.move_payment_reference]
+            payment_reference = ', '.join(refs[:3])
+            if len(refs) > 3:
+                payment_reference += f' (+{len(refs) - 3})'
+            if payment_date == line.payment_date and payment_reference == (line.payment_reference or ''):
+                continue
+            line_ids.append(line.id)
+            payment_dates.append(payment_date or None)
+            references.append(payment_reference or None)
+        if not line_ids:
+            return total_allocated
+        
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE payment_plan_line l
+               SET payment_date = v.payment_date,
+                   payment_reference = v.payment_reference
+              FROM unnest(%s::int[], %s::date[], %s::varchar[]) AS v(id, payment_date, payment_reference)
+             WHERE l.id = v.id
+        """, (line_ids, payment_dates, references))
+        changed = lines.browse(line_ids)
+        changed.invalidate_recordset(['payment_date', 'payment_reference'])
+        # Overdue days, interest, totals and states follow the new payment dates
+        changed.modified(['payment_date', 'payment_reference'])
+        return total_allocated
     
     def action_draft(self):
         """Reset to draft state"""
@@ -369,17 +441,22 @@ class PaymentPlanReconciliation(models.Model):
             'context': ctx,
         }
 
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         """Override create to set the date to match move date"""
-        if vals.get('move_line_id'):
-            move_line = self.env['account.move.line'].browse(vals.get('move_line_id'))
-            if move_line and move_line.move_id.date:
-                # Siempre forzar la fecha del asiento contable, incluso si ya hay una fecha en vals
-                vals['date'] = move_line.move_id.date
-        elif not vals.get('date'):
-            vals['date'] = fields.Date.context_today(self)
-        return super().create(vals)
+        # Read the entry dates of all journal items at once
+        move_lines = self.env['account.move.line'].browse(
+            [vals['move_line_id'] for vals in vals_list if vals.get('move_line_id')]
+        )
+        move_dates = {move_line.id: move_line.move_id.date for move_line in move_lines}
+        for vals in vals_list:
+            if vals.get('move_line_id'):
+                if move_dates.get(vals['move_line_id']):
+                    # Siempre forzar la fecha del asiento contable, incluso si ya hay una fecha en vals
+                    vals['date'] = move_dates[vals['move_line_id']]
+            elif not vals.get('date'):
+                vals['date'] = fields.Date.context_today(self)
+        return super().create(vals_list)
     
     @api.depends('partner_id')
     def _compute_available_move_lines(self):
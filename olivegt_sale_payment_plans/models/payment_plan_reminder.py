@@ -0,0 +1,177 @@
+import logging
+
+from odoo import models, fields, api, Command, _
+from odoo.exceptions import UserError
+
+from ..utils.perf import perf_phase
+
+_logger = logging.getLogger(__name__)
+
+DUNNING_LEVELS_PARAM = 'olivegt_sale_payment_plans.dunning_levels'
+DUNNING_BATCH_SIZE_PARAM = 'olivegt_sale_payment_plans.dunning_batch_size'
+
+
+class PaymentPlanReminder(models.Model):
+    """Overdue installment reminder sent to one customer.
+
+    The dunning run selects every unpaid installment past the first level
+    with one query over the unpaid-by-date index, grouped per customer,
+    company and currency. A customer is reminded when at least one of their
+    installments reached a level above the one already sent for it; the
+    reminder lists all their overdue installments. Reminders, their emails
+    and the levels reached are written per batch and committed together, so
+    a rerun only picks up what is still missing. Customers without an email
+    address get a reminder in 'no_email' state, which can be sent once the
+    address is filled in.
+    """
+    _name = 'payment.plan.reminder'
+    _description = 'Payment Plan Reminder'
+    _order = 'date desc, id desc'
+    _rec_name = 'partner_id'
+
+    partner_id = fields.Many2one('res.partner', string='Customer', required=True, readonly=True,
+                                 ondelete='cascade', index=True)
+    company_id = fields.Many2one('res.company', string='Company', required=True, readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Currency', required=True, readonly=True)
+    date = fields.Date('Date', required=True, readonly=True)
+    level = fields.Integer('Level', readonly=True)
+    line_ids = fields.Many2many('payment.plan.line', string='Installments', readonly=True)
+    amount_due = fields.Monetary('Amount Due', readonly=True)
+    max_overdue_days = fields.Integer('Max Days Overdue', readonly=True)
+    state = fields.Selection([
+        ('queued', 'Email Queued'),
+        ('no_email', 'No Email Address'),
+    ], string='Status', readonly=True)
+
+    @api.model
+    def _get_dunning_thresholds(self):
+        """Days overdue that start each level, ascending: level n starts at thresholds[n - 1]"""
+        raw = self.env['ir.config_parameter'].sudo().get_param(DUNNING_LEVELS_PARAM, '5,15,30')
+        return sorted({int(days) for days in raw.split(',') if days.strip()})
+
+    @api.model
+    def _select_dunning_groups(self, today, thresholds, limit=None):
+        """
+        Customers owed a reminder, with one query
+
+        Args:
+            today: Reference date of the overdue days
+            thresholds: Days overdue starting each level, see _get_dunning_thresholds
+            limit: Number of groups to return, all when None
+
+        Returns:
+            tuple: the groups, up to ``limit`` (partner_id, company_id, currency_id, level,
+            line_ids, line_levels, amount_due, max_overdue_days) tuples per customer, company
+            and currency, and the number of groups owed a reminder in total
+        """
+        self.env.flush_all()
+        self.env.cr.execute("""
+            WITH due AS (
+                SELECT l.id, p.partner_id, p.company_id, p.currency_id,
+                       COALESCE(l.dunning_level, 0) AS sent_level,
+                       (SELECT COUNT(*) FROM unnest(%(thresholds)s::int[]) t
+                         WHERE t <= %(today)s::date - l.date)::int AS level,
+                       GREATEST(COALESCE(l.total_with_interest, l.amount) - COALESCE(l.allocated_amount, 0), 0)
+                           AS amount_due,
+                       %(today)s::date - l.date AS overdue_days
+                  FROM payment_plan_line l
+                  JOIN payment_plan p ON p.id = l.payment_plan_id
+                 WHERE (l.paid IS NULL OR l.paid = FALSE)
+                   AND l.date <= %(today)s::date - %(first_threshold)s
+                   AND p.state = 'posted'
+                   AND p.partner_id IS NOT NULL
+                   AND p.currency_id IS NOT NULL
+            )
+            SELECT partner_id, company_id, currency_id, MAX(level),
+                   array_agg(id ORDER BY id), array_agg(level ORDER BY id),
+                   SUM(amount_due), MAX(overdue_days), COUNT(*) OVER ()
+              FROM due
+          GROUP BY partner_id, company_id, currency_id
+            HAVING bool_or(level > sent_level)
+               AND SUM(amount_due) > 0
+          ORDER BY partner_id, company_id, currency_id
+             LIMIT %(limit)s
+        """, {'today': today, 'thresholds': thresholds, 'first_threshold': thresholds[0], 'limit': limit})
+        rows = self.env.cr.fetchall()
+        return [row[:-1] for row in rows], rows[0][-1] if rows else 0
+
+    @api.model
+    def _send_reminders(self, groups, today):
+        """Create the reminders of a batch of groups, queue their emails and record the levels sent"""
+        reminders = self.create([{
+            'partner_id': partner_id,
+            'company_id': company_id,
+            'currency_id': currency_id,
+            'date': today,
+            'level': level,
+            'line_ids': [Command.set(line_ids)],
+            'amount_due': amount_due,
+            'max_overdue_days': max_overdue_days,
+        } for partner_id, company_id, currency_id, level, line_ids, _levels, amount_due, max_overdue_days in groups])
+        with_email = reminders.filtered(lambda r: r.partner_id.email)
+        (reminders - with_email).state = 'no_email'
+        with_email._queue_emails()
+        line_ids = [line_id for group in groups for line_id in group[4]]
+        line_levels = [level for group in groups for level in group[5]]
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE payment_plan_line l
+               SET dunning_level = v.level
+              FROM unnest(%s::int[], %s::int[]) AS v(id, level)
+             WHERE l.id = v.id
+               AND COALESCE(l.dunning_level, 0) < v.level
+        """, (line_ids, line_levels))
+        self.env['payment.plan.line'].invalidate_model(['dunning_level'])
+        return reminders
+
+    def _queue_emails(self):
+        """Render the reminder template for these reminders and queue one email each"""
+        if not self:
+            return
+        template = self.env.ref('olivegt_sale_payment_plans.mail_template_payment_plan_reminder')
+        subjects = template._render_field('subject', self.ids, compute_lang=True)
+        bodies = template._render_field('body_html', self.ids, compute_lang=True)
+        senders = template._render_field('email_from', self.ids)
+        self.env['mail.mail'].sudo().create([{
+            'subject': subjects[reminder.id],
+            'body_html': bodies[reminder.id],
+            'email_from': senders[reminder.id] or reminder.company_id.email_formatted,
+            'recipient_ids': [Command.link(reminder.partner_id.id)],
+            'model': self._name,
+            'res_id': reminder.id,
+            'auto_delete': True,
+        } for reminder in self])
+        self.state = 'queued'
+
+    def action_send(self):
+        """Button: email the reminders that could not be sent, once their customer has an address"""
+        to_send = self.filtered(lambda r: r.state == 'no_email' and r.partner_id.email)
+        if not to_send:
+            raise UserError(_("None of these reminders can be sent: add an email address to the customer first."))
+        to_send._queue_emails()
+        return True
+
+    @api.model
+    def _run_dunning(self, today=None):
+        """Scheduled action: remind the next batch of customers whose overdue installments reached a new level
+
+        Customers leave the selection once the levels sent are recorded, so
+        each call takes the next batch. The customers left are reported
+        through the cron progress API, and the cron runner calls the job
+        again, committing between calls, until none is left.
+        """
+        today = today or fields.Date.context_today(self)
+        thresholds = self._get_dunning_thresholds()
+        if not thresholds:
+            return True
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param(DUNNING_BATCH_SIZE_PARAM, 500))
+        with perf_phase(self.env, 'dunning_run') as phase:
+            groups, total = self._select_dunning_groups(today, thresholds, limit=batch_size)
+            if groups:
+                self._send_reminders(groups, today)
+                phase.add_rows(len(groups))
+        remaining = total - len(groups)
+        self.env['ir.cron']._notify_progress(done=len(groups), remaining=remaining)
+        if groups:
+            _logger.info("Queued %s payment plan reminders, %s left for the next call", len(groups), remaining)
+        return True
@@ -0,0 +1,220 @@
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api, _
+from odoo.exceptions import AccessError
+from odoo.tools import date_utils
+
+from ..utils.perf import perf_phase
+from .payment_plan_line import LINE_INTEREST_SQL
+
+_logger = logging.getLogger(__name__)
+
+DELINQUENCY_BUCKETS = [
+    ('paid', 'Paid Off'),
+    ('current', 'Current'),
+    ('1_30', '1-30 Days'),
+    ('31_60', '31-60 Days'),
+    ('61_90', '61-90 Days'),
+    ('90_plus', 'Over 90 Days'),
+]
+
+
+class PaymentPlanSnapshot(models.Model):
+    """Month-end figures of each posted plan, written once per period.
+
+    The period close builds every row of a period with one INSERT ...
+    SELECT over the lines and the allocations dated up to the period end,
+    so a late run still reports the month as it closed. Each row carries
+    the plan's delinquency bucket and the bucket it had at the previous
+    close, which is all the portfolio and roll-rate reports read.
+    """
+    _name = 'payment.plan.snapshot'
+    _description = 'Payment Plan Month-End Snapshot'
+    _order = 'period desc, plan_id'
+    _rec_name = 'plan_id'
+
+    period = fields.Date('Period End', required=True, readonly=True)
+    plan_id = fields.Many2one('payment.plan', string='Payment Plan', required=True, readonly=True,
+                              ondelete='cascade', index=True)
+    partner_id = fields.Many2one('res.partner', string='Customer', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Currency', readonly=True)
+    total_amount = fields.Monetary('Scheduled', readonly=True)
+    principal_due = fields.Monetary('Principal Due', readonly=True)
+    amount_paid = fields.Monetary('Paid', readonly=True)
+    interest_accrued = fields.Monetary('Interest Accrued', readonly=True)
+    bucket_current = fields.Monetary('Current', readonly=True)
+    bucket_1_30 = fields.Monetary('1-30 Days', readonly=True)
+    bucket_31_60 = fields.Monetary('31-60 Days', readonly=True)
+    bucket_61_90 = fields.Monetary('61-90 Days', readonly=True)
+    bucket_90_plus = fields.Monetary('Over 90 Days', readonly=True)
+    max_overdue_days = fields.Integer('Max Days Overdue', readonly=True)
+    delinquency_bucket = fields.Selection(DELINQUENCY_BUCKETS, string='Bucket', readonly=True)
+    previous_bucket = fields.Selection(DELINQUENCY_BUCKETS, string='Previous Bucket', readonly=True)
+
+    _sql_constraints = [
+        ('period_plan_uniq', 'unique(period, plan_id)', 'There can only be one snapshot per plan and period.'),
+    ]
+
+    @api.model
+    def _close_period(self, period=None, company_ids=None):
+        """
+        Write the snapshot of every posted plan for the month ending on ``period``
+
+        Rerunning a period overwrites its rows, so the close can be repeated
+        after late allocations. The previous bucket of the following period's
+        rows is refreshed with it, so the periods can be closed again in any
+        order.
+
+        Args:
+            period: Any date of the month to close, defaults to the previous month
+            company_ids: Only close the plans of these companies, all when None
+
+        Returns:
+            int: Number of plans written
+        """
+        today = fields.Date.context_today(self)
+        period = date_utils.end_of(fields.Date.to_date(period) or today.replace(day=1) - timedelta(days=1), 'month')
+        previous = period.replace(day=1) - timedelta(days=1)
+        following = date_utils.end_of(period + timedelta(days=1), 'month')
+        self.env.flush_all()
+        with perf_phase(self.env, 'period_close') as phase:
+            self.env.cr.execute(f"""
+                WITH allocated AS (
+                    SELECT r.payment_plan_line_id AS line_id, SUM(r.amount) AS amount
+                      FROM payment_plan_reconciliation r
+                     WHERE r.state = 'confirmed'
+                       AND r.date <= %(period)s
+                  GROUP BY r.payment_plan_line_id
+                ), lines AS (
+                    SELECT l.payment_plan_id AS plan_id,
+                           l.amount,
+                           COALESCE(a.amount, 0) AS allocated,
+                           d.paid,
+                           d.days,
+                           CASE
+                                WHEN d.paid THEN COALESCE(l.interest_amount, 0)
+                                ELSE ROUND({LINE_INTEREST_SQL}, COALESCE(cur.decimal_places, 2))
+                           END AS interest
+                      FROM payment_plan_line l
+                      JOIN payment_plan p ON p.id = l.payment_plan_id
+                 LEFT JOIN allocated a ON a.line_id = l.id
+                 LEFT JOIN res_currency cur ON cur.id = l.currency_id
+                CROSS JOIN LATERAL (
+                           SELECT COALESCE(l.paid AND COALESCE(l.payment_date, %(period)s) <= %(period)s, FALSE) AS paid,
+                                  %(period)s::date - l.date AS days
+                           ) d
+                     WHERE p.state = 'posted'
+                       AND p.date <= %(period)s
+                       AND (%(company_ids)s::int[] IS NULL OR p.company_id = ANY(%(company_ids)s))
+                ), figures AS (
+                    SELECT plan_id,
+                           SUM(amount) AS total_amount,
+                           COALESCE(SUM(GREATEST(amount - allocated, 0)) FILTER (WHERE NOT paid), 0) AS principal_due,
+                           SUM(allocated) AS amount_paid,
+                           SUM(interest) AS interest_accrued,
+                           COALESCE(SUM(open_amount) FILTER (WHERE days <= 0), 0) AS bucket_current,
+                           COALESCE(SUM(open_amount) FILTER (WHERE days BETWEEN 1 AND 30), 0) AS bucket_1_30,
+                           COALESCE(SUM(open_amount) FILTER (WHERE days BETWEEN 31 AND 60), 0) AS bucket_31_60,
+                           COALESCE(SUM(open_amount) FILTER (WHERE days BETWEEN 61 AND 90), 0) AS bucket_61_90,
+                           COALESCE(SUM(open_amount) FILTER (WHERE days > 90), 0) AS bucket_90_plus,
+                           COALESCE(MAX(days) FILTER (WHERE open_amount > 0 AND days > 0), 0) AS max_overdue_days,
+                           COALESCE(SUM(open_amount), 0) AS open_amount
+                      FROM (SELECT *, CASE WHEN paid THEN 0 ELSE GREATEST(amount + interest - allocated, 0) END AS open_amount
+                              FROM lines) x
+                  GROUP BY plan_id
+                )
+                INSERT INTO payment_plan_snapshot (
+                    period, plan_id, partner_id, company_id, currency_id,
+                    total_amount, principal_due, amount_paid, interest_accrued,
+                    bucket_current, bucket_1_30, bucket_31_60, bucket_61_90, bucket_90_plus,
+                    max_overdue_days, delinquency_bucket, previous_bucket,
+                    create_uid, create_date, write_uid, write_date)
+                SELECT %(period)s, p.id, p.partner_id, p.company_id, p.currency_id,
+                       f.total_amount, f.principal_due, f.amount_paid, f.interest_accrued,
+                       f.bucket_current, f.bucket_1_30, f.bucket_31_60, f.bucket_61_90, f.bucket_90_plus,
+                       f.max_overdue_days,
+                       CASE
+                            WHEN f.open_amount = 0 THEN 'paid'
+                            WHEN f.max_overdue_days = 0 THEN 'current'
+                            WHEN f.max_overdue_days <= 30 THEN '1_30'
+                            WHEN f.max_overdue_days <= 60 THEN '31_60'
+                            WHEN f.max_overdue_days <= 90 THEN '61_90'
+                            ELSE '90_plus'
+                       END,
+                       prev.delinquency_bucket,
+                       %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                  FROM figures f
+                  JOIN payment_plan p ON p.id = f.plan_id
+             LEFT JOIN payment_plan_snapshot prev ON prev.plan_id = f.plan_id AND prev.period = %(previous)s
+                    ON CONFLICT (period, plan_id) DO UPDATE
+                   SET partner_id = EXCLUDED.partner_id,
+                       company_id = EXCLUDED.company_id,
+                       currency_id = EXCLUDED.currency_id,
+                       total_amount = EXCLUDED.total_amount,
+                       principal_due = EXCLUDED.principal_due,
+                       amount_paid = EXCLUDED.amount_paid,
+                       interest_accrued = EXCLUDED.interest_accrued,
+                       bucket_current = EXCLUDED.bucket_current,
+                       bucket_1_30 = EXCLUDED.bucket_1_30,
+                       bucket_31_60 = EXCLUDED.bucket_31_60,
+                       bucket_61_90 = EXCLUDED.bucket_61_90,
+                       bucket_90_plus = EXCLUDED.bucket_90_plus,
+                       max_overdue_days = EXCLUDED.max_overdue_days,
+                       delinquency_bucket = EXCLUDED.delinquency_bucket,
+                       previous_bucket = EXCLUDED.previous_bucket,
+                       write_uid = EXCLUDED.write_uid,
+                       write_date = EXCLUDED.write_date
+            """, {'period': period, 'previous': previous, 'company_ids': company_ids, 'uid': self.env.uid})
+            count = self.env.cr.rowcount
+            phase.add_rows(count)
+            self.env.cr.execute("""
+                UPDATE payment_plan_snapshot nxt
+                   SET previous_bucket = cur.delinquency_bucket
+                  FROM payment_plan_snapshot cur
+                 WHERE cur.plan_id = nxt.plan_id
+                   AND cur.period = %s
+                   AND nxt.period = %s
+                   AND nxt.previous_bucket IS DISTINCT FROM cur.delinquency_bucket
+            """, (period, following))
+        self.invalidate_model()
+        _logger.info("Closed payment plan period %s with %s plan snapshots", period, count)
+        return count
+
+    @api.model
+    def _close_periods(self, date_from, date_to=None):
+        """
+        Close every month from ``date_from`` to ``date_to``, oldest first
+
+        Builds the history the roll rates read, each month finding the
+        buckets of the one before it.
+
+        Args:
+            date_from: Any date of the first month to close
+            date_to: Any date of the last month to close, defaults to the previous month
+
+        Returns:
+            int: Number of snapshots written
+        """
+        today = fields.Date.context_today(self)
+        period = date_utils.end_of(fields.Date.to_date(date_from), 'month')
+        last = date_utils.end_of(fields.Date.to_date(date_to) or today.replace(day=1) - timedelta(days=1), 'month')
+        count = 0
+        while period <= last:
+            count += self._close_period(period)
+            period = date_utils.end_of(period + timedelta(days=1), 'month')
+        return count
+
+    @api.model
+    def _cron_close_period(self):
+        """Scheduled action: close the previous month"""
+        self._close_period()
+        return True
+
+    def action_close_last_period(self):
+        """Button: close the previous month again for the selected companies, e.g. after late allocations"""
+        if not self.env.user.has_group('sales_team.group_sale_manager'):
+            raise AccessError(_("Only sales managers can close a period."))
+        self._close_period(company_ids=self.env.companies.ids)
+        return {'type': 'ir.actions.client', 'tag': 'reload'}
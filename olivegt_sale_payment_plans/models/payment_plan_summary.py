@@ -0,0 +1,209 @@
+import logging
+import time
+
+from odoo import models, fields, api
+
+from ..utils.perf import perf_phase
+
+_logger = logging.getLogger(__name__)
+
+SUMMARY_QUEUE_TABLE = 'payment_plan_summary_queue'
+SUMMARY_BATCH_SIZE_PARAM = 'olivegt_sale_payment_plans.summary_refresh_batch_size'
+SUMMARY_TIME_BUDGET_PARAM = 'olivegt_sale_payment_plans.summary_refresh_time_budget'
+
+# Tables whose changes make a plan summary stale, with the column holding the plan id
+SUMMARY_SOURCES = [
+    ('payment_plan', 'id'),
+    ('payment_plan_line', 'payment_plan_id'),
+    ('payment_plan_reconciliation', 'payment_plan_id'),
+]
+
+
+class PaymentPlanSummary(models.Model):
+    """Narrow per-plan totals for dashboards and lists.
+
+    Rows are never written through the ORM. Statement-level triggers on
+    plans, lines and allocations put the ids of the touched plans in a
+    queue table, and a short-interval cron recomputes only those plans with
+    one INSERT ... ON CONFLICT per batch.
+    """
+    _name = 'payment.plan.summary'
+    _description = 'Payment Plan Summary'
+    _order = 'plan_id desc'
+    _rec_name = 'plan_id'
+
+    plan_id = fields.Many2one('payment.plan', string='Payment Plan', required=True, readonly=True,
+                              ondelete='cascade', index=True)
+    partner_id = fields.Many2one('res.partner', string='Customer', readonly=True, index=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True, index=True)
+    currency_id = fields.Many2one('res.currency', string='Currency', readonly=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('posted', 'Posted'),
+        ('canceled', 'Canceled'),
+    ], string='Status', readonly=True)
+    total_amount = fields.Monetary('Total Amount', readonly=True)
+    amount_paid = fields.Monetary('Amount Paid', readonly=True)
+    amount_residual = fields.Monetary('Amount Due', readonly=True)
+    total_interest = fields.Monetary('Total Interest', readonly=True)
+    allocated_amount = fields.Monetary('Allocated Amount', readonly=True)
+    line_count = fields.Integer('Installments', readonly=True)
+    paid_count = fields.Integer('Paid Installments', readonly=True)
+    overdue_count = fields.Integer('Overdue Installments', readonly=True)
+    next_due_date = fields.Date('Next Due Date', readonly=True)
+    oldest_overdue_date = fields.Date('Oldest Overdue Date', readonly=True)
+    refreshed_at = fields.Datetime('Refreshed At', readonly=True)
+
+    _sql_constraints = [
+        ('plan_uniq', 'unique(plan_id)', 'There can only be one summary per payment plan.'),
+    ]
+
+    def init(self):
+        super().init()
+        cr = self.env.cr
+        cr.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SUMMARY_QUEUE_TABLE} (
+                plan_id integer PRIMARY KEY
+            )
+        """)
+        cr.execute(f"""
+            CREATE OR REPLACE FUNCTION payment_plan_summary_enqueue() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    EXECUTE format(
+                        'INSERT INTO {SUMMARY_QUEUE_TABLE} (plan_id) '
+                        'SELECT DISTINCT %1$I FROM new_rows WHERE %1$I IS NOT NULL '
+                        'ON CONFLICT DO NOTHING', TG_ARGV[0]);
+                END IF;
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    EXECUTE format(
+                        'INSERT INTO {SUMMARY_QUEUE_TABLE} (plan_id) '
+                        'SELECT DISTINCT %1$I FROM old_rows WHERE %1$I IS NOT NULL '
+                        'ON CONFLICT DO NOTHING', TG_ARGV[0]);
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        # Statement-level triggers: one queue insert per statement, not per row
+        for table, column in SUMMARY_SOURCES:
+            for event, referencing in (
+                ('INSERT', 'NEW TABLE AS new_rows'),
+                ('UPDATE', 'NEW TABLE AS new_rows OLD TABLE AS old_rows'),
+                ('DELETE', 'OLD TABLE AS old_rows'),
+            ):
+                trigger = f'{table}_summary_{event.lower()}_trg'
+                cr.execute(f'DROP TRIGGER IF EXISTS "{trigger}" ON "{table}"')
+                cr.execute(f"""
+                    CREATE TRIGGER "{trigger}"
+                     AFTER {event} ON "{table}"
+                    REFERENCING {referencing}
+                       FOR EACH STATEMENT
+                   EXECUTE FUNCTION payment_plan_summary_enqueue('{column}')
+                """)
+        # First install: queue every plan so the summaries get built by the cron
+        cr.execute(f"""
+            INSERT INTO {SUMMARY_QUEUE_TABLE} (plan_id)
+            SELECT id FROM payment_plan
+             WHERE NOT EXISTS (SELECT 1 FROM payment_plan_summary)
+            ON CONFLICT DO NOTHING
+        """)
+
+    @api.model
+    def _refresh_plans(self, plan_ids, today=None):
+        """Recompute the summary rows of ``plan_ids`` with one statement"""
+        if not plan_ids:
+            return 0
+        today = today or fields.Date.context_today(self)
+        self.env.cr.execute("""
+            INSERT INTO payment_plan_summary (
+                plan_id, partner_id, company_id, currency_id, state,
+                total_amount, amount_paid, amount_residual, total_interest, allocated_amount,
+                line_count, paid_count, overdue_count, next_due_date, oldest_overdue_date,
+                refreshed_at, create_uid, create_date, write_uid, write_date)
+            SELECT p.id, p.partner_id, p.company_id, p.currency_id, p.state,
+                   COALESCE(SUM(l.amount), 0),
+                   COALESCE(SUM(l.amount) FILTER (WHERE l.paid), 0),
+                   COALESCE(SUM(l.amount) FILTER (WHERE l.paid IS NOT TRUE), 0),
+                   COALESCE(SUM(l.interest_amount), 0),
+                   COALESCE(SUM(l.allocated_amount), 0),
+                   COUNT(l.id),
+                   COUNT(l.id) FILTER (WHERE l.paid),
+                   COUNT(l.id) FILTER (WHERE l.paid IS NOT TRUE AND l.date < %(today)s),
+                   MIN(l.date) FILTER (WHERE l.paid IS NOT TRUE AND l.date >= %(today)s),
+                   MIN(l.date) FILTER (WHERE l.paid IS NOT TRUE AND l.date < %(today)s),
+                   now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM payment_plan p
+         LEFT JOIN payment_plan_line l ON l.payment_plan_id = p.id
+             WHERE p.id = ANY(%(plan_ids)s)
+          GROUP BY p.id
+            ON CONFLICT (plan_id) DO UPDATE
+               SET partner_id = EXCLUDED.partner_id,
+                   company_id = EXCLUDED.company_id,
+                   currency_id = EXCLUDED.currency_id,
+                   state = EXCLUDED.state,
+                   total_amount = EXCLUDED.total_amount,
+                   amount_paid = EXCLUDED.amount_paid,
+                   amount_residual = EXCLUDED.amount_residual,
+                   total_interest = EXCLUDED.total_interest,
+                   allocated_amount = EXCLUDED.allocated_amount,
+                   line_count = EXCLUDED.line_count,
+                   paid_count = EXCLUDED.paid_count,
+                   overdue_count = EXCLUDED.overdue_count,
+                   next_due_date = EXCLUDED.next_due_date,
+                   oldest_overdue_date = EXCLUDED.oldest_overdue_date,
+                   refreshed_at = EXCLUDED.refreshed_at,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, {'plan_ids': list(plan_ids), 'today': today, 'uid': self.env.uid})
+        return self.env.cr.rowcount
+
+    @api.model
+    def _get_plan_partner_ids(self, plan_ids):
+        """Current partners of ``plan_ids`` plus the ones their summaries still hold, for reassigned plans"""
+        self.env.cr.execute("""
+            SELECT partner_id FROM payment_plan WHERE id = ANY(%(plan_ids)s) AND partner_id IS NOT NULL
+             UNION
+            SELECT partner_id FROM payment_plan_summary WHERE plan_id = ANY(%(plan_ids)s) AND partner_id IS NOT NULL
+        """, {'plan_ids': list(plan_ids)})
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _refresh_queued(self):
+        """Scheduled action: refresh the summaries of the plans queued by the triggers
+
+        Batches are taken from the queue with SKIP LOCKED so an overlapping
+        run never waits on this one, and each batch is committed.
+        """
+        config = self.env['ir.config_parameter'].sudo()
+        batch_size = int(config.get_param(SUMMARY_BATCH_SIZE_PARAM, 1000))
+        time_budget = int(config.get_param(SUMMARY_TIME_BUDGET_PARAM, 50))
+        deadline = time.monotonic() + time_budget
+        refreshed = 0
+        with perf_phase(self.env, 'summary_refresh') as phase:
+            while time.monotonic() < deadline:
+                self.env.cr.execute(f"""
+                    DELETE FROM {SUMMARY_QUEUE_TABLE}
+                     WHERE plan_id IN (
+                           SELECT plan_id
+                             FROM {SUMMARY_QUEUE_TABLE}
+                            ORDER BY plan_id
+                            LIMIT %s
+                              FOR UPDATE SKIP LOCKED)
+                 RETURNING plan_id
+                """, (batch_size,))
+                plan_ids = [row[0] for row in self.env.cr.fetchall()]
+                if not plan_ids:
+                    break
+                partner_ids = self._get_plan_partner_ids(plan_ids)
+                self._refresh_plans(plan_ids)
+                self.env['payment.plan.partner.balance']._refresh_partners(partner_ids)
+                self.env.cr.commit()
+                refreshed += len(plan_ids)
+                phase.add_rows(len(plan_ids))
+            self.env.cr.execute(f"SELECT count(*) FROM {SUMMARY_QUEUE_TABLE}")
+            remaining = self.env.cr.fetchone()[0]
+            self.env['ir.cron']._notify_progress(done=refreshed, remaining=remaining)
+        if refreshed:
+            _logger.info("Refreshed %s payment plan summaries, %s still queued", refreshed, remaining)
+        return True
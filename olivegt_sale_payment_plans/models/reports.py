@@ -3,6 +3,8 @@ import base64
 from odoo import models, fields, api
 from odoo.exceptions import UserError
 
+from ..utils.perf import perf_tracked
+
 try:
     import xlsxwriter
 except ImportError:
@@ -16,12 +18,14 @@ class ReporteInstallments(models.Model):
     description = fields.Text(string="Description")
     
     report_type = fields.Selection([
-        ('installments_overdue', 'Global de Cuotas por Cobrar')
+        ('installments_overdue', 'Global de Cuotas por Cobrar'),
+        ('delinquency_analytics', 'Roll Rates y Cosechas de Morosidad'),
     ], string="Tipo de Reporte", required=True, default='installments_overdue')
 
     excel_file = fields.Binary(string="Archivo Excel")
     excel_filename = fields.Char(string="Nombre del Archivo")
 
+    @perf_tracked('xlsx_report')
     def action_descargar_reporte(self):
         self.ensure_one()
         if not xlsxwriter:
@@ -30,7 +34,8 @@ class ReporteInstallments(models.Model):
         # MAPEO DE REPORTES ---
         # Vincula el valor de 'report_type' con la función correspondiente
         report_methods = {
-            'installments_overdue': self._generate_installments_overdue
+            'installments_overdue': self._generate_installments_overdue,
+            'delinquency_analytics': self._generate_delinquency_analytics,
         }
 
         method = report_methods.get(self.report_type)
@@ -79,24 +84,19 @@ class ReporteInstallments(models.Model):
             ('state', 'in', ['pending', 'partial', 'overdue']),
             ('paid', '=', False),
             ('date', '<', fields.Date.context_today(self))
-        ])
+        ], order='date asc, id asc')
         
         if not all_lines:
             raise UserError("No se encontraron cuotas vencidas y pendientes en el sistema.")
 
-        partners = all_lines.mapped('payment_plan_id.partner_id')
-        sorted_partners = sorted(partners, key=lambda p: p.display_name or '')
+        # Agrupar en memoria en lugar de una búsqueda por cliente
+        line_ids_by_partner = {}
+        for line in all_lines:
+            line_ids_by_partner.setdefault(line.payment_plan_id.partner_id, []).append(line.id)
+        sorted_partners = sorted(line_ids_by_partner, key=lambda p: p.display_name or '')
 
         for partner in sorted_partners:
-            p_lines_sorted = self.env['payment.plan.line'].sudo().search([
-                ('payment_plan_id.partner_id', '=', partner.id),
-                ('state', 'in', ['pending', 'partial', 'overdue']),
-                ('paid', '=', False),
-                ('date', '<', fields.Date.context_today(self))
-            ], order='date asc')
-
-            if not p_lines_sorted:
-                continue
+            p_lines_sorted = all_lines.browse(line_ids_by_partner[partner])
 
             raw_name = partner.name or f"Cliente_{partner.id}"
             sheet_name = raw_name[:30].translate(str.maketrans('', '', '[]:*?\/'))
@@ -142,17 +142,8 @@ class ReporteInstallments(models.Model):
                 pending_amount = (line.amount or 0.0) - (line.allocated_amount or 0.0)
                 worksheet.write(row_idx, 6, pending_amount, amount_format)
 
-                # overdue days 
-                temp_overdue_days = 0
-                if line.overdue_days:
-                    temp_overdue_days = line.overdue_days
-                # calculo de los dias de vencimiento calculado segun el overdue_date
-                elif line.date:
-                    hoy = fields.Date.context_today(self)
-                    if line.date < hoy:
-                        temp_overdue_days = (hoy - line.date).days
-
-                worksheet.write(row_idx, 7, temp_overdue_days, center_format)
+                # dias de vencimiento: los mantiene al dia el refresco diario de cuotas vencidas
+                worksheet.write(row_idx, 7, line.overdue_days or 0, center_format)
 
 
                 readable_state = state_mapping.get(line.state, line.state or '—')
@@ -165,4 +156,67 @@ class ReporteInstallments(models.Model):
             worksheet.write_formula(row_idx, 5, f"=SUM(F4:F{row_idx})", total_amount_format)
             worksheet.write_formula(row_idx, 6, f"=SUM(G4:G{row_idx})", total_amount_format)
 
-        return "Cuentas_Por_Cobrar"
\ No newline at end of file
+        return "Cuentas_Por_Cobrar"
+
+    def _generate_delinquency_analytics(self, workbook):
+        """ REPORTE 2: Roll rates y curvas de cosecha (ultimos cinco anos) """
+        header_format = workbook.add_format({'size': 10, 'bold': True, 'align': 'center', 'valign': 'vcenter', 'bottom': 1, 'top': 1})
+        data_format = workbook.add_format({'size': 10, 'align': 'left', 'valign': 'vcenter'})
+        center_format = workbook.add_format({'size': 10, 'align': 'center', 'valign': 'vcenter'})
+        amount_format = workbook.add_format({'size': 10, 'align': 'right', 'valign': 'vcenter', 'num_format': '#,##0.00'})
+        percent_format = workbook.add_format({'size': 10, 'align': 'right', 'valign': 'vcenter', 'num_format': '0.00%'})
+
+        analytics = self.env['payment.plan.analytics']
+        roll_rates = analytics.get_roll_rates()
+        vintages = analytics.get_vintage_curves()
+        if not roll_rates['monthly'] and not vintages['vintages']:
+            raise UserError("No hay planes de pago publicados en el periodo analizado.")
+        bucket_labels = dict(self.env['payment.plan.snapshot']._fields['delinquency_bucket'].selection)
+        buckets = roll_rates['buckets']
+
+        # --- Matriz de transicion: filas = tramo anterior, columnas = tramo siguiente ---
+        worksheet = workbook.add_worksheet('Matriz Roll Rates')
+        worksheet.set_column('A:A', 18)
+        worksheet.set_column(1, len(buckets), 14)
+        worksheet.write(0, 0, f"{roll_rates['date_from']} - {roll_rates['date_to']}", data_format)
+        for col, bucket in enumerate(buckets, start=1):
+            worksheet.write(1, col, bucket_labels[bucket], header_format)
+        rates = {(row['from'], row['to']): row['rate'] for row in roll_rates['matrix']}
+        for row_idx, from_bucket in enumerate(buckets[1:], start=2):
+            worksheet.write(row_idx, 0, bucket_labels[from_bucket], header_format)
+            for col, to_bucket in enumerate(buckets, start=1):
+                worksheet.write(row_idx, col, rates.get((from_bucket, to_bucket), 0.0), percent_format)
+
+        # --- Transiciones por mes ---
+        worksheet = workbook.add_worksheet('Roll Rates Mensual')
+        worksheet.set_column('A:C', 16)
+        worksheet.set_column('D:F', 14)
+        for col, header in enumerate(['month', 'from', 'to', 'plans', 'overdue_amount', 'rate']):
+            worksheet.write(0, col, header, header_format)
+        for row_idx, row in enumerate(roll_rates['monthly'], start=1):
+            worksheet.write(row_idx, 0, row['month'], center_format)
+            worksheet.write(row_idx, 1, bucket_labels[row['from']], data_format)
+            worksheet.write(row_idx, 2, bucket_labels[row['to']], data_format)
+            worksheet.write(row_idx, 3, row['count'], center_format)
+            worksheet.write(row_idx, 4, row['amount'], amount_format)
+            worksheet.write(row_idx, 5, row['rate'], percent_format)
+
+        # --- Curvas de cosecha: filas = mes de inicio, columnas = meses en libros ---
+        max_months = max((len(vintage['points']) for vintage in vintages['vintages']), default=0)
+        for sheet_name, key in (('Cosechas Mora 30+', 'delinquent_30_rate'), ('Cosechas Pagado', 'paid_rate')):
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.set_column('A:A', 10)
+            worksheet.set_column('B:C', 14)
+            worksheet.set_column(3, 3 + max_months, 8)
+            for col, header in enumerate(['vintage', 'plans', 'scheduled']):
+                worksheet.write(0, col, header, header_format)
+            for month_on_book in range(max_months):
+                worksheet.write(0, 3 + month_on_book, month_on_book, header_format)
+            for row_idx, vintage in enumerate(vintages['vintages'], start=1):
+                worksheet.write(row_idx, 0, vintage['vintage'], center_format)
+                worksheet.write(row_idx, 1, vintage['plans'], center_format)
+                worksheet.write(row_idx, 2, vintage['scheduled'], amount_format)
+                for point in vintage['points']:
+                    worksheet.write(row_idx, 3 + point['month_on_book'], point[key], percent_format)
+
+        return "Analisis_Morosidad"
@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+from odoo import models, fields
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    payment_plan_credit_limit = fields.Float(
+        string='Payment Plan Credit Limit',
+        company_dependent=True,
+        help='Maximum open installment balance, in company currency, allowed when confirming a new sale order. '
+             'Leave at zero to disable the check.',
+    )
+    payment_plan_balance_currency_id = fields.Many2one('res.currency', compute='_compute_payment_plan_balance')
+    payment_plan_open_balance = fields.Monetary(
+        string='Open Installments',
+        compute='_compute_payment_plan_balance',
+        currency_field='payment_plan_balance_currency_id',
+    )
+    payment_plan_overdue_balance = fields.Monetary(
+        string='Overdue Installments',
+        compute='_compute_payment_plan_balance',
+        currency_field='payment_plan_balance_currency_id',
+    )
+
+    def _compute_payment_plan_balance(self):
+        company = self.env.company
+        balances = self._get_payment_plan_balances(company)
+        for partner in self:
+            open_amount, overdue_amount = balances[partner.commercial_partner_id.id]
+            partner.payment_plan_balance_currency_id = company.currency_id
+            partner.payment_plan_open_balance = open_amount
+            partner.payment_plan_overdue_balance = overdue_amount
+
+    def _get_payment_plan_contact_ids(self):
+        """Ids of the commercial entities of ``self`` and all their contacts, as plans may be on any of them"""
+        return self.with_context(active_test=False).search([
+            ('id', 'child_of', self.commercial_partner_id.ids),
+        ]).ids
+
+    def _get_payment_plan_balances(self, company):
+        """
+        Open and overdue installment balances per commercial partner, read from the ledger
+
+        Balances held in other currencies are converted to the company currency
+        at today's rate.
+
+        Returns:
+            defaultdict: commercial partner id -> [open amount, overdue amount]
+        """
+        balances = defaultdict(lambda: [0.0, 0.0])
+        if not self:
+            return balances
+        today = fields.Date.context_today(self)
+        groups = self.env['payment.plan.partner.balance'].sudo()._read_group(
+            [('partner_id', 'in', self._get_payment_plan_contact_ids()), ('company_id', '=', company.id)],
+            ['partner_id', 'currency_id'],
+            ['open_amount:sum', 'overdue_amount:sum'],
+        )
+        for partner, currency, open_amount, overdue_amount in groups:
+            totals = balances[partner.commercial_partner_id.id]
+            totals[0] += currency._convert(open_amount, company.currency_id, company, today)
+            totals[1] += currency._convert(overdue_amount, company.currency_id, company, today)
+        return balances
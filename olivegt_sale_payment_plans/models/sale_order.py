@@ -1,4 +1,6 @@
 from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import float_compare
 
 
 class SaleOrder(models.Model):
@@ -36,3 +38,44 @@ class SaleOrder(models.Model):
                 'default_sale_id': self.id,
             },
         }
+
+    def action_confirm(self):
+        self._check_payment_plan_credit_limit()
+        return super().action_confirm()
+
+    def _check_payment_plan_credit_limit(self):
+        """
+        Block confirmation when the customer's open installments plus the order exceed their credit limit
+
+        The partners' ledger rows are refreshed first, so the check sees
+        allocations that the queued refresh has not picked up yet. Sales
+        managers and callers passing ``skip_payment_plan_credit_check`` in the
+        context are not checked.
+        """
+        if self.env.context.get('skip_payment_plan_credit_check') or self.env.user.has_group('sales_team.group_sale_manager'):
+            return
+        orders = self.filtered(
+            lambda o: o.partner_id.commercial_partner_id.with_company(o.company_id).payment_plan_credit_limit > 0)
+        if not orders:
+            return
+        partners = orders.partner_id.commercial_partner_id
+        self.env['payment.plan.partner.balance'].sudo()._refresh_partners(partners._get_payment_plan_contact_ids())
+        for company, company_orders in orders.grouped('company_id').items():
+            balances = company_orders.partner_id._get_payment_plan_balances(company)
+            for order in company_orders:
+                partner = order.partner_id.commercial_partner_id
+                limit = partner.with_company(company).payment_plan_credit_limit
+                order_amount = order.currency_id._convert(
+                    order.amount_total, company.currency_id, company, fields.Date.context_today(self))
+                open_balance = balances[partner.id][0]
+                if float_compare(open_balance + order_amount, limit,
+                                 precision_rounding=company.currency_id.rounding) > 0:
+                    raise UserError(_(
+                        "%(order)s cannot be confirmed: %(partner)s has %(balance)s in open installments "
+                        "and the order adds %(amount)s, over their credit limit of %(limit)s.",
+                        order=order.name,
+                        partner=partner.display_name,
+                        balance=company.currency_id.format(open_balance),
+                        amount=company.currency_id.format(order_amount),
+                        limit=company.currency_id.format(limit),
+                    ))
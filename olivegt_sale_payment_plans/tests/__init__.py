@@ -0,0 +1,8 @@
+from . import test_analytics
+from . import test_indexes
+from . import test_interest
+from . import test_past_due_refresh
+from . import test_payment_helpers
+from . import test_query_budgets
+from . import test_reconciliation
+from . import test_reminders
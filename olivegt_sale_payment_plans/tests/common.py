@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from odoo import Command, fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+class PaymentPlanCommon(AccountTestInvoicingCommon):
+    """Posted payment plans for partner_a and bank entries to allocate to them"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.today = fields.Date.today()
+        cls.bank_journal = cls.company_data['default_journal_bank']
+
+    @classmethod
+    def _create_plans(cls, schedules, **vals):
+        """
+        Create one posted plan per schedule
+
+        Args:
+            schedules: One list of (days from today, amount) installments per plan
+            vals: Extra values for every plan, e.g. the interest settings
+
+        Returns:
+            payment.plan recordset, in the order of ``schedules``
+        """
+        orders = cls.env['sale.order'].create([{'partner_id': cls.partner_a.id} for _schedule in schedules])
+        return cls.env['payment.plan'].create([{
+            'sale_id': order.id,
+            'state': 'posted',
+            'interest_calculation_method': 'percentage',
+            'interest_rate': 1.0,
+            'line_ids': [Command.create({
+                'date': cls.today + timedelta(days=days),
+                'amount': amount,
+                'name': f'Cuota {index}',
+            }) for index, (days, amount) in enumerate(schedule, 1)],
+            **vals,
+        } for order, schedule in zip(orders, schedules)])
+
+    @classmethod
+    def _create_bank_lines(cls, amounts, date=None):
+        """Post one bank entry of partner_a per amount and return their bank debit lines"""
+        moves = cls.env['account.move'].create([{
+            'move_type': 'entry',
+            'journal_id': cls.bank_journal.id,
+            'date': date or cls.today,
+            'line_ids': [
+                Command.create({
+                    'account_id': cls.bank_journal.default_account_id.id,
+                    'partner_id': cls.partner_a.id,
+                    'debit': amount,
+                }),
+                Command.create({
+                    'account_id': cls.partner_a.property_account_receivable_id.id,
+                    'partner_id': cls.partner_a.id,
+                    'credit': amount,
+                }),
+            ],
+        } for amount in amounts])
+        moves.action_post()
+        return moves.line_ids.filtered(lambda line: line.debit > 0)
+
+    @classmethod
+    def _allocate(cls, lines, amounts, date=None):
+        """Draft allocations of ``amounts`` to ``lines``, paid with new bank entries"""
+        move_lines = cls._create_bank_lines(amounts, date=date)
+        return cls.env['payment.plan.reconciliation'].create([{
+            'payment_plan_line_id': line.id,
+            'move_line_id': move_line.id,
+            'amount': amount,
+            'date': move_line.date,
+        } for line, move_line, amount in zip(lines, move_lines, amounts)])
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from odoo.tests import tagged
+
+from .common import PaymentPlanCommon
+
+
+@tagged('post_install', '-at_install')
+class TestRollRates(PaymentPlanCommon):
+
+    def test_roll_rates_follow_the_snapshot_buckets(self):
+        last_close = self.today.replace(day=1) - timedelta(days=1)
+        first_close = last_close.replace(day=1) - timedelta(days=1)
+        # Ten days overdue at the first close, then more than 30; the other one is not due at either
+        late, on_time = self._create_plans([
+            [((first_close - timedelta(days=10) - self.today).days, 1000.0)],
+            [((last_close + timedelta(days=5) - self.today).days, 1000.0)],
+        ], date=self.today - timedelta(days=150))
+        self.env['payment.plan.snapshot']._close_periods(first_close)
+
+        snapshots = self.env['payment.plan.snapshot'].search([
+            ('period', '=', last_close),
+            ('plan_id', 'in', (late + on_time).ids),
+        ])
+        self.assertEqual(
+            sorted((snapshot.previous_bucket, snapshot.delinquency_bucket) for snapshot in snapshots),
+            [('1_30', '31_60'), ('current', 'current')],
+        )
+
+        rates = self.env['payment.plan.analytics'].get_roll_rates(date_from=first_close)
+        monthly = {
+            (row['from'], row['to']): (row['count'], row['rate'])
+            for row in rates['monthly'] if row['month'] == last_close.isoformat()
+        }
+        self.assertEqual(monthly, {('1_30', '31_60'): (1, 1.0), ('current', 'current'): (1, 1.0)})
@@ -0,0 +1,88 @@
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from .common import PaymentPlanCommon
+
+
+@tagged('post_install', '-at_install')
+class TestHotQueryIndexes(PaymentPlanCommon):
+    """The hot lookups must be answerable from the module's indexes.
+
+    Sequential scans are disabled so the planner reports the index it would
+    pick on a large table; a query that still plans a sequential scan (or
+    another index) has no index matching its access path.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        plans = cls._create_plans([[(-60, 100.0), (-30, 100.0), (30, 100.0)]] * 20)
+        lines = plans.line_ids.filtered(lambda line: line.date < cls.today)[:10]
+        cls._allocate(lines, lines.mapped('amount')).action_confirm()
+        cls.env.flush_all()
+        cls.env.cr.execute("ANALYZE payment_plan_line, payment_plan_reconciliation")
+
+    def setUp(self):
+        super().setUp()
+        # Rolled back with the test savepoint
+        self.env.cr.execute("SET LOCAL enable_seqscan = off")
+
+    def _explain(self, query):
+        self.env.cr.execute(SQL("EXPLAIN %s", query))
+        return "\n".join(row[0] for row in self.env.cr.fetchall())
+
+    def assertUsesIndex(self, model, domain, index):
+        plan = self._explain(self.env[model]._search(domain).select())
+        self.assertNotIn('Seq Scan', plan)
+        self.assertIn(index, plan)
+
+    def test_unpaid_due_lines_domain(self):
+        # ('paid', '=', False) compiles to "paid IS NULL OR paid = false", which must prove the partial index
+        self.assertUsesIndex(
+            'payment.plan.line', [('paid', '=', False), ('date', '<', self.today)],
+            'payment_plan_line_unpaid_date_idx',
+        )
+
+    def test_unpaid_due_lines_raw(self):
+        plan = self._explain(SQL(
+            "SELECT id FROM payment_plan_line l WHERE (l.paid IS NULL OR l.paid = FALSE) AND l.date < %s",
+            self.today,
+        ))
+        self.assertNotIn('Seq Scan', plan)
+        self.assertIn('payment_plan_line_unpaid_date_idx', plan)
+
+    def test_lines_with_payment_date(self):
+        self.assertUsesIndex(
+            'payment.plan.line', [('payment_date', '!=', False)], 'payment_plan_line_payment_date_idx',
+        )
+
+    def test_plan_lines_by_date(self):
+        plan_id = self.env['payment.plan.line'].search([], limit=1).payment_plan_id.id
+        self.assertUsesIndex(
+            'payment.plan.line', [('payment_plan_id', '=', plan_id), ('date', '<', self.today)],
+            'payment_plan_line_plan_date_idx',
+        )
+
+    def test_allocations_by_move_line(self):
+        allocation = self.env['payment.plan.reconciliation'].search([], limit=1)
+        self.assertUsesIndex(
+            'payment.plan.reconciliation',
+            [('move_line_id', '=', allocation.move_line_id.id), ('state', '!=', 'cancelled')],
+            'payment_plan_reconciliation_move_line_state_idx',
+        )
+
+    def test_allocations_by_plan_line(self):
+        allocation = self.env['payment.plan.reconciliation'].search([], limit=1)
+        self.assertUsesIndex(
+            'payment.plan.reconciliation',
+            [('payment_plan_line_id', '=', allocation.payment_plan_line_id.id), ('state', '=', 'confirmed')],
+            'payment_plan_reconciliation_line_state_idx',
+        )
+
+    def test_allocations_by_move(self):
+        allocation = self.env['payment.plan.reconciliation'].search([], limit=1)
+        self.assertUsesIndex(
+            'payment.plan.reconciliation',
+            [('move_id', '=', allocation.move_id.id), ('state', '=', 'confirmed')],
+            'payment_plan_reconciliation_move_state_idx',
+        )
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from odoo.tests import tagged
+
+from .common import PaymentPlanCommon
+
+
+@tagged('post_install', '-at_install')
+class TestOverdueInterest(PaymentPlanCommon):
+
+    def test_backdated_payment_settles_interest_as_of_payment_date(self):
+        line = self._create_plans([[(-60, 1000.0)]]).line_ids
+        self.env['payment.plan.line']._refresh_past_due_lines()
+        # 1% a month accrued daily: 60 days on 1000.00
+        self.assertEqual(line.overdue_days, 60)
+        self.assertAlmostEqual(line.interest_amount, 20.0)
+
+        # Paid 30 days after the due date, when 10.00 of interest was due
+        payment_date = self.today - timedelta(days=30)
+        self._allocate(line, [1010.0], date=payment_date).action_confirm()
+
+        self.assertTrue(line.paid)
+        self.assertEqual(line.payment_date, payment_date)
+        self.assertEqual(line.overdue_days, 30)
+        self.assertAlmostEqual(line.interest_amount, 10.0)
+        self.assertAlmostEqual(line.total_with_interest, 1010.0)
+
+    def test_daily_accrual_is_replayed_without_events(self):
+        plan = self._create_plans([[(-60, 1000.0)]])
+        self.env['payment.plan.line']._refresh_past_due_lines()
+        self.assertAlmostEqual(plan.line_ids.interest_amount, 20.0)
+        self.assertFalse(self.env['payment.plan.event'].search_count([
+            ('plan_id', '=', plan.id),
+            ('event_type', '=', 'interest_changed'),
+        ]))
+
+        # The replay accrues the interest with the plan's policy up to the date asked for
+        self.assertAlmostEqual(plan.get_balances_as_of(self.today)[plan.id]['total_interest'], 20.0)
+        later = self.today + timedelta(days=30)
+        self.assertAlmostEqual(plan.get_balances_as_of(later)[plan.id]['total_interest'], 30.0)
+
+    def test_only_manual_interest_edits_are_logged(self):
+        line = self._create_plans([[(-60, 1000.0)]]).line_ids
+        line.payment_date = self.today - timedelta(days=30)
+        events = self.env['payment.plan.event']
+        interest_domain = [('line_id', '=', line.id), ('event_type', '=', 'interest_changed')]
+        interest_events = events.search_count(interest_domain)
+
+        # The overdue cron recomputes the interest without logging it
+        self.env['payment.plan.line']._update_overdue_chunk(line, respect_manual_edits=False)
+        self.assertAlmostEqual(line.interest_amount, 10.0)
+        self.assertEqual(events.search_count(interest_domain), interest_events)
+
+        # Writing the same value back is not an edit
+        line.interest_amount = 10.0
+        self.assertEqual(events.search_count(interest_domain), interest_events)
+
+        line.interest_amount = 5.0
+        self.assertEqual(events.search_count(interest_domain), interest_events + 1)
+
+    def _backdate_events(self, plan, days):
+        # Events are append-only through the ORM
+        self.env.cr.execute(
+            "UPDATE payment_plan_event SET event_date = event_date - %s WHERE plan_id = %s", (days, plan.id))
+
+    def test_replay_uses_the_interest_settings_in_force(self):
+        plan = self._create_plans([[(-60, 1000.0)]])
+        self._backdate_events(plan, 10)
+        as_of = self.today - timedelta(days=5)
+        # 55 days overdue at 1% a month
+        self.assertAlmostEqual(plan.get_balances_as_of(as_of)[plan.id]['total_interest'], 18.33)
+
+        plan.interest_rate = 2.0
+        self.assertAlmostEqual(plan.line_ids.interest_amount, 40.0)
+        self.assertAlmostEqual(plan.get_balances_as_of(self.today)[plan.id]['total_interest'], 40.0)
+        # The earlier balance is still replayed with the rate in force then
+        self.assertAlmostEqual(plan.get_balances_as_of(as_of)[plan.id]['total_interest'], 18.33)
+
+    def test_manual_interest_edit_is_kept_until_its_inputs_change(self):
+        plan = self._create_plans([[(-60, 1000.0)]])
+        line = plan.line_ids
+        line_model = self.env['payment.plan.line']
+        line_model._refresh_past_due_lines()
+        line.interest_amount = 5.0
+        self.assertTrue(line.interest_edited)
+
+        # The daily refresh keeps the edit, and so does the replay on the following days
+        tomorrow = self.today + timedelta(days=1)
+        line_model._refresh_past_due_lines(tomorrow)
+        line.invalidate_recordset()
+        self.assertEqual(line.overdue_days, 61)
+        self.assertAlmostEqual(line.interest_amount, 5.0)
+        self.assertAlmostEqual(plan.get_balances_as_of(tomorrow)[plan.id]['total_interest'], 5.0)
+
+        # New interest settings replace it
+        plan.interest_rate = 2.0
+        self.assertFalse(line.interest_edited)
+        self.assertAlmostEqual(line.interest_amount, 40.0)
+        self.assertAlmostEqual(plan.get_balances_as_of(self.today)[plan.id]['total_interest'], 40.0)
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from odoo.tests import tagged
+
+from .common import PaymentPlanCommon
+
+LINE_FIELDS = ['overdue_days', 'interest_amount', 'total_with_interest', 'allocation_state', 'state',
+               'show_reconcile_button']
+PLAN_FIELDS = ['total_interest', 'total_with_interest']
+
+
+@tagged('post_install', '-at_install')
+class TestPastDueRefresh(PaymentPlanCommon):
+    """The set-based past-due refresh writes what the ORM computes would."""
+
+    def _create_allocated_plan(self, **vals):
+        # Three lines 45 days overdue: no allocation, a partial one and one covering the interest
+        plan = self._create_plans([[(-45, 1000.0)] * 3], **vals)
+        unallocated, partial, full = plan.line_ids
+        allocations = self._allocate([partial, full], [300.0, full.total_with_interest])
+        # Confirmed without action_confirm, as for allocations imported without a payment date
+        allocations.write({'state': 'confirmed'})
+        return plan
+
+    def _assertRefreshMatchesComputes(self, plan):
+        lines = plan.line_ids
+        self.env.flush_all()
+        # Leave stale values behind, as a day passing does
+        self.env.cr.execute("""
+            UPDATE payment_plan_line
+               SET overdue_days = 0, interest_amount = 0, total_with_interest = amount,
+                   allocation_state = NULL, state = 'pending', show_reconcile_button = NULL
+             WHERE payment_plan_id = %s
+        """, (plan.id,))
+        self.env.cr.execute(
+            "UPDATE payment_plan SET total_interest = 0, total_with_interest = 0 WHERE id = %s", (plan.id,))
+        self.env.invalidate_all()
+
+        self.env['payment.plan.line']._refresh_past_due_lines()
+        refreshed = {fname: lines.mapped(fname) for fname in LINE_FIELDS}
+        refreshed_plan = {fname: plan[fname] for fname in PLAN_FIELDS}
+
+        for fname in LINE_FIELDS:
+            self.env.add_to_compute(lines._fields[fname], lines)
+        for fname in PLAN_FIELDS:
+            self.env.add_to_compute(plan._fields[fname], plan)
+        for fname in LINE_FIELDS:
+            for computed, stored in zip(lines.mapped(fname), refreshed[fname]):
+                if isinstance(computed, float):
+                    self.assertAlmostEqual(computed, stored, msg=fname)
+                else:
+                    self.assertEqual(computed, stored, fname)
+        for fname in PLAN_FIELDS:
+            self.assertAlmostEqual(plan[fname], refreshed_plan[fname], msg=fname)
+        return lines
+
+    def test_percentage_interest(self):
+        lines = self._assertRefreshMatchesComputes(self._create_allocated_plan())
+        self.assertEqual(lines.mapped('allocation_state'), ['none', 'partial', 'full'])
+        # 1% a month accrued daily on 1000.00 for 45 days
+        self.assertAlmostEqual(lines[0].interest_amount, 15.0)
+
+    def test_fixed_interest(self):
+        plan = self._create_allocated_plan(interest_calculation_method='fixed', fixed_interest_amount=25.0)
+        lines = self._assertRefreshMatchesComputes(plan)
+        self.assertEqual(lines.mapped('allocation_state'), ['none', 'partial', 'full'])
+        # Two started months
+        self.assertAlmostEqual(lines[0].interest_amount, 50.0)
+
+    def test_due_figures_move_on_without_rewritten_lines(self):
+        plan = self._create_plans([[(-1, 1000.0), (30, 1000.0)]])
+        due, following = plan.line_ids
+        # Partially allocated: the refresh leaves lines with a payment date alone
+        self._allocate(due, [300.0], date=self.today - timedelta(days=1)).action_confirm()
+        self.assertTrue(due.payment_date)
+        self.env.flush_all()
+        # Figures as stored the day before the installment fell due
+        self.env.cr.execute("""
+            UPDATE payment_plan
+               SET next_due_date = %s, oldest_overdue_date = NULL, overdue_amount = 0
+             WHERE id = %s
+        """, (due.date, plan.id))
+        self.env.invalidate_all()
+
+        self.env['payment.plan.line']._refresh_past_due_lines()
+        self.assertEqual(plan.next_due_date, following.date)
+        self.assertEqual(plan.oldest_overdue_date, due.date)
+        self.assertAlmostEqual(plan.overdue_amount, due.total_with_interest - 300.0)
@@ -0,0 +1,94 @@
+from odoo.tests import TransactionCase, tagged
+
+from ..utils.payment_helpers import compute_amortization_schedule, distribute_amount, pair_payments
+
+
+@tagged('post_install', '-at_install')
+class TestPaymentHelpers(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.currency = cls.env.ref('base.USD')
+        # Cash rounding to five cents
+        cls.nickel_currency = cls.env['res.currency'].create({
+            'name': 'XFN',
+            'symbol': 'F',
+            'rounding': 0.05,
+        })
+
+    def test_distribute_in_due_order(self):
+        capacities = [100.0, 200.0, 300.0]
+        self.assertEqual(distribute_amount(350.0, capacities, self.currency), [100.0, 200.0, 50.0])
+        self.assertEqual(distribute_amount(350.0, capacities, self.currency, strategy='newest_first'),
+                         [0.0, 50.0, 300.0])
+
+    def test_distribute_proportionally_by_largest_remainder(self):
+        # 3.333... each: the leftover cent goes to the oldest installment
+        self.assertEqual(distribute_amount(10.0, [10.0, 10.0, 10.0], self.currency, strategy='proportional'),
+                         [3.34, 3.33, 3.33])
+        # The one-cent installment has the largest remainder and takes the leftover up to its capacity
+        parts = distribute_amount(5.0, [0.01, 5.0], self.currency, strategy='proportional')
+        self.assertEqual(parts, [0.01, 4.99])
+
+    def test_distribute_stops_at_the_total_capacity(self):
+        capacities = [100.0, 200.0]
+        for strategy in ('oldest_first', 'newest_first', 'proportional'):
+            with self.subTest(strategy=strategy):
+                self.assertEqual(distribute_amount(500.0, capacities, self.currency, strategy=strategy),
+                                 [100.0, 200.0])
+
+    def test_distribute_in_the_currency_rounding(self):
+        parts = distribute_amount(10.0, [10.0, 10.0, 10.0], self.nickel_currency, strategy='proportional')
+        # 200 units of 0.05 split 67 / 67 / 66
+        self.assertEqual(parts, [3.35, 3.35, 3.3])
+        self.assertAlmostEqual(sum(parts), 10.0)
+        # Capacities are counted in whole units too: 10.02 holds 10.00
+        self.assertEqual(distribute_amount(20.0, [10.02, 9.99], self.nickel_currency), [10.0, 10.0])
+
+    def test_pair_payments_in_order(self):
+        pairs = pair_payments([('a', 100.0), ('b', 50.0)], [('x', 80.0), ('y', 70.0)], self.currency)
+        self.assertEqual(pairs, [('a', 'x', 80.0), ('a', 'y', 20.0), ('b', 'y', 50.0)])
+        # What is left on either side stays unpaired
+        pairs = pair_payments([('a', 200.0)], [('x', 80.0), ('y', 70.0)], self.currency)
+        self.assertEqual(pairs, [('a', 'x', 80.0), ('a', 'y', 70.0)])
+        pairs = pair_payments([('a', 1.0), ('b', 1.05)], [('x', 2.05)], self.nickel_currency)
+        self.assertEqual(pairs, [('a', 'x', 1.0), ('b', 'x', 1.05)])
+
+    def assertRepaysPrincipal(self, schedule, principal):
+        self.assertAlmostEqual(sum(row['principal'] for row in schedule), principal)
+        self.assertEqual(schedule[-1]['balance'], 0.0)
+        for row in schedule:
+            self.assertAlmostEqual(row['amount'], row['principal'] + row['interest'])
+
+    def test_french_schedule(self):
+        schedule = compute_amortization_schedule(1000.0, 0.01, 12, self.currency, method='french')
+        self.assertRepaysPrincipal(schedule, 1000.0)
+        self.assertEqual(schedule[0], {'principal': 78.85, 'interest': 10.0, 'amount': 88.85, 'balance': 921.15})
+        # Constant payment, the last row takes the rounding residual
+        self.assertEqual(set(row['amount'] for row in schedule[:-1]), {88.85})
+        self.assertEqual(schedule[-1], {'principal': 87.96, 'interest': 0.88, 'amount': 88.84, 'balance': 0.0})
+        self.assertAlmostEqual(sum(row['interest'] for row in schedule), 66.19)
+
+    def test_german_schedule(self):
+        schedule = compute_amortization_schedule(1000.0, 0.01, 12, self.currency, method='german')
+        self.assertRepaysPrincipal(schedule, 1000.0)
+        # Constant principal, interest on the outstanding balance
+        self.assertEqual(set(row['principal'] for row in schedule[:-1]), {83.33})
+        self.assertEqual(schedule[0]['interest'], 10.0)
+        self.assertEqual(schedule[1]['interest'], 9.17)
+        # 11 x 83.33 leaves 83.37 for the last row
+        self.assertEqual(schedule[-1], {'principal': 83.37, 'interest': 0.83, 'amount': 84.2, 'balance': 0.0})
+        self.assertAlmostEqual(sum(row['interest'] for row in schedule), 65.0)
+
+    def test_zero_rate_schedule(self):
+        for method in ('french', 'german'):
+            with self.subTest(method=method):
+                schedule = compute_amortization_schedule(100.0, 0.0, 3, self.currency, method=method)
+                self.assertRepaysPrincipal(schedule, 100.0)
+                self.assertEqual([row['amount'] for row in schedule], [33.33, 33.33, 33.34])
+                self.assertFalse(any(row['interest'] for row in schedule))
+
+    def test_schedule_without_principal(self):
+        self.assertEqual(compute_amortization_schedule(0.0, 0.01, 12, self.currency), [])
+        self.assertEqual(compute_amortization_schedule(1000.0, 0.01, 0, self.currency), [])
@@ -0,0 +1,124 @@
+import time
+from datetime import timedelta
+
+from odoo import Command
+from odoo.tests import tagged
+
+from .common import PaymentPlanCommon
+
+
+@tagged('post_install', '-at_install')
+class TestQueryBudgets(PaymentPlanCommon):
+    """The hot paths run a fixed number of queries whatever the batch size.
+
+    Each operation is measured on a small batch first, then run on a large
+    batch under assertQueryCount with the small count plus a fixed slack, so
+    an N+1 pattern fails the test as soon as it is introduced.
+    """
+
+    def _count_queries(self, operation):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        operation()
+        self.env.flush_all()
+        return self.cr.sql_log_count - start
+
+    def assertQueryBudget(self, prepare, small=5, large=50, slack=3, max_seconds=None):
+        """
+        Check that ``prepare(size)()`` does not run more queries for ``large`` records than for ``small`` ones
+
+        Args:
+            prepare: Builds the records for one run and returns the operation to measure
+            small: Batch size of the reference run
+            large: Batch size of the budgeted run
+            slack: Extra queries allowed on the large run
+            max_seconds: Optional wall time budget of the large run
+        """
+        small_queries = self._count_queries(prepare(small))
+        operation = prepare(large)
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = time.perf_counter()
+        with self.assertQueryCount(small_queries + slack):
+            operation()
+        if max_seconds is not None:
+            self.assertLess(time.perf_counter() - start, max_seconds)
+
+    def _open_line(self):
+        return self._create_plans([[(30, 1000.0)]]).line_ids
+
+    def test_reconciliation_action_confirm(self):
+        def prepare(size):
+            lines = self._create_plans([[(30 + index, 100.0) for index in range(size)]]).line_ids
+            return self._allocate(lines, lines.mapped('amount')).action_confirm
+        self.assertQueryBudget(prepare)
+
+    def test_reconciliation_wizard_create(self):
+        def prepare(size):
+            line = self._open_line()
+            part = line.currency_id.round(line.amount / (size + 1))
+            self._allocate([line] * size, [part] * size).action_confirm()
+            return lambda: self.env['payment.plan.reconciliation.wizard'].create({
+                'payment_plan_id': line.payment_plan_id.id,
+                'payment_plan_line_id': line.id,
+            })
+        self.assertQueryBudget(prepare)
+
+    def test_reconciliation_wizard_confirm(self):
+        def prepare(size):
+            line = self._open_line()
+            part = line.currency_id.round(line.amount / size)
+            move_lines = self._create_bank_lines([part] * size)
+            wizard = self.env['payment.plan.reconciliation.wizard'].create({
+                'payment_plan_id': line.payment_plan_id.id,
+                'payment_plan_line_id': line.id,
+                'wizard_line_ids': [Command.create({
+                    'move_line_id': move_line.id,
+                    'amount': part,
+                }) for move_line in move_lines],
+            })
+            return wizard.action_confirm
+        self.assertQueryBudget(prepare)
+
+    def test_calculate_payment_plan(self):
+        def prepare(size):
+            plan = self._create_plans([[]])
+            wizard = self.env['payment.plan.calculator.wizard'].create({
+                'payment_plan_id': plan.id,
+                'total_amount': 1000.0 * size,
+                'initial_payment': False,
+                'installment_count': size,
+            })
+            return wizard.calculate_payment_plan
+        self.assertQueryBudget(prepare, small=12, large=120)
+
+    def test_overdue_chunk(self):
+        # One chunk of the overdue cron on the lines of the case only
+        def prepare(size):
+            lines = self._create_plans([[(-60 - index, 100.0) for index in range(size)]]).line_ids
+            lines.write({'payment_date': self.today - timedelta(days=10)})
+            return lambda: self.env['payment.plan.line']._update_overdue_chunk(lines)
+        self.assertQueryBudget(prepare)
+
+    def test_compute_amounts(self):
+        def prepare(size):
+            plans = self._create_plans([[(30, 100.0), (60, 100.0)]] * size)
+            return plans._compute_amounts
+        self.assertQueryBudget(prepare, small=100, large=500, max_seconds=2.0)
+
+    def test_roll_rates(self):
+        # Five years of roll rates come from the snapshots in one query
+        def prepare(size):
+            self._create_plans([[(-40, 100.0), (20, 100.0)]] * size, date=self.today - timedelta(days=150))
+            self.env['payment.plan.snapshot']._close_periods(self.today - timedelta(days=90))
+            return self.env['payment.plan.analytics'].get_roll_rates
+        self.assertQueryBudget(prepare, small=10, large=100, max_seconds=2.0)
+
+    def test_statement_report_values(self):
+        def prepare(size):
+            plans = self._create_plans([[(-30, 100.0), (30, 100.0)]] * size)
+            return lambda: self.env['ir.actions.report']._render_qweb_html(
+                'olivegt_sale_payment_plans.action_report_payment_plan', plans.ids,
+            )
+        self.assertQueryBudget(prepare, small=2, large=20)
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from odoo.tests import tagged
+
+from .common import PaymentPlanCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAllocationCancel(PaymentPlanCommon):
+
+    def test_cancel_rebuilds_the_payment_date_of_partially_allocated_lines(self):
+        line = self._create_plans([[(-60, 1000.0)]]).line_ids
+        first_date = self.today - timedelta(days=45)
+        last_date = self.today - timedelta(days=30)
+        first = self._allocate(line, [200.0], date=first_date)
+        last = self._allocate(line, [300.0], date=last_date)
+        (first + last).action_confirm()
+        self.assertFalse(line.paid)
+        self.assertEqual(line.payment_date, last_date)
+        self.assertAlmostEqual(line.interest_amount, 10.0)
+
+        # The earlier allocation left: interest runs up to its date
+        last.action_cancel()
+        self.assertEqual(line.payment_date, first_date)
+        self.assertEqual(line.overdue_days, 15)
+        self.assertAlmostEqual(line.interest_amount, 5.0)
+
+        # None left: the line accrues up to today again, as the daily refresh keeps doing
+        first.action_cancel()
+        self.assertFalse(line.payment_date)
+        self.assertFalse(line.payment_reference)
+        self.assertEqual(line.overdue_days, 60)
+        self.assertAlmostEqual(line.interest_amount, 20.0)
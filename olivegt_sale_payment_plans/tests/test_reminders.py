@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from odoo.tests import tagged
+
+from .common import PaymentPlanCommon
+
+
+@tagged('post_install', '-at_install')
+class TestDunning(PaymentPlanCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param('olivegt_sale_payment_plans.dunning_levels', '5,15,30')
+
+    def _reminders(self, line):
+        return self.env['payment.plan.reminder'].search([('line_ids', 'in', line.ids)])
+
+    def test_rerun_sends_each_level_once(self):
+        line = self._create_plans([[(-20, 1000.0)]]).line_ids
+        reminder_model = self.env['payment.plan.reminder']
+        reminder_model._run_dunning()
+        reminder = self._reminders(line)
+        self.assertEqual(len(reminder), 1)
+        self.assertEqual(reminder.level, 2)
+        self.assertEqual(line.dunning_level, 2)
+
+        # Nothing new reached: the rerun leaves everyone alone
+        reminder_model._run_dunning()
+        self.assertEqual(self._reminders(line), reminder)
+
+        # 30 days overdue: the next level is reminded once more
+        reminder_model._run_dunning(today=self.today + timedelta(days=10))
+        self.assertEqual(len(self._reminders(line)), 2)
+        self.assertEqual(line.dunning_level, 3)
+
+    def test_level_starts_over_when_a_paid_line_is_unpaid(self):
+        line = self._create_plans([[(-20, 1000.0)]]).line_ids
+        reminder_model = self.env['payment.plan.reminder']
+        reminder_model._run_dunning()
+        self.assertEqual(line.dunning_level, 2)
+
+        allocation = self._allocate(line, [line.total_with_interest])
+        allocation.action_confirm()
+        self.assertTrue(line.paid)
+        self.assertEqual(line.dunning_level, 2)
+
+        # The cancelled payment reopens the installment: its reminders are due again
+        allocation.action_cancel()
+        self.assertFalse(line.paid)
+        self.assertEqual(line.dunning_level, 0)
+        reminder_model._run_dunning()
+        self.assertEqual(len(self._reminders(line)), 2)
+        self.assertEqual(line.dunning_level, 2)
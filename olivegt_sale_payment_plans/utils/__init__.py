@@ -1,2 +1,3 @@
 # This directory is used for utility functions for payment plans
+from . import db
 from . import payment_helpers
@@ -0,0 +1,66 @@
+import logging
+
+from odoo.sql_db import db_connect
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+
+def create_indexes(cr, tablename, indexes):
+    """
+    Create the missing indexes of a table inside the current transaction.
+
+    Args:
+        cr: Database cursor
+        tablename (str): Table the indexes belong to
+        indexes (list[tuple]): (name, expressions, where) triples
+    """
+    for name, expressions, where in indexes:
+        create_index(cr, name, tablename, expressions, where=where)
+
+
+def create_indexes_concurrently(cr, tablename, indexes):
+    """
+    Build the missing indexes of a table with CREATE INDEX CONCURRENTLY.
+
+    CONCURRENTLY cannot run inside a transaction block and waits for every
+    open transaction on the table, so the caller's transaction is committed
+    first and the indexes are built on a separate autocommit connection.
+    Invalid leftovers of an interrupted build are dropped and rebuilt.
+
+    Because of that commit, this must be the first thing a pre-migrate
+    script does, since whatever the upgrade wrote before the call becomes
+    permanent even if the upgrade fails later. Never call it from init(),
+    a post-migrate script or after other writes of the same migration;
+    indexes needed there go through create_indexes instead.
+
+    Args:
+        cr: Database cursor of the running upgrade
+        tablename (str): Table the indexes belong to
+        indexes (list[tuple]): (name, expressions, where) triples
+    """
+    cr.commit()
+    with db_connect(cr.dbname).cursor() as index_cr:
+        index_cr._cnx.autocommit = True
+        try:
+            for name, expressions, where in indexes:
+                index_cr.execute("""
+                    SELECT i.indisvalid
+                      FROM pg_index i
+                      JOIN pg_class c ON c.oid = i.indexrelid
+                     WHERE c.relname = %s
+                """, (name,))
+                row = index_cr.fetchone()
+                if row and row[0]:
+                    continue
+                if row:
+                    _logger.info("Dropping invalid index %s before rebuilding it", name)
+                    index_cr.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+                _logger.info("Creating index %s on %s concurrently", name, tablename)
+                where_clause = f" WHERE {where}" if where else ""
+                index_cr.execute(
+                    f'CREATE INDEX CONCURRENTLY "{name}" ON "{tablename}" '
+                    f'({", ".join(expressions)}){where_clause}'
+                )
+        finally:
+            index_cr._cnx.autocommit = False
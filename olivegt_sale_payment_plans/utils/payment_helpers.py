@@ -1,3 +1,5 @@
+import math
+
 from dateutil.relativedelta import relativedelta
 
 
@@ -92,3 +94,237 @@ def split_equal_installments(total_amount, count, currency, initial_amount=0.0,
         amounts[-1] = currency.round(amounts[-1] + diff)
 
     return amounts
+
+
+PERIODS_PER_YEAR = {
+    'month': 12,
+    'week': 52,
+    'day': 365,
+}
+
+
+def period_rate_from_annual(annual_rate, frequency):
+    """
+    Convert an annual nominal financing rate into the rate of one installment period.
+
+    Args:
+        annual_rate (float): Annual nominal rate in percent (e.g. 12 = 12%)
+        frequency (str): 'month', 'week', or 'day'
+
+    Returns:
+        float: Rate per period as a decimal (e.g. 0.01 for 1% per month)
+    """
+    periods = PERIODS_PER_YEAR.get(frequency, 12)
+    return (annual_rate or 0.0) / 100.0 / periods
+
+
+def compute_amortization_schedules(principals, period_rates, counts, currency, method='french'):
+    """
+    Compute amortization tables for many financed plans in closed form.
+
+    French (annuity) schedules use the constant payment
+    A = P * r / (1 - (1 + r) ** -n) and the closed-form outstanding balance
+    B_k = P * (1 + r) ** k - A * ((1 + r) ** k - 1) / r, so no iteration is
+    needed to solve for the payment. German schedules repay a constant
+    principal P / n and charge interest on the outstanding balance.
+    Each installment is rounded with the currency and the last installment
+    absorbs the principal residual so every table repays exactly P.
+
+    Args:
+        principals (list[float]): Financed principal of each plan
+        period_rates (list[float]): Rate per period of each plan, as a decimal
+        counts (list[int]): Number of installments of each plan
+        currency (res.currency): Currency record to use for rounding
+        method (str): 'french' or 'german'
+
+    Returns:
+        list[list[dict]]: One schedule per plan; each row holds 'principal',
+        'interest', 'amount' (principal + interest) and 'balance' after the row
+    """
+    schedules = []
+    for principal, rate, count in zip(principals, period_rates, counts):
+        if count <= 0 or not principal or principal <= 0:
+            schedules.append([])
+            continue
+        rate = rate or 0.0
+        ks = range(1, count + 1)
+
+        if method == 'german':
+            step = principal / count
+            # Balance before installment k is P - (k - 1) * P / n
+            raw_principal = [step] * count
+            raw_interest = [(principal - (k - 1) * step) * rate for k in ks]
+        elif rate:
+            payment = principal * rate / (1.0 - (1.0 + rate) ** -count)
+            growth = [(1.0 + rate) ** (k - 1) for k in ks]
+            # Interest of installment k is r * B_(k-1), from the closed-form balance
+            raw_interest = [rate * (principal * g - payment * (g - 1.0) / rate) for g in growth]
+            raw_principal = [payment - interest for interest in raw_interest]
+        else:
+            raw_principal = [principal / count] * count
+            raw_interest = [0.0] * count
+
+        rows = []
+        repaid = 0.0
+        for i in range(count):
+            if i == count - 1:
+                principal_part = currency.round(principal - repaid)
+            else:
+                principal_part = currency.round(raw_principal[i])
+            interest_part = currency.round(raw_interest[i])
+            repaid = currency.round(repaid + principal_part)
+            rows.append({
+                'principal': principal_part,
+                'interest': interest_part,
+                'amount': currency.round(principal_part + interest_part),
+                'balance': currency.round(principal - repaid),
+            })
+        schedules.append(rows)
+    return schedules
+
+
+def compute_amortization_schedule(principal, period_rate, count, currency, method='french'):
+    """
+    Compute the amortization table of a single financed plan.
+
+    See compute_amortization_schedules for the row layout.
+    """
+    return compute_amortization_schedules([principal], [period_rate], [count], currency, method=method)[0]
+
+
+def compute_overdue_interest(amount, days, method, interest_rate=0.0, fixed_interest_amount=0.0):
+    """
+    Compute late-payment interest for an installment overdue a number of days.
+
+    Args:
+        amount (float): Installment amount
+        days (int): Days overdue
+        method (str): 'percentage' (monthly rate accrued daily) or 'fixed'
+            (fixed amount per started month)
+        interest_rate (float): Monthly rate in percent; 1% is used when unset
+        fixed_interest_amount (float): Amount charged per month for 'fixed'
+
+    Returns:
+        float: Interest amount, not rounded
+    """
+    if days <= 0:
+        return 0.0
+    if method == 'percentage':
+        daily_rate = ((interest_rate or 1.0) / 100.0) / 30.0
+        return amount * days * daily_rate
+    if method == 'fixed' and fixed_interest_amount:
+        # Any started month is charged in full
+        return fixed_interest_amount * max(math.ceil(days / 30.0), 1)
+    return 0.0
+
+
+def overdue_interest_sql(amount, days, method, interest_rate, fixed_interest_amount):
+    """
+    SQL expression of compute_overdue_interest, for the set-based refreshes.
+
+    Keep both in step: the Python function serves the ORM computes, this
+    expression the queries that recompute many lines at once.
+
+    Args:
+        amount (str): SQL expression of the installment amount
+        days (str): SQL expression of the days overdue
+        method (str): SQL expression of the interest calculation method
+        interest_rate (str): SQL expression of the monthly rate in percent
+        fixed_interest_amount (str): SQL expression of the fixed monthly amount
+
+    Returns:
+        str: Numeric SQL expression of the interest, not rounded
+    """
+    return f"""(CASE
+        WHEN {days} <= 0 THEN 0
+        WHEN {method} = 'percentage'
+            THEN {amount} * {days} * COALESCE(NULLIF({interest_rate}, 0), 1.0) / 100.0 / 30.0
+        WHEN {method} = 'fixed' AND COALESCE({fixed_interest_amount}, 0) <> 0
+            THEN {fixed_interest_amount} * GREATEST(CEIL({days} / 30.0), 1)
+        ELSE 0
+    END)::numeric"""
+
+
+def distribute_amount(amount, capacities, currency, strategy='oldest_first'):
+    """
+    Spread a payment over installments in one pass, exact to the currency unit.
+
+    Amounts are handled as integer multiples of the currency rounding, so the
+    parts always add up to the distributed total and no part exceeds its
+    capacity. Anything above the total capacity is left undistributed.
+
+    Args:
+        amount (float): Amount to distribute
+        capacities (list[float]): Open amount of each installment, oldest first
+        currency (res.currency): Currency record to use for rounding
+        strategy (str): 'oldest_first' and 'newest_first' fill installments in
+            due order; 'proportional' splits in proportion to the open amounts
+            and hands leftover units out by largest remainder
+
+    Returns:
+        list[float]: Amount for each installment, in the order of ``capacities``
+    """
+    unit = currency.rounding
+    caps = [max(int(round(capacity / unit)), 0) for capacity in capacities]
+    total = min(max(int(round(amount / unit)), 0), sum(caps))
+    parts = [0] * len(caps)
+    if not total:
+        return [0.0] * len(caps)
+
+    if strategy == 'proportional':
+        cap_total = sum(caps)
+        remainders = []
+        for i, cap in enumerate(caps):
+            share, remainder = divmod(total * cap, cap_total)
+            parts[i] = share
+            remainders.append((-remainder, i))
+        leftover = total - sum(parts)
+        # Largest remainders first, ties to the oldest installment
+        for _remainder, i in sorted(remainders):
+            if not leftover:
+                break
+            if parts[i] < caps[i]:
+                parts[i] += 1
+                leftover -= 1
+    else:
+        order = range(len(caps)) if strategy != 'newest_first' else reversed(range(len(caps)))
+        left = total
+        for i in order:
+            if not left:
+                break
+            parts[i] = min(caps[i], left)
+            left -= parts[i]
+
+    return [currency.round(part * unit) for part in parts]
+
+
+def pair_payments(sources, targets, currency):
+    """
+    Match payment amounts to installment amounts in order, in one pass.
+
+    Args:
+        sources (list[tuple]): (key, amount) of each payment
+        targets (list[tuple]): (key, amount) of each installment
+        currency (res.currency): Currency record to use for rounding
+
+    Returns:
+        list[tuple]: (source key, target key, amount) for every non-zero pair
+    """
+    unit = currency.rounding
+    source_left = [(key, int(round(amount / unit))) for key, amount in sources]
+    target_left = [(key, int(round(amount / unit))) for key, amount in targets]
+    pairs = []
+    s = t = 0
+    while s < len(source_left) and t < len(target_left):
+        source_key, source_units = source_left[s]
+        target_key, target_units = target_left[t]
+        units = min(source_units, target_units)
+        if units > 0:
+            pairs.append((source_key, target_key, currency.round(units * unit)))
+        source_left[s] = (source_key, source_units - units)
+        target_left[t] = (target_key, target_units - units)
+        if source_left[s][1] <= 0:
+            s += 1
+        if target_left[t][1] <= 0:
+            t += 1
+    return pairs
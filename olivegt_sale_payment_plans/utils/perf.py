@@ -0,0 +1,82 @@
+import logging
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+_logger = logging.getLogger(__name__)
+
+
+class PerfPhase:
+    """Mutable handle yielded by perf_phase so the caller can report rows touched."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+
+    def add_rows(self, count):
+        self.rows += count or 0
+
+
+@contextmanager
+def perf_phase(env, name, rows=0):
+    """
+    Measure a named phase and store it as a payment.plan.perf.run record.
+
+    Records wall time, SQL query count and time, rows touched and the
+    worker's peak RSS. The peak is the process high-water mark, so it is
+    only raised by a phase that uses more memory than anything the worker
+    ran before; it is not the phase's own peak. Query time is only
+    available when the worker thread tracks it, as HTTP and cron threads do.
+
+    Args:
+        env: Odoo environment the phase runs in
+        name (str): Phase name, e.g. 'overdue_cron'
+        rows (int): Initial rows touched; more can be added on the handle
+
+    Yields:
+        PerfPhase: handle whose add_rows() accumulates rows touched
+    """
+    phase = PerfPhase(name)
+    phase.add_rows(rows)
+    thread = threading.current_thread()
+    start_queries = env.cr.sql_log_count
+    start_query_time = getattr(thread, 'query_time', None)
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    try:
+        yield phase
+    except Exception:
+        _logger.info("Phase %s failed after %.3f s", name, time.perf_counter() - start)
+        raise
+    duration = time.perf_counter() - start
+    query_count = env.cr.sql_log_count - start_queries
+    query_time = None
+    if start_query_time is not None:
+        query_time = getattr(thread, 'query_time', start_query_time) - start_query_time
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    env['payment.plan.perf.run'].sudo()._record_phase({
+        'name': name,
+        'duration_ms': duration * 1000.0,
+        'query_count': query_count,
+        'query_time_ms': query_time * 1000.0 if query_time is not None else 0.0,
+        'rows': phase.rows,
+        'worker_peak_memory_kb': peak_rss,
+        'worker_peak_growth_kb': peak_rss - start_rss,
+    })
+
+
+def perf_tracked(name):
+    """
+    Decorate a model method so each call is measured as a perf_phase.
+
+    The number of records the method is called on is reported as rows.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with perf_phase(self.env, name, rows=len(self)):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,2 +1,3 @@
 from . import payment_plan_calculator
-from . import payment_plan_reconciliation
\ No newline at end of file
+from . import payment_plan_reconciliation
+from . import payment_plan_payoff
\ No newline at end of file
@@ -1,7 +1,14 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 from dateutil.relativedelta import relativedelta
-from ..utils.payment_helpers import calculate_installment_dates, split_equal_installments
+from ..utils.payment_helpers import (
+    calculate_installment_dates,
+    compute_amortization_schedule,
+    period_rate_from_annual,
+    split_equal_installments,
+)
+from ..models.payment_plan_event import PlanEvent
+from ..utils.perf import perf_tracked
 
 
 class PaymentPlanCalculatorWizard(models.TransientModel):
@@ -31,6 +38,15 @@ class PaymentPlanCalculatorWizard(models.TransientModel):
     ], string='Frequency', default='month')
     installment_start_date = fields.Date('First Payment Date', default=fields.Date.context_today)
     equal_installments = fields.Boolean('Equal Installments', default=True)
+    amortization_method = fields.Selection([
+        ('equal', 'Equal Principal Split'),
+        ('french', 'French (Annuity)'),
+        ('german', 'German (Constant Principal)'),
+    ], string='Amortization', default='equal', required=True,
+       help="How the financed amount is repaid. French and German schedules add financing interest to each "
+            "installment, so the plan total exceeds the sale total by the financing interest.")
+    financing_rate = fields.Float(string='Annual Financing Rate (%)', default=0.0,
+                                  help="Annual nominal rate charged on the financed balance")
 
     # Pago Intermedio
     intermediate_payment = fields.Boolean('Pago Intermedio')
@@ -113,6 +129,7 @@ class PaymentPlanCalculatorWizard(models.TransientModel):
                 self.final_date = last_installment_date + relativedelta(days=1)
                 self.intermediate_date = last_installment_date
 
+    @perf_tracked('plan_calculation')
     def calculate_payment_plan(self):
         self.ensure_one()
         currency = self.currency_id or self.payment_plan_id.currency_id
@@ -155,6 +172,23 @@ class PaymentPlanCalculatorWizard(models.TransientModel):
             intermediate_amount=inter_amount,
             final_amount=fin_amount,
         )
+        installment_interests = [0.0] * len(installment_amounts)
+        if self.amortization_method != 'equal' and installment_amounts:
+            financed = currency.round(base_total - total_distributed)
+            schedule = compute_amortization_schedule(
+                financed,
+                period_rate_from_annual(self.financing_rate, self.installment_frequency),
+                self.installment_count,
+                currency,
+                method=self.amortization_method,
+            )
+            # Installments repay exactly the financed amount; only the financing
+            # interest on top makes the plan total exceed the sale total
+            repaid = currency.round(sum(row['principal'] for row in schedule))
+            if currency.compare_amounts(repaid, financed):
+                raise ValidationError(_('The amortization schedule repays %s instead of the financed %s.') % (repaid, financed))
+            installment_amounts = [row['amount'] for row in schedule]
+            installment_interests = [row['interest'] for row in schedule]
 
         # If no installments, adjust final or initial to absorb rounding residuals
         if not installment_amounts:
@@ -170,6 +204,9 @@ class PaymentPlanCalculatorWizard(models.TransientModel):
                     raise ValidationError(_('Total cannot be matched: set an initial/intermediate/final payment or at least 1 installment.'))
 
         # Clear existing plan lines
+        self.payment_plan_id._log_events([
+            PlanEvent(self.payment_plan_id.id, 'schedule_regenerated', fields.Date.context_today(self)),
+        ])
         self.payment_plan_id.line_ids.unlink()
 
         # Create new plan lines
@@ -196,6 +233,7 @@ class PaymentPlanCalculatorWizard(models.TransientModel):
                 'payment_plan_id': self.payment_plan_id.id,
                 'date': date,
                 'amount': amt,
+                'financing_interest': installment_interests[i] if i < len(installment_interests) else 0.0,
                 'name': (_('Cuota %s') % (i + 1)),
             })
 
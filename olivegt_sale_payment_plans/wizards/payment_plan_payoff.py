@@ -0,0 +1,37 @@
+from odoo import models, fields, api
+
+
+class PaymentPlanPayoffWizard(models.TransientModel):
+    _name = 'payment.plan.payoff.wizard'
+    _description = 'Payment Plan Payoff Quote'
+
+    payment_plan_id = fields.Many2one('payment.plan', string='Payment Plan', required=True)
+    partner_id = fields.Many2one('res.partner', related='payment_plan_id.partner_id')
+    currency_id = fields.Many2one('res.currency', related='payment_plan_id.currency_id')
+    reference_date = fields.Date('Payment Date', required=True, default=fields.Date.context_today,
+                                 help="Date on which the client would pay")
+    principal_due = fields.Monetary('Principal Due', compute='_compute_projection')
+    interest_due = fields.Monetary('Interest Due', compute='_compute_projection')
+    amount_due = fields.Monetary('Total to Pay', compute='_compute_projection')
+    projection_html = fields.Html('Detail', compute='_compute_projection')
+
+    @api.depends('payment_plan_id', 'reference_date')
+    def _compute_projection(self):
+        for wizard in self:
+            if not wizard.payment_plan_id or not wizard.reference_date:
+                wizard.principal_due = wizard.interest_due = wizard.amount_due = 0.0
+                wizard.projection_html = ''
+                continue
+            plan = wizard.payment_plan_id
+            projection = plan.get_payoff_projection(wizard.reference_date)[plan.id]
+            wizard.principal_due = projection['principal_due']
+            wizard.interest_due = projection['interest_due']
+            wizard.amount_due = projection['amount_due']
+            wizard.projection_html = wizard._render_projection_table(projection['lines'])
+
+    def _render_projection_table(self, lines):
+        """Render the open lines of the projection as a small HTML table"""
+        return self.env['ir.qweb']._render('olivegt_sale_payment_plans.payment_plan_payoff_projection_table', {
+            'lines': lines,
+            'symbol': self.currency_id.symbol or 'Q',
+        })
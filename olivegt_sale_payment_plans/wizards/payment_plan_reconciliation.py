@@ -2,6 +2,8 @@ from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 from odoo.tools import float_compare, float_is_zero
 
+from ..utils.payment_helpers import distribute_amount, pair_payments
+
 
 class PaymentPlanReconciliationWizardLine(models.TransientModel):
     _name = 'payment.plan.reconciliation.wizard.line'
@@ -74,43 +76,40 @@ class PaymentPlanReconciliationWizardLine(models.TransientModel):
     available_amount = fields.Monetary(
         string='Available',
         compute='_compute_available',
+        store=True,
         help='Available amount that can be allocated'
     )
     
     original_amount = fields.Monetary(
         string='Original',
         compute='_compute_available',
+        store=True,
         help='Original amount of the journal item'
     )
     
-    @api.onchange('move_line_id')
-    @api.depends('move_line_id')
+    @api.depends('move_line_id', 'is_readonly', 'existing_reconciliation_id')
     def _compute_available(self):
+        """Read availability from the amount stored on the journal items
+        
+        payment_plan_available_amount is kept up to date on the journal item
+        by the allocations themselves, so no query is needed per wizard line,
+        and storing the result keeps it for the lifetime of the wizard.
+        """
         for line in self:
             if not line.move_line_id:
                 line.available_amount = 0.0
                 line.original_amount = 0.0
                 continue
             
+            # Calculate original amount from move line
+            line.original_amount = abs(line.move_line_id.balance)
+            
             # For existing reconciliations, show the allocated amount correctly
             if line.is_readonly and line.existing_reconciliation_id:
-                line.original_amount = abs(line.move_line_id.balance)
                 line.available_amount = 0.0  # No available amount for existing reconciliations
                 continue
-                
-            # Calculate original amount from move line
-            line.original_amount = abs(line.move_line_id.balance)
             
-            # Find existing reconciliations for this move line
-            reconciliations = self.env['payment.plan.reconciliation'].search([
-                ('move_line_id', '=', line.move_line_id.id),
-                ('state', '=', 'confirmed')
-            ])
-            allocated = sum(reconciliations.mapped('amount'))            # Available amount is original minus allocated
-            line.available_amount = line.original_amount - allocated
-            # If no amount is set and it's not a readonly line, default to available amount
-            if not line.amount and not line.is_readonly:
-                line.amount = min(line.available_amount, line.wizard_id.remaining_to_allocate)
+            line.available_amount = line.move_line_id.payment_plan_available_amount
     
     @api.onchange('move_line_id')
     def _onchange_move_line_id(self):
@@ -118,20 +117,9 @@ class PaymentPlanReconciliationWizardLine(models.TransientModel):
         available amount or remaining to allocate"""
         for line in self:
             if line.move_line_id and not line.is_readonly:
-                # First ensure available amount is calculated
-                line._compute_available()                # Then set the amount based on availability and remaining to allocate
                 if line.wizard_id and line.available_amount > 0:
                     line.amount = min(line.available_amount, line.wizard_id.remaining_to_allocate)
     
-    @api.model
-    def create(self, values):
-        """Override create to make move_line_id validation conditional"""
-        # If we're creating an empty line (for UI purposes), don't validate move_line_id
-        if 'move_line_id' not in values and not values.get('is_readonly', False):
-            # This is an empty line being created, likely through the "Add Line" button
-            return super(PaymentPlanReconciliationWizardLine, self).create(values)
-        return super(PaymentPlanReconciliationWizardLine, self).create(values)
-
     @api.constrains('amount', 'is_readonly')
     def _check_amount(self):
         for line in self:
@@ -193,6 +181,14 @@ class PaymentPlanReconciliationWizard(models.TransientModel):
         required=True
     )
     
+    allocation_strategy = fields.Selection([
+        ('single', 'Selected Installment'),
+        ('oldest_first', 'Oldest Due First'),
+        ('newest_first', 'Newest Due First'),
+        ('proportional', 'Proportional Distribution'),
+    ], string='Allocation Strategy', default='single', required=True,
+       help="How to spread the payment: only on the selected installment, or over the open installments of the plan")
+    
     line_amount = fields.Monetary(
         string='Line Amount',
         related='payment_plan_line_id.total_with_interest',
@@ -231,14 +227,29 @@ class PaymentPlanReconciliationWizard(models.TransientModel):
         store=True
     )
     
-    @api.depends('payment_plan_line_id', 'allocated_amount', 'line_amount')
+    @api.depends('payment_plan_line_id', 'allocated_amount', 'line_amount', 'allocation_strategy',
+                 'payment_plan_id.line_ids.allocated_amount', 'payment_plan_id.line_ids.total_with_interest')
     def _compute_remaining(self):
         for wizard in self:
-            if wizard.payment_plan_line_id:
+            if wizard.allocation_strategy != 'single':
+                wizard.remaining_amount = sum(capacity for _line, capacity in wizard._get_open_plan_lines())
+            elif wizard.payment_plan_line_id:
                 wizard.remaining_amount = wizard.line_amount - wizard.allocated_amount
             else:
                 wizard.remaining_amount = 0.0
     
+    def _get_open_plan_lines(self):
+        """Open installments of the plan, oldest first, with the amount each can still take"""
+        self.ensure_one()
+        open_lines = []
+        for line in self.payment_plan_id.line_ids.filtered(lambda l: not l.paid).sorted(lambda l: (l.date, l.id)):
+            # Same limit as the allocation constraint: interest counts once the line is overdue
+            required = line.total_with_interest if line.overdue_days > 0 else line.amount
+            capacity = self.currency_id.round(required - line.allocated_amount)
+            if capacity > 0:
+                open_lines.append((line, capacity))
+        return open_lines
+    
     @api.depends('wizard_line_ids.amount', 'remaining_amount', 'wizard_line_ids.is_readonly')
     def _compute_total(self):
         for wizard in self:
@@ -268,14 +279,13 @@ class PaymentPlanReconciliationWizard(models.TransientModel):
                 res['payment_plan_id'] = payment_plan_line.payment_plan_id.id
         return res
         
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         """Override create to populate existing reconciliations as wizard lines"""
-        res = super(PaymentPlanReconciliationWizard, self).create(vals)
-        # After creating the wizard, load existing reconciliations as read-only lines
-        if res.payment_plan_line_id:
-            res._load_existing_reconciliations()
-        return res
+        wizards = super(PaymentPlanReconciliationWizard, self).create(vals_list)
+        # After creating the wizards, load existing reconciliations as read-only lines
+        wizards.filtered('payment_plan_line_id')._load_existing_reconciliations()
+        return wizards
         
     @api.onchange('payment_plan_line_id')
     def _onchange_payment_plan_line_id(self):
@@ -295,58 +305,66 @@ class PaymentPlanReconciliationWizard(models.TransientModel):
                     'existing_reconciliation_id': rec.id,
                 }))
             
-            # Update move lines cache to ensure our payment_plan_available_amount is calculated
-            if self.partner_id:
-                move_lines = self.env['account.move.line'].search([
-                    ('account_id.reconcile', '=', True),
-                    ('partner_id', '=', self.partner_id.id)
-                ])
-                move_lines._compute_payment_plan_available_amount()
-            
             self.wizard_line_ids = commands
             
     def _load_existing_reconciliations(self):
-        """Helper method to load existing reconciliations as wizard lines"""
-        self.ensure_one()
-        existing_reconciliations = self._get_existing_reconciliations()
-        for rec in existing_reconciliations:
-            vals = {
-                'wizard_id': self.id,
-                'move_line_id': rec.move_line_id.id,
-                'amount': rec.amount,                'is_readonly': True,
-                'existing_reconciliation_id': rec.id,
-            }
-            self.env['payment.plan.reconciliation.wizard.line'].create(vals)
-      # Removed the action_view_existing_reconciliations method as existing
-    # reconciliations are now displayed directly in the wizard table
-    
-    def action_add_line(self):
-        """Add a new empty line to the wizard"""
-        self.ensure_one()
+        """Load the confirmed reconciliations of each wizard's line as read-only wizard lines
         
-        # Create a new wizard with the same data but with a fresh state
-        new_wizard = self.env['payment.plan.reconciliation.wizard'].create({
-            'payment_plan_id': self.payment_plan_id.id,
-            'payment_plan_line_id': self.payment_plan_line_id.id,
-            'date': self.date,
-        })
+        The reconciliations of all wizards are read with one search and the
+        wizard lines are created with one create() call.
+        """
+        reconciliations = self.env['payment.plan.reconciliation'].search([
+            ('payment_plan_line_id', 'in', self.payment_plan_line_id.ids),
+            ('state', '=', 'confirmed'),
+        ])
+        vals_list = [{
+            'wizard_id': wizard.id,
+            'move_line_id': rec.move_line_id.id,
+            'amount': rec.amount,
+            'is_readonly': True,
+            'existing_reconciliation_id': rec.id,
+        } for wizard in self for rec in reconciliations
+            if rec.payment_plan_line_id == wizard.payment_plan_line_id]
+        return self.env['payment.plan.reconciliation.wizard.line'].create(vals_list)
+    
+    def _prepare_reconciliation_vals(self, valid_lines):
+        """Split the wizard lines into reconciliation values according to the allocation strategy
         
-        # Load existing reconciliations
-        new_wizard._load_existing_reconciliations()
-        
-        # Return the new wizard view
-        return {
-            'name': _('Reconcile Payment Plan Line'),
-            'type': 'ir.actions.act_window',
-            'res_model': 'payment.plan.reconciliation.wizard',
-            'view_mode': 'form',
-            'res_id': new_wizard.id,
-            'target': 'new',            'context': {'default_payment_plan_id': self.payment_plan_id.id,
-                        'default_payment_plan_line_id': self.payment_plan_line_id.id},
-        }
-    
+        The split is computed in one in-memory pass and is exact to the cent.
+        """
+        self.ensure_one()
+        if self.allocation_strategy == 'single':
+            pairs = [(wizard_line, self.payment_plan_line_id, wizard_line.amount) for wizard_line in valid_lines]
+        else:
+            open_lines = self._get_open_plan_lines()
+            if not open_lines:
+                raise ValidationError(_("This payment plan has no open installments to allocate to."))
+            total = sum(valid_lines.mapped('amount'))
+            parts = distribute_amount(total, [capacity for _line, capacity in open_lines],
+                                      self.currency_id, self.allocation_strategy)
+            if float_compare(total, sum(parts), precision_rounding=self.currency_id.rounding) > 0:
+                raise ValidationError(_(
+                    "The payment exceeds the open amount of the plan.\n"
+                    "Open amount: %(open).2f\n"
+                    "This allocation: %(amount).2f"
+                ) % {'open': sum(parts), 'amount': total})
+            pairs = pair_payments(
+                [(wizard_line, wizard_line.amount) for wizard_line in valid_lines],
+                [(line, part) for (line, _capacity), part in zip(open_lines, parts) if part],
+                self.currency_id,
+            )
+        return [{
+            'payment_plan_id': self.payment_plan_id.id,
+            'payment_plan_line_id': plan_line.id,
+            'move_line_id': wizard_line.move_line_id.id,
+            'amount': amount,
+            # Siempre usar la fecha del asiento contable para la reconciliación
+            'date': wizard_line.move_line_id.move_id.date,
+            'state': 'draft',
+        } for wizard_line, plan_line, amount in pairs]
+
     def action_confirm(self):
-        """Confirm the reconciliations"""
+        """Create and confirm all the reconciliations of the wizard in one batch"""
         self.ensure_one()
         
         # Only process lines that have a move_line_id set
@@ -357,54 +375,17 @@ class PaymentPlanReconciliationWizard(models.TransientModel):
                       precision_rounding=self.currency_id.rounding) <= 0:
             raise ValidationError(_("Nothing to allocate. Please add allocation lines and select journal items."))
         
-        # Create reconciliations
-        reconciliations = []
-        for line in valid_lines:
-                  # Siempre usar la fecha del asiento contable para la reconciliación
-            move_date = line.move_line_id.move_id.date
-            reconciliation = self.env['payment.plan.reconciliation'].create({
-                'payment_plan_id': self.payment_plan_id.id,
-                'payment_plan_line_id': self.payment_plan_line_id.id,
-                'move_line_id': line.move_line_id.id,
-                'amount': line.amount,
-                'date': move_date,  # Usar la fecha del move_id, no la fecha del wizard
-                'state': 'draft',
-            })
-            reconciliations.append(reconciliation.id)
-              # Confirm the reconciliation
-            reconciliation.action_confirm()            # Reload the wizard for further allocations if there's still an amount to allocate
-            if float_compare(self.line_amount, self.allocated_amount + sum(r.amount for r in self.env['payment.plan.reconciliation'].browse(reconciliations)), 
-                         precision_rounding=self.currency_id.rounding) > 0:
-                # There's still an amount to allocate, create a fresh wizard with same data
-                new_wizard = self.env['payment.plan.reconciliation.wizard'].create({
-                    'payment_plan_id': self.payment_plan_id.id,
-                    'payment_plan_line_id': self.payment_plan_line_id.id,
-                    'date': self.date,
-                })
-                # Load existing reconciliations in the new wizard
-                new_wizard._load_existing_reconciliations()
-                
-                # Return the new wizard view
-                return {
-                    'name': _('Reconcile Payment Plan Line'),
-                    'type': 'ir.actions.act_window',
-                    'res_model': 'payment.plan.reconciliation.wizard',
-                    'view_mode': 'form',
-                    'res_id': new_wizard.id,
-                    'target': 'new',
-                    'context': self.env.context,
-                }
-            # Show result if fully allocated or no more allocations needed
-            elif reconciliations:
-                return {
-                    'name': _('Reconciliations'),
-                    'type': 'ir.actions.act_window',
-                    'res_model': 'payment.plan.reconciliation',
-                    'view_mode': 'list,form',
-                    'domain': [('id', 'in', reconciliations)],
-                }
-            else:
-                return {'type': 'ir.actions.act_window_close'}
+        reconciliations = self.env['payment.plan.reconciliation'].create(
+            self._prepare_reconciliation_vals(valid_lines)
+        )
+        reconciliations.action_confirm()
+        return {
+            'name': _('Reconciliations'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'payment.plan.reconciliation',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', reconciliations.ids)],
+        }
     
     @api.onchange('partner_id')
     def _onchange_partner_filter_move_lines(self):